@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Returns the bounded executor that runs blocking psycopg2 and file work
+    for the async endpoints. Its size (API_BLOCKING_WORKERS) caps how many
+    imports and syncs a worker runs at once; extra requests queue here
+    instead of stalling the event loop.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = int(os.getenv("API_BLOCKING_WORKERS", "4"))
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="catalog-blocking")
+            logger.info("Started blocking executor with %d worker(s).", max_workers)
+        return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) on the blocking executor and awaits its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """
+    Waits for running blocking work to finish and releases the executor.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
@@ -0,0 +1,19 @@
+import logging
+from fastapi import APIRouter, HTTPException
+
+from services.job_queue import get_job_queue
+from app.api.schemas.job import JobStatus
+
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=JobStatus)
+def get_job(job_id: str) -> JobStatus:
+    """
+    Return the state, progress counts, timings and error of a background job.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatus(**job.to_dict())
@@ -1,155 +1,498 @@
+import json
 import logging
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from typing import List
+import os
+import shutil
+import tempfile
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 
 from repository.product_repository import ProductRepository
 from services.feed_importer import FeedImporter
 from services.portal_synchronizer import PortalSynchronizer
-from services.csv_reader import FeedCsvReader
+from services.csv_reader import FeedCsvReader, DEFAULT_CHUNK_SIZE, DUPLICATE_POLICIES, DuplicateProductError
 from db.connection import DatabaseConnection
+from services.job_queue import get_job_queue
+from services.catalog_cache import get_catalog_cache
+from services.applied_files import AppliedFileManifest, ROLE_FEED, ROLE_PORTAL, ROLE_FEED_AND_SYNC
+from services.sync_plan import PlanDriftError, SyncPlan
+from domain.models import FeedImportResult, PortalSyncResult
+from app.api.concurrency import run_blocking
 
 
 from app.api.schemas.product import ProductOut
 from app.api.schemas.feed import FeedImportResponse
 from app.api.schemas.portal import PortalSyncResponse
+from app.api.schemas.job import JobAccepted
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.get("/", response_model=List[ProductOut])
-def list_products(client_id: int = Query(..., description="Client ID")) -> List[ProductOut]:
+IMPORT_MODE_PATTERN = "^(" + "|".join(FeedImporter.MODES) + ")$"
+SYNC_ENGINE_PATTERN = "^(" + "|".join(PortalSynchronizer.ENGINES) + ")$"
+DUPLICATE_POLICY_PATTERN = "^(" + "|".join(DUPLICATE_POLICIES) + ")$"
+DUPLICATES_DESCRIPTION = "How a product_id repeated within a file is resolved: first, last or reject (422); defaults to DUPLICATE_POLICY"
+
+# Uploads are parsed straight from the request's file object, this many bytes at a time.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE)))
+
+MAX_PAGE_SIZE = 10000
+NEXT_CURSOR_HEADER = "X-Next-After"
+CACHE_HEADER = "X-Catalog-Cache"
+PLAN_HEADER_PREFIX = "X-Sync-Plan-"
+
+@router.get("/", response_model=List[ProductOut], responses={304: {"description": "Catalog unchanged"}})
+def list_products(
+    request: Request,
+    client_id: int = Query(..., description="Client ID"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to return the whole catalog"),
+    after: Optional[int] = Query(None, description="Keyset cursor: only return products with a greater product_id"),
+    stream: bool = Query(False, description="Stream the catalog as NDJSON instead of one JSON array"),
+) -> List[ProductOut]:
     """
-    Return a list of products for the given client_id as a list of ProductOut.
+    Return a list of products for the given client_id as a list of ProductOut,
+    ordered by product_id.
+
+    With `limit`, one page is returned and, when more products follow, the
+    X-Next-After header carries the cursor to pass as `after` for the next page.
+    With `stream=true`, products are streamed as newline-delimited JSON read
+    through a server-side cursor, so memory does not grow with the catalog.
+
+    Array responses are served from the per-client catalog cache while the
+    client's catalog version is unchanged; X-Catalog-Cache says hit or miss.
+
+    Every response carries an ETag (and, once the catalog was written, a
+    Last-Modified) derived from the client's catalog version. A request whose
+    If-None-Match or If-Modified-Since still matches gets 304 without the rows
+    being read.
     """
+    db_conn = None
     try:
         db_conn = DatabaseConnection().get_connection()
         with db_conn.cursor() as cur:
-            cur.execute(
-                "SELECT product_id, title, price, store_id FROM products WHERE client_id = %s",
-                (client_id,)
-            )
-            rows = cur.fetchall()
-            # Convert DB rows to list of ProductOut
-            results = [
-                ProductOut(
-                    product_id=row[0],
-                    title=row[1],
-                    price=float(row[2]),
-                    store_id=row[3]
+            repository = ProductRepository()
+            # Read the version first: rows fetched afterwards are at least that new.
+            version, updated_at = repository.get_catalog_version(cur, client_id)
+            validators = _catalog_validators(client_id, version, updated_at)
+            if _is_not_modified(request, validators, updated_at):
+                return Response(status_code=304, headers=validators)
+
+            if stream:
+                # The response reuses this connection and releases it however the stream ends.
+                products = _stream_products_ndjson(db_conn, client_id, after)
+                response, db_conn = _ConnectionStreamingResponse(products, db_conn, headers=validators), None
+                return response
+
+            cache_key = (client_id, after, limit)
+            cached = get_catalog_cache().get(cache_key, version)
+            if cached is None:
+                rows = repository.list_products(
+                    cur, client_id, after=after, limit=limit + 1 if limit is not None else None
                 )
-                for row in rows
-            ]
-            return results
+                next_cursor = None
+                if limit is not None and len(rows) > limit:
+                    rows = rows[:limit]
+                    next_cursor = rows[-1][0]
+                body = json.dumps([_product_json(row) for row in rows]).encode("utf-8")
+                get_catalog_cache().put(cache_key, version, body, next_cursor)
+            else:
+                body, next_cursor = cached.body, cached.next_cursor
+        headers = {**validators, CACHE_HEADER: "hit" if cached is not None else "miss"}
+        if next_cursor is not None:
+            headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+        return Response(content=body, media_type="application/json", headers=headers)
     except Exception as e:
         logger.exception("Error listing products: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
     finally:
-        if 'db_conn' in locals():
+        if db_conn is not None:
             db_conn.close()
 
-@router.post("/feed", response_model=FeedImportResponse)
+def _product_json(row) -> dict:
+    # price is kept for existing clients; price_cents is the exact stored value.
+    product_id, title, price_cents, store_id = row
+    return {
+        "product_id": product_id, "title": title, "price": price_cents / 100,
+        "price_cents": price_cents, "store_id": store_id,
+    }
+
+def _catalog_validators(client_id: int, version: int, updated_at) -> dict:
+    headers = {"ETag": f'"c{client_id}-v{version}"', "Cache-Control": "no-cache"}
+    if updated_at is not None:
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+def _is_not_modified(request: Request, validators: dict, updated_at) -> bool:
+    # If-None-Match wins over If-Modified-Since, as in RFC 9110.
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = validators["ETag"]
+        return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or "Last-Modified" not in validators:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have whole-second precision.
+    return parsedate_to_datetime(validators["Last-Modified"]) <= since
+
+class _ConnectionStreamingResponse(StreamingResponse):
+    """
+    NDJSON StreamingResponse that owns a pooled connection. The connection is
+    released when the response ends, also when the client disconnects before
+    the first chunk was pulled and the generator never started.
+    """
+
+    def __init__(self, content, db_conn, **kwargs):
+        super().__init__(content, media_type="application/x-ndjson", **kwargs)
+        self._content = content
+        self._db_conn = db_conn
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await run_in_threadpool(self._release)
+
+    def _release(self):
+        # Closing a started generator closes its cursor before the connection goes back to the pool.
+        self._content.close()
+        self._db_conn.close()
+
+def _stream_products_ndjson(db_conn, client_id: int, after: Optional[int]):
+    try:
+        for rows in ProductRepository().iter_product_batches(db_conn, client_id, after=after):
+            yield "".join(json.dumps(_product_json(row)) + "\n" for row in rows)
+    except Exception as e:
+        # Headers are already sent, so the truncated stream is all the client sees.
+        logger.exception("Error streaming products for client %s: %s", client_id, e)
+        raise
+
+@router.post(
+    "/feed",
+    response_model=FeedImportResponse,
+    responses={202: {"model": JobAccepted, "description": "Queued as a background job"}},
+)
 async def import_feed(
     client_id: int = Query(..., description="Client ID"),
+    mode: str = Query(FeedImporter.MODE_ROW, pattern=IMPORT_MODE_PATTERN, description="Feed import mode: row or bulk"),
+    background: bool = Query(False, description="Queue the import and return 202 with a job id"),
+    force: bool = Query(False, description="Import even if this exact file was the last one applied"),
+    chunk_rows: Optional[int] = Query(None, ge=1, description="Commit every N rows with a checkpoint so a rerun of the same file resumes; defaults to APPLY_CHUNK_ROWS"),
+    duplicates: Optional[str] = Query(None, pattern=DUPLICATE_POLICY_PATTERN, description=DUPLICATES_DESCRIPTION),
     file: UploadFile = File(...),
-) -> FeedImportResponse:
+):
     """
     Import a feed CSV for the given client_id. This upserts products in the DB.
-    Returns a FeedImportResponse.
+    Returns a FeedImportResponse with the inserted and updated counts, or,
+    with background=true, a 202 JobAccepted to poll at /jobs/{job_id}.
+    Re-submitting the file last applied for the client returns the previous
+    result with skipped=true unless force=true.
+    With chunk_rows, an import that fails part-way keeps its committed
+    chunks, and uploading the same file again continues after them.
+    A product_id repeated in the file is resolved by the duplicates policy;
+    under "reject" the import fails with 422.
     """
     try:
-        csv_content = await file.read()
-        temp_file_path = f"/tmp/{file.filename}"
-        with open(temp_file_path, "wb") as f:
-            f.write(csv_content)
-
-        importer = FeedImporter(ProductRepository(), FeedCsvReader())
-        importer.import_feed(temp_file_path, client_id)
+        if background:
+            feed_path = await run_blocking(_save_job_file, file.file)
+            job = get_job_queue().submit(
+                "feed", client_id, lambda job: _run_feed_job(job, feed_path, client_id, mode, force, chunk_rows, duplicates)
+            )
+            return _job_accepted(job)
 
-        return FeedImportResponse(message="Feed imported successfully.")
+        result, skipped = await run_blocking(
+            _import_feed_once, file.file, client_id, mode, force, chunk_rows=chunk_rows, duplicates=duplicates
+        )
+        return _feed_response(result, skipped)
+    except DuplicateProductError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.exception("Error importing feed: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/portal-sync", response_model=PortalSyncResponse)
+@router.post(
+    "/portal-sync",
+    response_model=PortalSyncResponse,
+    responses={
+        202: {"model": JobAccepted, "description": "Queued as a background job"},
+        200: {"content": {"application/gzip": {}}, "description": "With dry_run=true: the sync plan file"},
+    },
+)
 async def sync_portal(
     client_id: int = Query(..., description="Client ID"),
+    engine: str = Query(PortalSynchronizer.ENGINE_PYTHON, pattern=SYNC_ENGINE_PATTERN, description="Sync engine: python, columnar or sql"),
+    background: bool = Query(False, description="Queue the sync and return 202 with a job id"),
+    force: bool = Query(False, description="Sync even if this exact file was the last one applied"),
+    chunk_rows: Optional[int] = Query(None, ge=1, description="Commit every N rows with a checkpoint so a rerun of the same file resumes; defaults to APPLY_CHUNK_ROWS"),
+    duplicates: Optional[str] = Query(None, pattern=DUPLICATE_POLICY_PATTERN, description=DUPLICATES_DESCRIPTION),
+    dry_run: bool = Query(False, description="Apply nothing; return the sync plan file for /portal-sync/apply-plan"),
     file: UploadFile = File(...),
-) -> PortalSyncResponse:
+):
     """
     Synchronize the DB with a 'portal' CSV:
       - Delete products not in CSV
       - Update changed products
       - Insert new products
 
-    Returns a PortalSyncResponse summarizing the actions.
+    Returns a PortalSyncResponse summarizing the actions, or, with
+    background=true, a 202 JobAccepted to poll at /jobs/{job_id}.
+
+    With dry_run=true nothing is changed: the response is the gzip sync
+    plan, with its counts and catalog version in X-Sync-Plan-* headers.
+
+    A product_id repeated in the file is resolved by the duplicates policy;
+    under "reject" the sync fails with 422 and changes nothing.
     """
     try:
-        csv_content = await file.read()
-        temp_file_path = f"/tmp/{file.filename}"
-        with open(temp_file_path, "wb") as f:
-            f.write(csv_content)
-
-        synchronizer = PortalSynchronizer()
-        portal_records = synchronizer.read_portal_csv(temp_file_path)
-        if not portal_records:
-            return PortalSyncResponse(message="No valid portal records found.", deleted=0, inserted=0, updated=0)
+        if dry_run:
+            plan = await run_blocking(
+                PortalSynchronizer(engine=engine, chunk_size=UPLOAD_CHUNK_SIZE, duplicates=duplicates).plan,
+                file.file, client_id
+            )
+            return _plan_response(plan)
 
-        db_products = synchronizer.fetch_db_products(client_id)
-        to_delete, to_insert, to_update = synchronizer.compute_sync_actions(db_products, portal_records)
-        synchronizer.apply_sync_actions(client_id, to_delete, to_insert, to_update)
+        if background:
+            portal_path = await run_blocking(_save_job_file, file.file)
+            job = get_job_queue().submit(
+                "portal-sync", client_id,
+                lambda job: _run_sync_job(job, portal_path, client_id, engine, force, chunk_rows, duplicates)
+            )
+            return _job_accepted(job)
 
-        return PortalSyncResponse(
-            message="Portal synchronization completed.",
-            deleted=len(to_delete),
-            inserted=len(to_insert),
-            updated=len(to_update)
+        result, skipped = await run_blocking(
+            _sync_portal_once, file.file, client_id, engine, force, chunk_rows=chunk_rows, duplicates=duplicates
         )
+        return _sync_response(result, "Portal synchronization completed.", skipped)
+    except DuplicateProductError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.exception("Error during portal sync: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/feed-and-sync", response_model=PortalSyncResponse)
+@router.post(
+    "/portal-sync/apply-plan",
+    response_model=PortalSyncResponse,
+    responses={409: {"description": "The catalog changed since the plan was made"}},
+)
+async def apply_sync_plan(
+    client_id: int = Query(..., description="Client ID; must match the plan"),
+    file: UploadFile = File(..., description="Sync plan from /portal-sync?dry_run=true or cli.py --dry-run"),
+):
+    """
+    Apply a sync plan made earlier, in one transaction. Fails with 409 and
+    changes nothing if the client's catalog changed since the plan was made.
+    """
+    try:
+        plan = await run_blocking(SyncPlan.read, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if plan.client_id != client_id:
+        raise HTTPException(status_code=400, detail=f"The plan is for client {plan.client_id}, not {client_id}")
+    try:
+        result = await run_blocking(_apply_plan_once, plan)
+        return _sync_response(result, "Sync plan applied.")
+    except PlanDriftError as e:
+        raise HTTPException(status_code=409, detail=f"Sync plan is stale: {e}")
+    except Exception as e:
+        logger.exception("Error applying sync plan: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post(
+    "/feed-and-sync",
+    response_model=PortalSyncResponse,
+    responses={202: {"model": JobAccepted, "description": "Queued as a background job"}},
+)
 async def feed_and_sync(
     client_id: int = Query(..., description="Client ID"),
+    mode: str = Query(FeedImporter.MODE_ROW, pattern=IMPORT_MODE_PATTERN, description="Feed import mode: row or bulk"),
+    engine: str = Query(PortalSynchronizer.ENGINE_PYTHON, pattern=SYNC_ENGINE_PATTERN, description="Sync engine: python, columnar or sql"),
+    background: bool = Query(False, description="Queue the import and sync and return 202 with a job id"),
+    force: bool = Query(False, description="Run even if this exact pair of files was the last one applied"),
+    chunk_rows: Optional[int] = Query(None, ge=1, description="Commit every N rows with a checkpoint so a rerun of the same file resumes; defaults to APPLY_CHUNK_ROWS"),
+    duplicates: Optional[str] = Query(None, pattern=DUPLICATE_POLICY_PATTERN, description=DUPLICATES_DESCRIPTION),
     feed_file: UploadFile = File(...),
     portal_file: UploadFile = File(...),
-) -> PortalSyncResponse:
+):
     """
     Single endpoint that:
       1) Imports a feed CSV (upserting products)
       2) Synchronizes the DB with a 'portal' CSV
-    Returns a PortalSyncResponse summarizing the final sync actions.
+    Returns a PortalSyncResponse summarizing the final sync actions, or, with
+    background=true, a 202 JobAccepted to poll at /jobs/{job_id}.
     """
     try:
-        feed_csv_content = await feed_file.read()
-        feed_temp_file = f"/tmp/{feed_file.filename}"
-        with open(feed_temp_file, "wb") as f:
-            f.write(feed_csv_content)
+        if background:
+            feed_path = await run_blocking(_save_job_file, feed_file.file)
+            portal_path = await run_blocking(_save_job_file, portal_file.file)
+            job = get_job_queue().submit(
+                "feed-and-sync", client_id,
+                lambda job: _run_feed_and_sync_job(
+                    job, feed_path, portal_path, client_id, mode, engine, force, chunk_rows, duplicates
+                )
+            )
+            return _job_accepted(job)
 
-        importer = FeedImporter(ProductRepository(), FeedCsvReader())
-        importer.import_feed(feed_temp_file, client_id)
+        _, result, skipped = await run_blocking(
+            _feed_and_sync_once, feed_file.file, portal_file.file, client_id, mode, engine, force,
+            chunk_rows=chunk_rows, duplicates=duplicates
+        )
+        return _sync_response(result, "Feed import + Portal synchronization completed.", skipped)
+    except DuplicateProductError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.exception("Error during feed-and-sync: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _import_feed_once(source, client_id: int, mode: str, force: bool, progress=None, chunk_rows=None,
+                      duplicates=None):
+    importer = FeedImporter(
+        ProductRepository(), FeedCsvReader(chunk_size=UPLOAD_CHUNK_SIZE), mode=mode, chunk_rows=chunk_rows,
+        duplicates=duplicates
+    )
+    result, skipped = AppliedFileManifest().run_once(
+        client_id, ROLE_FEED, [source],
+        lambda: importer.import_feed(source, client_id, progress=progress).to_dict(),
+        force=force
+    )
+    return FeedImportResult(**result), skipped
 
-        portal_csv_content = await portal_file.read()
-        portal_temp_file = f"/tmp/{portal_file.filename}"
-        with open(portal_temp_file, "wb") as f:
-            f.write(portal_csv_content)
+def _sync_portal_once(source, client_id: int, engine: str, force: bool, chunk_rows=None, duplicates=None):
+    synchronizer = PortalSynchronizer(
+        engine=engine, chunk_size=UPLOAD_CHUNK_SIZE, chunk_rows=chunk_rows, duplicates=duplicates
+    )
+    result, skipped = AppliedFileManifest().run_once(
+        client_id, ROLE_PORTAL, [source],
+        lambda: synchronizer.synchronize(source, client_id).to_dict(),
+        force=force
+    )
+    return PortalSyncResult(**result), skipped
+
+def _apply_plan_once(plan: SyncPlan) -> PortalSyncResult:
+    result = PortalSynchronizer().apply_plan(plan)
+    if plan.source_digest:
+        # The catalog now matches the planned portal file, as after a regular sync of it.
+        AppliedFileManifest().record(plan.client_id, ROLE_PORTAL, plan.source_digest, result.to_dict())
+    return result
+
+def _feed_and_sync_once(feed_source, portal_source, client_id: int, mode: str, engine: str, force: bool,
+                        progress=None, on_stage=None, chunk_rows=None, duplicates=None):
+    def apply():
+        importer = FeedImporter(
+            ProductRepository(), FeedCsvReader(chunk_size=UPLOAD_CHUNK_SIZE), mode=mode, chunk_rows=chunk_rows,
+            duplicates=duplicates
+        )
+        feed_result = importer.import_feed(feed_source, client_id, progress=progress)
+        if on_stage:
+            on_stage("portal_sync")
+        synchronizer = PortalSynchronizer(
+            engine=engine, chunk_size=UPLOAD_CHUNK_SIZE, chunk_rows=chunk_rows, duplicates=duplicates
+        )
+        sync_result = synchronizer.synchronize(portal_source, client_id)
+        return {"feed": feed_result.to_dict(), "sync": sync_result.to_dict()}
 
-        synchronizer = PortalSynchronizer()
-        portal_records = synchronizer.read_portal_csv(portal_temp_file)
-        if not portal_records:
-            return PortalSyncResponse(message="No valid portal records found.", deleted=0, inserted=0, updated=0)
+    results, skipped = AppliedFileManifest().run_once(
+        client_id, ROLE_FEED_AND_SYNC, [feed_source, portal_source], apply, force=force
+    )
+    return FeedImportResult(**results["feed"]), PortalSyncResult(**results["sync"]), skipped
 
-        db_products = synchronizer.fetch_db_products(client_id)
-        to_delete, to_insert, to_update = synchronizer.compute_sync_actions(db_products, portal_records)
-        synchronizer.apply_sync_actions(client_id, to_delete, to_insert, to_update)
+def _feed_response(result, skipped: bool = False) -> FeedImportResponse:
+    return FeedImportResponse(
+        message="Identical feed already applied; previous result returned." if skipped
+        else "Feed imported successfully.",
+        inserted=result.inserted,
+        updated=result.updated,
+        unchanged=result.unchanged,
+        duplicates=result.duplicates,
+        skipped=skipped
+    )
 
+def _sync_response(result, message: str, skipped: bool = False) -> PortalSyncResponse:
+    if not result.received:
         return PortalSyncResponse(
-            message="Feed import + Portal synchronization completed.",
-            deleted=len(to_delete),
-            inserted=len(to_insert),
-            updated=len(to_update)
+            message="No valid portal records found.", deleted=0, inserted=0, updated=0, skipped=skipped
         )
-    except Exception as e:
-        logger.exception("Error during feed-and-sync: %s", e)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+    if skipped:
+        message = "Identical files already applied; previous result returned."
+    return PortalSyncResponse(
+        message=message,
+        deleted=result.deleted,
+        inserted=result.inserted,
+        updated=result.updated,
+        unchanged=result.unchanged,
+        duplicates=result.duplicates,
+        skipped=skipped
+    )
+
+def _plan_response(plan: SyncPlan) -> Response:
+    headers = {
+        "Content-Disposition": f'attachment; filename="sync-plan-{plan.client_id}-v{plan.catalog_version}.jsonl.gz"',
+        f"{PLAN_HEADER_PREFIX}Catalog-Version": str(plan.catalog_version),
+    }
+    for name, count in plan.counts.items():
+        headers[f"{PLAN_HEADER_PREFIX}{name.capitalize()}"] = str(count)
+    return Response(content=plan.to_bytes(), media_type="application/gzip", headers=headers)
+
+def _job_accepted(job) -> JSONResponse:
+    accepted = JobAccepted(job_id=job.id, state=job.state, status_url=f"/jobs/{job.id}")
+    return JSONResponse(status_code=202, content=accepted.model_dump())
+
+def _run_feed_job(job, feed_path: str, client_id: int, mode: str, force: bool, chunk_rows=None,
+                  duplicates=None) -> dict:
+    try:
+        job.update_progress(stage="feed_import", feed_records_processed=0)
+        result, skipped = _import_feed_once(
+            feed_path, client_id, mode, force,
+            progress=lambda processed: job.update_progress(feed_records_processed=processed),
+            chunk_rows=chunk_rows, duplicates=duplicates
+        )
+        job.update_progress(stage="done")
+        return _feed_response(result, skipped).model_dump()
+    finally:
+        os.remove(feed_path)
+
+def _run_sync_job(job, portal_path: str, client_id: int, engine: str, force: bool, chunk_rows=None,
+                  duplicates=None) -> dict:
+    try:
+        job.update_progress(stage="portal_sync")
+        result, skipped = _sync_portal_once(
+            portal_path, client_id, engine, force, chunk_rows=chunk_rows, duplicates=duplicates
+        )
+        job.update_progress(stage="done")
+        return _sync_response(result, "Portal synchronization completed.", skipped).model_dump()
+    finally:
+        os.remove(portal_path)
+
+def _run_feed_and_sync_job(job, feed_path: str, portal_path: str, client_id: int, mode: str, engine: str,
+                           force: bool, chunk_rows=None, duplicates=None) -> dict:
+    try:
+        job.update_progress(stage="feed_import", feed_records_processed=0)
+        feed_result, sync_result, skipped = _feed_and_sync_once(
+            feed_path, portal_path, client_id, mode, engine, force,
+            progress=lambda processed: job.update_progress(feed_records_processed=processed),
+            on_stage=lambda stage: job.update_progress(stage=stage),
+            chunk_rows=chunk_rows, duplicates=duplicates
+        )
+        job.update_progress(stage="done", feed_result=_feed_response(feed_result, skipped).model_dump())
+        return _sync_response(sync_result, "Feed import + Portal synchronization completed.", skipped).model_dump()
+    finally:
+        os.remove(feed_path)
+        os.remove(portal_path)
+
+def _save_job_file(upload_stream) -> str:
+    # Job files outlive the request, so each one gets its own unique path.
+    fd, path = tempfile.mkstemp(prefix="catalog-job-", suffix=".csv")
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(upload_stream, f, UPLOAD_CHUNK_SIZE)
+    return path
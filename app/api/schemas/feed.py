@@ -2,3 +2,8 @@ from pydantic import BaseModel
 
 class FeedImportResponse(BaseModel):
     message: str
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    duplicates: int = 0
+    skipped: bool = False
@@ -0,0 +1,21 @@
+from typing import Optional
+from pydantic import BaseModel
+
+class JobAccepted(BaseModel):
+    job_id: str
+    state: str
+    status_url: str
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    client_id: int
+    state: str
+    progress: dict
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    queued_seconds: float
+    run_seconds: Optional[float] = None
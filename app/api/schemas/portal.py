@@ -5,3 +5,6 @@ class PortalSyncResponse(BaseModel):
     deleted: int
     inserted: int
     updated: int
+    unchanged: int = 0
+    duplicates: int = 0
+    skipped: bool = False
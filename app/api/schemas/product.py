@@ -4,4 +4,5 @@ class ProductOut(BaseModel):
     product_id: int
     title: str
     price: float
+    price_cents: int
     store_id: int
@@ -1,35 +1,145 @@
 import os
 import logging
+import threading
+import time
 import unittest
 from pathlib import Path
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 
 from app.api.endpoints.products import router as products_router
+from app.api.endpoints.jobs import router as jobs_router
+from app.api.concurrency import shutdown_executor
+from app.readiness import Readiness
+from db.connection import DatabaseConnection
+from services.catalog_cache import get_catalog_cache
+from services.job_queue import shutdown_job_queue
+from services.metrics import REGISTRY, REQUEST_SECONDS
 from services.table_creator import TableCreator
 from services.feed_importer import FeedImporter
 from services.csv_reader import FeedCsvReader
+from services.logging_support import configure_logging
 from repository.product_repository import ProductRepository
 
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
+configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_app() -> FastAPI:
-    """Factory to create and configure the FastAPI application."""
+STARTUP_MODE_DEV = "dev"
+STARTUP_MODE_FAST = "fast"
+STARTUP_MODES = (STARTUP_MODE_DEV, STARTUP_MODE_FAST)
+
+DEFAULT_SEED_FEED = str(Path(__file__).resolve().parent.parent / "feed_items.csv")
+
+def _seed_feed(seed_path: str):
+    if not seed_path:
+        return
+    if not Path(seed_path).is_file():
+        logger.warning(f"Startup: No feed CSV found at {seed_path}. Skipping feed import.")
+        return
+    logger.info(f"Startup: Populating database from {seed_path} ...")
+    importer = FeedImporter(ProductRepository(), FeedCsvReader())
+    importer.import_feed(seed_path, client_id=1)
+    logger.info("Startup: Database populated with feed CSV.")
+
+def _warm_up(readiness: Readiness, seed_path: str):
+    """
+    Fast-start warm-up: one cached table check, then the optional seed import.
+    """
+    try:
+        readiness.set_stage("tables")
+        if not TableCreator().ensure_tables():
+            raise RuntimeError("table check failed")
+        if seed_path:
+            readiness.set_stage("seed")
+            _seed_feed(seed_path)
+    except Exception as e:
+        readiness.mark_failed(str(e))
+        return
+    readiness.mark_ready()
+
+def _client_id_label(route, client_id) -> str:
+    # Only routes that take a client_id, and only integers, so callers cannot mint label values at will.
+    dependant = getattr(route, "dependant", None)
+    if dependant is None or not any(param.name == "client_id" for param in dependant.query_params):
+        return ""
+    try:
+        return str(int(client_id))
+    except (TypeError, ValueError):
+        return ""
+
+def create_app(startup_mode: str = None, seed_path: str = None) -> FastAPI:
+    """
+    Factory to create and configure the FastAPI application.
+
+    startup_mode (APP_STARTUP_MODE) is "dev" by default: tables are checked,
+    the unittest suite runs and the sample feed is imported before traffic
+    is served. "fast" skips the self-test and does the table check and
+    seeding on a background thread; /ready reports when that is done.
+    seed_path (STARTUP_SEED_FEED) defaults to feed_items.csv; empty disables seeding.
+    """
+    startup_mode = startup_mode or os.getenv("APP_STARTUP_MODE", STARTUP_MODE_DEV)
+    if startup_mode not in STARTUP_MODES:
+        raise ValueError(f"Unknown startup mode '{startup_mode}', expected one of {STARTUP_MODES}")
+    if seed_path is None:
+        seed_path = os.getenv("STARTUP_SEED_FEED", DEFAULT_SEED_FEED)
+
     app = FastAPI(title="Product Catalog Sync")
+    readiness = Readiness()
+    app.state.readiness = readiness
 
     app.include_router(products_router, prefix="/products", tags=["Products"])
+    app.include_router(jobs_router, prefix="/jobs", tags=["Jobs"])
+
+    @app.middleware("http")
+    async def record_request_metrics(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Only matched routes are recorded, by their template, so /jobs/{job_id}
+        # is one series and unknown paths cannot add series at all.
+        route = request.scope.get("route")
+        if route is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=request.method,
+                endpoint=route.path,
+                status=response.status_code,
+                client_id=_client_id_label(route, request.query_params.get("client_id"))
+            )
+        return response
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
     @app.get("/health")
     def health_check():
         return {"status": "ok"}
 
+    @app.get("/ready")
+    def ready_check():
+        return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.to_dict())
+
+    @app.get("/health/db-pool")
+    def db_pool_stats():
+        return DatabaseConnection().pool_stats()
+
+    @app.get("/health/catalog-cache")
+    def catalog_cache_stats():
+        return get_catalog_cache().stats()
+
     @app.on_event("startup")
     async def startup_event():
+        if startup_mode == STARTUP_MODE_FAST:
+            # Serve traffic right away; /ready turns 200 once this thread is done.
+            threading.Thread(
+                target=_warm_up, args=(readiness, seed_path), name="catalog-warmup", daemon=True
+            ).start()
+            return
 
-        TableCreator().create_tables()
+        TableCreator().ensure_tables()
         logger.info("Startup: Ensured tables exist.")
 
         tests_dir = Path(__file__).resolve().parent.parent / "tests"
@@ -43,14 +153,15 @@ def create_app() -> FastAPI:
         else:
             logger.info("Startup: All unit tests PASSED successfully!")
 
-        feed_csv_path = Path(__file__).resolve().parent.parent / "feed_items.csv"
-        if feed_csv_path.is_file():
-            logger.info(f"Startup: Populating database from {feed_csv_path} ...")
-            importer = FeedImporter(ProductRepository(), FeedCsvReader())
-            importer.import_feed(str(feed_csv_path), client_id=1)
-            logger.info("Startup: Database populated with feed CSV after tests.")
-        else:
-            logger.warning(f"Startup: No feed CSV found at {feed_csv_path}. Skipping feed import.")
+        _seed_feed(seed_path)
+        readiness.mark_ready()
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        shutdown_job_queue()
+        shutdown_executor()
+        DatabaseConnection.close_pools()
+        logger.info("Shutdown: Closed database connection pools.")
 
     return app
 
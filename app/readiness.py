@@ -0,0 +1,56 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """
+    Tracks the API's warm-up. /health only says the process is alive;
+    /ready reports this state and only succeeds once warm-up has finished.
+    """
+
+    STATE_STARTING = "starting"
+    STATE_READY = "ready"
+    STATE_FAILED = "failed"
+
+    def __init__(self):
+        self.state = self.STATE_STARTING
+        self.stage = None
+        self.error = None
+        self.started_at = time.time()
+        self.ready_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == self.STATE_READY
+
+    def set_stage(self, stage: str):
+        with self._lock:
+            self.stage = stage
+        logger.info("Warm-up: %s", stage)
+
+    def mark_ready(self):
+        with self._lock:
+            self.state = self.STATE_READY
+            self.stage = None
+            self.ready_at = time.time()
+        logger.info("Warm-up finished after %.2fs.", self.ready_at - self.started_at)
+
+    def mark_failed(self, error: str):
+        with self._lock:
+            self.state = self.STATE_FAILED
+            self.error = error
+        logger.error("Warm-up failed during %s: %s", self.stage, error)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            end = self.ready_at or time.time()
+            return {
+                "status": self.state,
+                "stage": self.stage,
+                "error": self.error,
+                "warmup_seconds": round(end - self.started_at, 3),
+            }
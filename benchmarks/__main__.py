@@ -0,0 +1,154 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from benchmarks.generator import CatalogSpec, generate_catalog
+from benchmarks.layout import default_layouts, format_layout_report, run_layout_benchmark
+from benchmarks.parsing import format_parse_report, run_parse_benchmark
+from benchmarks.suite import compare_reports, format_comparison, run_suite
+from services.feed_importer import FeedImporter
+from services.logging_support import configure_logging
+from services.portal_synchronizer import PortalSynchronizer
+
+configure_logging(logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def ratio(value):
+    number = float(value)
+    if not 0 <= number <= 1:
+        raise argparse.ArgumentTypeError(f"expected a ratio between 0 and 1, got {value}")
+    return number
+
+
+def _add_catalog_arguments(parser):
+    parser.add_argument("--rows", type=int, default=10000, help="Feed size in products")
+    parser.add_argument("--change-ratio", type=ratio, default=0.1, help="Share of products changed in the portal")
+    parser.add_argument("--insert-ratio", type=ratio, default=0.05, help="Share of new products in the portal")
+    parser.add_argument("--delete-ratio", type=ratio, default=0.05, help="Share of products missing from the portal")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed gives identical files")
+
+
+def _spec_from_args(args) -> CatalogSpec:
+    return CatalogSpec(
+        rows=args.rows,
+        change_ratio=args.change_ratio,
+        insert_ratio=args.insert_ratio,
+        delete_ratio=args.delete_ratio,
+        seed=args.seed
+    )
+
+
+def _load_report(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _print_comparison(current: dict, baseline_path: str, tolerance: float) -> bool:
+    rows = compare_reports(current, _load_report(baseline_path), tolerance)
+    print(format_comparison(rows))
+    return any(regressed for *_, regressed in rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Catalog sync benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a synthetic feed/portal pair")
+    _add_catalog_arguments(generate)
+    generate.add_argument("--feed", required=True, help="Output path of the feed CSV")
+    generate.add_argument("--portal", required=True, help="Output path of the portal CSV")
+
+    run = commands.add_parser("run", help="Generate a catalog and run the benchmarks")
+    _add_catalog_arguments(run)
+    run.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best one is reported")
+    run.add_argument("--db", action="store_true", help="Also run the benchmarks that need a local Postgres")
+    run.add_argument(
+        "--modes", nargs="+", choices=FeedImporter.MODES, default=list(FeedImporter.MODES),
+        help="Feed import modes to benchmark with --db"
+    )
+    run.add_argument(
+        "--parse-workers", type=int, default=0, help="Also time parsing the feed on this many processes"
+    )
+    run.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON report")
+    run.add_argument("--baseline", help="Compare against this earlier report and fail on regressions")
+    run.add_argument("--tolerance", type=ratio, default=0.1, help="Allowed throughput loss before flagging")
+
+    layout = commands.add_parser(
+        "layout", help="Compare per-client sync time on the plain and hash-partitioned products layouts (needs Postgres)"
+    )
+    _add_catalog_arguments(layout)
+    layout.add_argument("--clients", type=int, default=8, help="Clients loaded into the table before timing one")
+    layout.add_argument("--partitions", type=int, default=8, help="Hash partitions of the partitioned layout")
+    layout.add_argument("--fillfactor", type=int, help="fillfactor of the partitioned layout, e.g. 90")
+    layout.add_argument(
+        "--engine", choices=PortalSynchronizer.ENGINES, default=PortalSynchronizer.ENGINE_SQL,
+        help="Portal sync engine to time"
+    )
+    layout.add_argument("--repeat", type=int, default=3, help="Runs per layout; the best one is reported")
+    layout.add_argument("--output", default="layout-benchmark.json", help="Where to write the JSON report")
+    layout.add_argument("--keep", action="store_true", help="Keep the benchmark schemas for inspection")
+
+    parse = commands.add_parser(
+        "parse", help="Compare rows per second of the csv.DictReader loop and the shared parsing core"
+    )
+    _add_catalog_arguments(parse)
+    parse.add_argument("--repeat", type=int, default=3, help="Runs per parser; the best one is reported")
+    parse.add_argument("--output", default="parse-benchmark.json", help="Where to write the JSON report")
+
+    compare = commands.add_parser("compare", help="Compare two JSON reports")
+    compare.add_argument("current", help="Report to check")
+    compare.add_argument("baseline", help="Report to compare against")
+    compare.add_argument("--tolerance", type=ratio, default=0.1, help="Allowed throughput loss before flagging")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "compare":
+        regressed = _print_comparison(_load_report(args.current), args.baseline, args.tolerance)
+        sys.exit(1 if regressed else 0)
+
+    if args.command == "generate":
+        catalog = generate_catalog(_spec_from_args(args), args.feed, args.portal)
+        logger.info("Generated %s", catalog.to_dict())
+        return
+
+    with tempfile.TemporaryDirectory(prefix="catalog-bench-") as workdir:
+        catalog = generate_catalog(
+            _spec_from_args(args), os.path.join(workdir, "feed.csv"), os.path.join(workdir, "portal.csv")
+        )
+        if args.command == "layout":
+            report = run_layout_benchmark(
+                catalog, default_layouts(args.partitions, args.fillfactor),
+                clients=args.clients, repeat=args.repeat, engine=args.engine, keep=args.keep
+            )
+        elif args.command == "parse":
+            report = run_parse_benchmark(catalog, repeat=args.repeat)
+        else:
+            report = run_suite(
+                catalog, repeat=args.repeat, with_db=args.db, modes=args.modes, parse_workers=args.parse_workers
+            )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logger.info("Benchmark report written to %s", args.output)
+
+    if args.command == "layout":
+        print(format_layout_report(report))
+        return
+    if args.command == "parse":
+        print(format_parse_report(report))
+        return
+
+    if args.baseline and _print_comparison(report, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
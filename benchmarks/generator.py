@@ -0,0 +1,139 @@
+import csv
+import random
+
+CSV_HEADER = ("product_id", "title", "price", "store_id")
+
+_ADJECTIVES = ("Basic", "Classic", "Compact", "Deluxe", "Eco", "Mini", "Pro", "Smart", "Ultra", "Vintage")
+_NOUNS = ("Blender", "Chair", "Desk", "Headphones", "Kettle", "Lamp", "Monitor", "Router", "Speaker", "Toaster")
+
+
+class CatalogSpec:
+    """
+    Describes a synthetic feed/portal pair. The feed holds `rows` products;
+    the portal is derived from it by deleting, changing and adding products
+    in the given ratios (each relative to `rows`). The same spec always
+    produces byte-identical files.
+    """
+
+    def __init__(self, rows: int, change_ratio: float = 0.1, insert_ratio: float = 0.05,
+                 delete_ratio: float = 0.05, stores: int = 50, seed: int = 42):
+        if rows < 1:
+            raise ValueError(f"rows must be positive, got {rows}")
+        for name, ratio in (("change_ratio", change_ratio), ("insert_ratio", insert_ratio),
+                            ("delete_ratio", delete_ratio)):
+            if not 0 <= ratio <= 1:
+                raise ValueError(f"{name} must be between 0 and 1, got {ratio}")
+        if change_ratio + delete_ratio > 1:
+            raise ValueError("change_ratio + delete_ratio must not exceed 1")
+        self.rows = rows
+        self.change_ratio = change_ratio
+        self.insert_ratio = insert_ratio
+        self.delete_ratio = delete_ratio
+        self.stores = stores
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "change_ratio": self.change_ratio,
+            "insert_ratio": self.insert_ratio,
+            "delete_ratio": self.delete_ratio,
+            "stores": self.stores,
+            "seed": self.seed,
+        }
+
+    def __repr__(self):
+        return (f"<CatalogSpec(rows={self.rows},"
+                f"change={self.change_ratio},"
+                f"insert={self.insert_ratio},"
+                f"delete={self.delete_ratio},"
+                f"seed={self.seed})>")
+
+
+class GeneratedCatalog:
+    """
+    Paths of a generated feed/portal pair and the exact number of portal
+    rows that delete, change, insert or keep a feed product.
+    """
+
+    def __init__(self, spec: CatalogSpec, feed_path: str, portal_path: str,
+                 deleted: int, changed: int, inserted: int, unchanged: int):
+        self.spec = spec
+        self.feed_path = feed_path
+        self.portal_path = portal_path
+        self.deleted = deleted
+        self.changed = changed
+        self.inserted = inserted
+        self.unchanged = unchanged
+
+    @property
+    def portal_rows(self) -> int:
+        return self.changed + self.inserted + self.unchanged
+
+    def to_dict(self) -> dict:
+        return {
+            **self.spec.to_dict(),
+            "deleted": self.deleted,
+            "changed": self.changed,
+            "inserted": self.inserted,
+            "unchanged": self.unchanged,
+        }
+
+
+def _random_product(rng: random.Random, product_id: int, stores: int) -> tuple:
+    title = f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {product_id}"
+    return product_id, title, rng.randint(100, 99999) / 100, rng.randint(1, stores)
+
+
+def _changed_product(rng: random.Random, product: tuple, stores: int) -> tuple:
+    product_id, title, price, store_id = product
+    field = rng.randrange(3)
+    if field == 0:
+        title = f"{title} v2"
+    elif field == 1:
+        price = round(price + 1, 2)
+    else:
+        store_id = store_id % stores + 1
+    return product_id, title, price, store_id
+
+
+def _write_row(writer, product: tuple):
+    product_id, title, price, store_id = product
+    writer.writerow((product_id, title, f"{price:.2f}", store_id))
+
+
+def generate_catalog(spec: CatalogSpec, feed_path: str, portal_path: str) -> GeneratedCatalog:
+    """
+    Writes the feed and portal CSVs described by spec, streaming both files
+    so multi-million row catalogs never need to fit in memory.
+    """
+    product_rng = random.Random(spec.seed)
+    portal_rng = random.Random(spec.seed + 1)
+    deleted = changed = unchanged = 0
+
+    with open(feed_path, 'w', encoding='utf-8', newline='') as feed_file, \
+            open(portal_path, 'w', encoding='utf-8', newline='') as portal_file:
+        feed_writer = csv.writer(feed_file)
+        portal_writer = csv.writer(portal_file)
+        feed_writer.writerow(CSV_HEADER)
+        portal_writer.writerow(CSV_HEADER)
+
+        for product_id in range(1, spec.rows + 1):
+            product = _random_product(product_rng, product_id, spec.stores)
+            _write_row(feed_writer, product)
+
+            draw = portal_rng.random()
+            if draw < spec.delete_ratio:
+                deleted += 1
+            elif draw < spec.delete_ratio + spec.change_ratio:
+                _write_row(portal_writer, _changed_product(portal_rng, product, spec.stores))
+                changed += 1
+            else:
+                _write_row(portal_writer, product)
+                unchanged += 1
+
+        inserted = int(spec.rows * spec.insert_ratio)
+        for product_id in range(spec.rows + 1, spec.rows + inserted + 1):
+            _write_row(portal_writer, _random_product(portal_rng, product_id, spec.stores))
+
+    return GeneratedCatalog(spec, feed_path, portal_path, deleted, changed, inserted, unchanged)
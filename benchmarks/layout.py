@@ -0,0 +1,142 @@
+import logging
+import os
+
+from benchmarks.suite import BENCHMARK_CLIENT_ID, measure
+from db.connection import DatabaseConnection
+from repository.product_repository import ProductRepository
+from services.csv_reader import FeedCsvReader
+from services.feed_importer import FeedImporter
+from services.portal_synchronizer import PortalSynchronizer
+from services.table_creator import TableCreator
+
+logger = logging.getLogger(__name__)
+
+db_connection = DatabaseConnection()
+
+LAYOUT_PLAIN = "plain"
+LAYOUT_HASH = "hash"
+
+
+class LayoutSpec:
+    """
+    One products table layout to benchmark; partitions=0 is the single heap.
+    """
+
+    def __init__(self, name: str, partitions: int = 0, fillfactor: int = None):
+        self.name = name
+        self.partitions = partitions
+        self.fillfactor = fillfactor
+
+    @property
+    def schema(self) -> str:
+        return f"bench_layout_{self.name}"
+
+    def to_dict(self) -> dict:
+        return {"partitions": self.partitions, "fillfactor": self.fillfactor}
+
+
+def default_layouts(partitions: int, fillfactor: int = None) -> list:
+    """
+    The layout in use today against the hash-partitioned, tuned one.
+    """
+    return [
+        LayoutSpec(LAYOUT_PLAIN),
+        LayoutSpec(LAYOUT_HASH, partitions=partitions, fillfactor=fillfactor),
+    ]
+
+
+def _execute(sql: str):
+    conn = db_connection.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _use_schema(schema):
+    """
+    Points every new connection of this process at schema (or back at the
+    default search_path when schema is None). Pooled connections keep their
+    settings, so the pools are closed first.
+    """
+    DatabaseConnection.close_pools()
+    if schema is None:
+        os.environ.pop("PGOPTIONS", None)
+    else:
+        os.environ["PGOPTIONS"] = f"-c search_path={schema},public"
+
+
+def bench_layout(catalog, layout: LayoutSpec, clients: int, repeat: int, engine: str) -> dict:
+    """
+    Loads the feed for `clients` clients into a products table built in the
+    given layout and times the portal sync of one of them. The other clients
+    only make the table realistically large.
+    """
+    _execute(f"DROP SCHEMA IF EXISTS {layout.schema} CASCADE; CREATE SCHEMA {layout.schema}")
+    previous_options = os.environ.get("PGOPTIONS")
+    _use_schema(layout.schema)
+    try:
+        if not TableCreator(partitions=layout.partitions, fillfactor=layout.fillfactor).create_tables():
+            raise RuntimeError(f"could not create the {layout.name} layout")
+
+        importer = FeedImporter(ProductRepository(), FeedCsvReader(), mode=FeedImporter.MODE_BULK)
+        for offset in range(clients):
+            importer.import_feed(catalog.feed_path, BENCHMARK_CLIENT_ID + offset)
+
+        synchronizer = PortalSynchronizer(engine=engine)
+
+        def setup():
+            with db_connection.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM products WHERE client_id = %s", (BENCHMARK_CLIENT_ID,))
+            importer.import_feed(catalog.feed_path, BENCHMARK_CLIENT_ID)
+            return ()
+
+        def run():
+            result = synchronizer.synchronize(catalog.portal_path, BENCHMARK_CLIENT_ID)
+            return result.deleted + result.inserted + result.updated
+
+        result = measure(f"portal_sync[{layout.name}]", run, setup=setup, repeat=repeat)
+        return {"layout": layout.to_dict(), "clients": clients, **result.to_dict()}
+    finally:
+        _use_schema(None)
+        if previous_options is not None:
+            os.environ["PGOPTIONS"] = previous_options
+
+
+def run_layout_benchmark(catalog, layouts: list, clients: int = 8, repeat: int = 3,
+                         engine: str = PortalSynchronizer.ENGINE_SQL, keep: bool = False) -> dict:
+    """
+    Runs bench_layout() for every layout, each in its own schema, and
+    returns the report. The schemas are dropped afterwards unless keep.
+    """
+    results = {}
+    try:
+        for layout in layouts:
+            results[layout.name] = bench_layout(catalog, layout, clients, repeat, engine)
+    finally:
+        if not keep:
+            for layout in layouts:
+                _execute(f"DROP SCHEMA IF EXISTS {layout.schema} CASCADE")
+    return {"meta": {"catalog": catalog.to_dict(), "engine": engine, "repeat": repeat}, "results": results}
+
+
+def format_layout_report(report: dict) -> str:
+    """
+    One line per layout with its best per-client sync time and the speedup
+    relative to the first layout.
+    """
+    results = list(report["results"].items())
+    if not results:
+        return "no layouts benchmarked"
+    baseline = results[0][1]["best_seconds"]
+    lines = [f"{'layout':<12} {'partitions':>10} {'fillfactor':>10} {'best s':>10} {'speedup':>8}"]
+    for name, result in results:
+        speedup = baseline / result["best_seconds"] if result["best_seconds"] else 0.0
+        lines.append(
+            f"{name:<12} {result['layout']['partitions']:>10} {str(result['layout']['fillfactor'] or '-'):>10} "
+            f"{result['best_seconds']:>10.4f} {speedup:>7.2f}x"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,67 @@
+import csv
+import logging
+
+from benchmarks.suite import measure
+from services.csv_reader import iter_product_column_blocks, iter_product_records, parse_product_row
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_with_dictreader(path) -> int:
+    # The per-row csv.DictReader loop the readers used before the shared parsing core; kept as the baseline.
+    parsed = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                parse_product_row(row)
+            except (ValueError, KeyError):
+                continue
+            parsed += 1
+    return parsed
+
+
+def _parse_positional(path) -> int:
+    with open(path, 'r', encoding='utf-8') as f:
+        return sum(1 for _ in iter_product_records(f))
+
+
+def _parse_column_blocks(path) -> int:
+    with open(path, 'r', encoding='utf-8') as f:
+        return sum(len(block[0]) for block in iter_product_column_blocks(f))
+
+
+PARSERS = (
+    ("dictreader", _parse_with_dictreader),
+    ("positional", _parse_positional),
+    ("numpy_blocks", _parse_column_blocks),
+)
+
+
+def run_parse_benchmark(catalog, repeat: int = 3) -> dict:
+    """
+    Times every parser over the generated feed file and returns the report.
+    """
+    results = {}
+    for name, parse in PARSERS:
+        result = measure(f"csv_parse[{name}]", lambda: parse(catalog.feed_path), repeat=repeat)
+        results[name] = result.to_dict()
+    return {"meta": {"catalog": catalog.to_dict(), "repeat": repeat}, "results": results}
+
+
+def format_parse_report(report: dict) -> str:
+    """
+    One line per parser with its rows per second and the speedup relative
+    to the first (csv.DictReader) parser.
+    """
+    results = list(report["results"].items())
+    if not results:
+        return "no parsers benchmarked"
+    baseline = results[0][1]["rows_per_second"]
+    lines = [f"{'parser':<14} {'rows':>10} {'best s':>10} {'rows/s':>12} {'speedup':>8}"]
+    for name, result in results:
+        speedup = result["rows_per_second"] / baseline if baseline else 0.0
+        lines.append(
+            f"{name:<14} {result['rows']:>10} {result['best_seconds']:>10.4f} "
+            f"{result['rows_per_second']:>12.0f} {speedup:>7.2f}x"
+        )
+    return "\n".join(lines)
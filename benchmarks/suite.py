@@ -0,0 +1,218 @@
+import logging
+import os
+import platform
+import time
+
+from db.connection import DatabaseConnection
+from domain.models import product_row_hash
+from repository.product_repository import ProductRepository
+from services.columnar import ProductColumns
+from services.csv_reader import FeedCsvReader, iter_parallel_records
+from services.feed_importer import FeedImporter
+from services.portal_synchronizer import PortalSynchronizer
+from services.table_creator import TableCreator
+
+logger = logging.getLogger(__name__)
+
+db_connection = DatabaseConnection()
+
+# Products written by the database benchmarks belong to this client only.
+BENCHMARK_CLIENT_ID = 900001
+
+
+class BenchmarkResult:
+    """
+    Timings of one benchmark; rows is the number of records it processed.
+    """
+
+    def __init__(self, name: str, rows: int, runs: list):
+        self.name = name
+        self.rows = rows
+        self.runs = runs
+
+    @property
+    def best_seconds(self) -> float:
+        return min(self.runs)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.best_seconds if self.best_seconds else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "runs": [round(seconds, 6) for seconds in self.runs],
+            "best_seconds": round(self.best_seconds, 6),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def measure(name: str, func, setup=None, repeat: int = 3) -> BenchmarkResult:
+    """
+    Times func(*setup()) repeat times; setup runs untimed before every run
+    and defaults to no arguments. func must return the number of rows it handled.
+    """
+    runs = []
+    rows = 0
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        started = time.perf_counter()
+        rows = func(*args)
+        runs.append(time.perf_counter() - started)
+    result = BenchmarkResult(name, rows, runs)
+    logger.info("%s: best %.4fs over %d run(s), %.0f rows/s", name, result.best_seconds, repeat, result.rows_per_second)
+    return result
+
+
+def bench_csv_read(catalog, repeat: int) -> BenchmarkResult:
+    reader = FeedCsvReader()
+    return measure("csv_read", lambda: len(reader.read(catalog.feed_path)), repeat=repeat)
+
+
+def bench_csv_read_parallel(catalog, repeat: int, workers: int) -> BenchmarkResult:
+    # Ranges small enough to give every worker several, even for modest catalogs.
+    range_bytes = max(os.path.getsize(catalog.feed_path) // (workers * 4), 64 * 1024)
+    return measure(
+        f"csv_read[parallel={workers}]",
+        lambda: sum(1 for _ in iter_parallel_records(catalog.feed_path, workers, range_bytes=range_bytes)),
+        repeat=repeat
+    )
+
+
+def _catalog_as_db_products(catalog) -> dict:
+    return {
+        product_id: {"title": title, "price_cents": price_cents, "store_id": store_id,
+                     "row_hash": product_row_hash(title, price_cents, store_id)}
+        for product_id, title, price_cents, store_id in FeedCsvReader().iter_records(catalog.feed_path)
+    }
+
+
+def bench_compute_sync_actions(catalog, repeat: int) -> BenchmarkResult:
+    synchronizer = PortalSynchronizer()
+    db_products = _catalog_as_db_products(catalog)
+    portal_records = synchronizer.read_portal_csv(catalog.portal_path)
+
+    def run():
+        synchronizer.compute_sync_actions(db_products, portal_records)
+        return len(portal_records)
+
+    return measure("compute_sync_actions", run, repeat=repeat)
+
+
+def bench_compute_columnar_sync_actions(catalog, repeat: int) -> BenchmarkResult:
+    synchronizer = PortalSynchronizer()
+    db_columns = ProductColumns.from_records(FeedCsvReader().iter_records(catalog.feed_path))
+    portal = ProductColumns.from_records(synchronizer.iter_portal_records(catalog.portal_path))
+
+    def run():
+        synchronizer.compute_columnar_sync_actions(db_columns, portal)
+        return len(portal)
+
+    return measure("compute_columnar_sync_actions", run, repeat=repeat)
+
+
+def _clear_benchmark_client():
+    with db_connection.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM products WHERE client_id = %s", (BENCHMARK_CLIENT_ID,))
+
+
+def _load_feed(catalog):
+    _clear_benchmark_client()
+    FeedImporter(ProductRepository(), FeedCsvReader(), mode=FeedImporter.MODE_BULK).import_feed(
+        catalog.feed_path, BENCHMARK_CLIENT_ID
+    )
+
+
+def bench_import_feed(catalog, repeat: int, mode: str) -> BenchmarkResult:
+    """
+    Imports the feed into an empty catalog, so every run inserts all rows.
+    """
+    importer = FeedImporter(ProductRepository(), FeedCsvReader(), mode=mode)
+
+    def setup():
+        _clear_benchmark_client()
+        return ()
+
+    def run():
+        return importer.import_feed(catalog.feed_path, BENCHMARK_CLIENT_ID).inserted
+
+    return measure(f"import_feed[{mode}]", run, setup=setup, repeat=repeat)
+
+
+def bench_apply_sync_actions(catalog, repeat: int) -> BenchmarkResult:
+    """
+    Times applying the portal diff to a catalog freshly loaded from the feed.
+    """
+    synchronizer = PortalSynchronizer()
+    portal_records = synchronizer.read_portal_csv(catalog.portal_path)
+
+    def setup():
+        _load_feed(catalog)
+        db_products = synchronizer.fetch_db_products(BENCHMARK_CLIENT_ID)
+        return synchronizer.compute_sync_actions(db_products, portal_records)
+
+    def run(to_delete, to_insert, to_update):
+        synchronizer.apply_sync_actions(BENCHMARK_CLIENT_ID, to_delete, to_insert, to_update)
+        return len(to_delete) + len(to_insert) + len(to_update)
+
+    return measure("apply_sync_actions", run, setup=setup, repeat=repeat)
+
+
+def run_suite(catalog, repeat: int = 3, with_db: bool = False, modes=FeedImporter.MODES,
+              parse_workers: int = 0) -> dict:
+    """
+    Runs the in-memory benchmarks and, with with_db, the ones that need a
+    local Postgres. parse_workers > 1 adds the parallel CSV read. Returns
+    the JSON-serialisable report.
+    """
+    results = [bench_csv_read(catalog, repeat)]
+    if parse_workers > 1:
+        results.append(bench_csv_read_parallel(catalog, repeat, parse_workers))
+    results += [
+        bench_compute_sync_actions(catalog, repeat),
+        bench_compute_columnar_sync_actions(catalog, repeat),
+    ]
+    if with_db:
+        TableCreator().create_tables()
+        try:
+            results.extend(bench_import_feed(catalog, repeat, mode) for mode in modes)
+            results.append(bench_apply_sync_actions(catalog, repeat))
+        finally:
+            _clear_benchmark_client()
+
+    return {
+        "meta": {
+            "catalog": catalog.to_dict(),
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": {result.name: result.to_dict() for result in results},
+    }
+
+
+def compare_reports(current: dict, baseline: dict, tolerance: float = 0.1) -> list:
+    """
+    Compares throughput (rows per second) benchmark by benchmark. Returns
+    (name, baseline_rps, current_rps, change, regressed) tuples for every
+    benchmark present in both reports; a benchmark regressed when it lost
+    more than tolerance of its baseline throughput.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None or not previous["rows_per_second"]:
+            continue
+        change = result["rows_per_second"] / previous["rows_per_second"] - 1
+        rows.append((name, previous["rows_per_second"], result["rows_per_second"], change, change < -tolerance))
+    return rows
+
+
+def format_comparison(rows: list) -> str:
+    lines = [f"{'benchmark':<32}  {'baseline rows/s':>16}  {'current rows/s':>16}  {'change':>8}"]
+    for name, baseline_rps, current_rps, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{name:<32}  {baseline_rps:>16.1f}  {current_rps:>16.1f}  {change:>+8.1%}{flag}")
+    return "\n".join(lines)
@@ -1,70 +1,272 @@
 import argparse
+import functools
 import logging
+import os
+import sys
+import time
 
 from services.table_creator import TableCreator
-from services.csv_reader import FeedCsvReader
+from services.csv_reader import DUPLICATE_POLICIES, FeedCsvReader
 from repository.product_repository import ProductRepository
 from services.feed_importer import FeedImporter
 from services.portal_synchronizer import PortalSynchronizer
+from services.batch_runner import BatchRunner, format_batch_report, read_manifest
+from services.applied_files import AppliedFileManifest, ROLE_FEED, ROLE_FEED_AND_SYNC, ROLE_PORTAL
+from services.sync_plan import PlanDriftError, SyncPlan
+from services.metrics import format_stage_report
+from services.logging_support import configure_logging
+from domain.models import FeedImportResult, PortalSyncResult
 
-logging.basicConfig(level=logging.INFO)
+configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
+
 class CLIParser:
     def parse_args(self):
         parser = argparse.ArgumentParser(description="CSV Importer & Synchronizer")
-        parser.add_argument("--feed", required=True, help="Path to feed_items.csv")
+        parser.add_argument("--feed", help="Path to feed_items.csv (required unless --manifest is given)")
         parser.add_argument("--portal", help="Path to portal_items.csv (optional)")
         parser.add_argument("--client", type=int, default=1, help="Client ID")
-        return parser.parse_args()
+        parser.add_argument(
+            "--manifest",
+            help="Batch mode: CSV with client_id,feed,portal columns; every listed client is processed"
+        )
+        parser.add_argument(
+            "--parallel", type=positive_int, default=min(4, os.cpu_count() or 1),
+            help="Batch mode: maximum number of clients processed at once"
+        )
+        parser.add_argument(
+            "--executor", choices=("thread", "process"), default="thread",
+            help="Batch mode: run clients on a thread pool or a process pool"
+        )
+        parser.add_argument(
+            "--mode", choices=FeedImporter.MODES, default=FeedImporter.MODE_ROW,
+            help="Feed import mode: 'row' upserts one product at a time, 'bulk' uses COPY + a set-based merge"
+        )
+        parser.add_argument(
+            "--sync-engine", choices=PortalSynchronizer.ENGINES, default=PortalSynchronizer.ENGINE_PYTHON,
+            help="Portal sync engine: 'python' diffs in the application, 'columnar' diffs NumPy columns, "
+                 "'sql' diffs inside Postgres"
+        )
+        parser.add_argument(
+            "--batch-size", type=positive_int, default=FeedCsvReader.DEFAULT_BATCH_SIZE,
+            help="Number of feed records parsed and written per batch (bounds peak memory)"
+        )
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Apply the files even if identical content was already applied for the client"
+        )
+        parser.add_argument(
+            "--chunk-rows", type=positive_int,
+            help="Commit every N rows with a checkpoint, so rerunning an interrupted import or sync "
+                 "of the same file resumes after the last committed chunk (default: APPLY_CHUNK_ROWS)"
+        )
+        parser.add_argument(
+            "--parse-workers", type=positive_int,
+            help="Parse the CSV files on N processes; 1 parses on the main thread (default: CSV_PARSE_WORKERS)"
+        )
+        parser.add_argument(
+            "--duplicates", choices=DUPLICATE_POLICIES,
+            help="How a product_id repeated within a file is resolved: keep the first or the last row, "
+                 "or reject the file (default: DUPLICATE_POLICY)"
+        )
+        parser.add_argument(
+            "--migrate-partitions", type=positive_int, metavar="N",
+            help="Convert the existing products table to N hash partitions by client_id and exit"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Compute the portal sync of --portal for --client without applying it and write the plan "
+                 "to --plan-out"
+        )
+        parser.add_argument("--plan-out", metavar="PATH", help="Where --dry-run writes the sync plan")
+        parser.add_argument(
+            "--apply-plan", metavar="PATH",
+            help="Apply a sync plan written by --dry-run and exit; fails if the catalog changed since"
+        )
+        args = parser.parse_args()
+        if args.migrate_partitions or args.apply_plan:
+            return args
+        if args.plan_out and not args.dry_run:
+            parser.error("--plan-out requires --dry-run")
+        if args.dry_run:
+            if not args.portal or not args.plan_out:
+                parser.error("--dry-run requires --portal and --plan-out")
+            if args.feed or args.manifest:
+                parser.error("--dry-run only plans the portal sync; drop --feed and --manifest")
+            return args
+        if not args.feed and not args.manifest:
+            parser.error("one of --feed, --manifest, --dry-run, --apply-plan or --migrate-partitions is required")
+        if args.feed and args.manifest:
+            parser.error("--feed and --manifest are mutually exclusive")
+        return args
 
 class Application:
-    def __init__(self, table_creator, feed_importer_factory, portal_synchronizer_factory):
+    def __init__(self, table_creator, feed_importer_factory, portal_synchronizer_factory,
+                 applied_files=None, force=False):
         self.table_creator = table_creator
         self.feed_importer_factory = feed_importer_factory
         self.portal_synchronizer_factory = portal_synchronizer_factory
+        self.applied_files = applied_files
+        self.force = force
 
     def run(self, feed_file, portal_file, client_id):
         logger.info("Application started.")
 
         self.table_creator.create_tables()
+        self.run_client(feed_file, portal_file, client_id)
+
+        logger.info("Application finished.\n%s", format_stage_report())
+
+    def run_client(self, feed_file, portal_file, client_id):
+        """
+        Imports the feed and, if given, syncs the portal for one client.
+        Returns (feed_result, sync_result); sync_result is None without a portal file.
+
+        With an applied-files manifest, files identical to the ones last
+        applied for the client are skipped (unless force is set) and the
+        results of that earlier run are returned.
+        """
+        if self.applied_files is None:
+            return self._apply_client(feed_file, portal_file, client_id)
+
+        role = ROLE_FEED_AND_SYNC if portal_file else ROLE_FEED
+        sources = [feed_file, portal_file] if portal_file else [feed_file]
+
+        def apply():
+            feed_result, sync_result = self._apply_client(feed_file, portal_file, client_id)
+            return {"feed": feed_result.to_dict(), "sync": sync_result.to_dict() if sync_result else None}
 
+        results, skipped = self.applied_files.run_once(client_id, role, sources, apply, force=self.force)
+        if skipped:
+            logger.info("Client %s: files unchanged since the last run, returning the previous result.", client_id)
+        sync_result = PortalSyncResult(**results["sync"]) if results["sync"] else None
+        return FeedImportResult(**results["feed"]), sync_result
+
+    def _apply_client(self, feed_file, portal_file, client_id):
         feed_importer = self.feed_importer_factory()
-        feed_importer.import_feed(feed_file, client_id)
-        logger.info("Feed CSV import completed for client %s.", client_id)
+        feed_result = feed_importer.import_feed(feed_file, client_id)
+        logger.info(
+            "Feed CSV import completed for client %s: inserted %d, updated %d, unchanged %d.",
+            client_id, feed_result.inserted, feed_result.updated, feed_result.unchanged
+        )
 
+        sync_result = None
         if portal_file:
             logger.info("Starting portal synchronization for client %s.", client_id)
             synchronizer = self.portal_synchronizer_factory()
-            portal_records = synchronizer.read_portal_csv(portal_file)
-            if not portal_records:
-                logger.info("No valid portal records found in CSV.")
-            else:
-                db_products = synchronizer.fetch_db_products(client_id)
-                to_delete, to_insert, to_update = synchronizer.compute_sync_actions(db_products, portal_records)
-                synchronizer.apply_sync_actions(client_id, to_delete, to_insert, to_update)
-                logger.info("Portal synchronization completed for client %s.", client_id)
+            sync_result = synchronizer.synchronize(portal_file, client_id)
+            if sync_result.received:
+                logger.info(
+                    "Portal synchronization completed for client %s: deleted %d, inserted %d, updated %d, unchanged %d.",
+                    client_id, sync_result.deleted, sync_result.inserted, sync_result.updated, sync_result.unchanged
+                )
+        return feed_result, sync_result
 
-        logger.info("Application finished.")
+    def plan_portal(self, portal_file, client_id, plan_path):
+        """
+        Writes the plan of a portal sync to plan_path without applying it.
+        """
+        self.table_creator.create_tables()
+        plan = self.portal_synchronizer_factory().plan(portal_file, client_id)
+        plan.write(plan_path)
+        logger.info("Sync plan for client %s written to %s: %s.", client_id, plan_path, plan.counts)
+        return plan
+
+    def apply_plan(self, plan_path):
+        """
+        Applies a plan written by plan_portal(). Returns the sync result, or
+        None if the catalog drifted since the plan was made.
+        """
+        self.table_creator.create_tables()
+        plan = SyncPlan.read(plan_path)
+        try:
+            result = self.portal_synchronizer_factory().apply_plan(plan)
+        except PlanDriftError as e:
+            logger.error("Sync plan %s not applied: %s. Compute a new plan.", plan_path, e)
+            return None
+        if self.applied_files is not None and plan.source_digest:
+            # The catalog now matches the planned portal file, as after a regular sync of it.
+            self.applied_files.record(plan.client_id, ROLE_PORTAL, plan.source_digest, result.to_dict())
+        logger.info(
+            "Sync plan applied for client %s: deleted %d, inserted %d, updated %d, unchanged %d.",
+            plan.client_id, result.deleted, result.inserted, result.updated, result.unchanged
+        )
+        return result
+
+    def run_batch(self, entries, max_workers, use_processes=False):
+        """
+        Runs every manifest entry concurrently after creating tables once.
+        Returns the per-client results; failures are reported, not raised.
+        """
+        logger.info("Batch run started for %d client(s) with %d worker(s).", len(entries), max_workers)
+        self.table_creator.create_tables()
+
+        started = time.perf_counter()
+        runner = BatchRunner(self.run_client, max_workers=max_workers, use_processes=use_processes)
+        results = runner.run(entries)
+        wall_seconds = time.perf_counter() - started
+
+        logger.info(
+            "Batch run finished.\n%s\n%s", format_batch_report(results, wall_seconds), format_stage_report()
+        )
+        return results
 
 def main():
     cli_parser = CLIParser()
     args = cli_parser.parse_args()
 
-    table_creator = TableCreator()
+    if args.migrate_partitions:
+        # Brings the existing table up to date (e.g. price_cents) before it is copied.
+        if not TableCreator(partitions=0).create_tables():
+            sys.exit(1)
+        TableCreator(partitions=args.migrate_partitions).migrate_to_partitioned()
+        return
 
-    def feed_importer_factory():
-        return FeedImporter(ProductRepository(), FeedCsvReader())
+    table_creator = TableCreator()
 
-    def portal_synchronizer_factory():
-        return PortalSynchronizer()
+    # Plain partials rather than closures, so the app can be shipped to a process pool.
+    feed_importer_factory = functools.partial(
+        FeedImporter, ProductRepository(), FeedCsvReader(parse_workers=args.parse_workers), mode=args.mode,
+        batch_size=args.batch_size, chunk_rows=args.chunk_rows, duplicates=args.duplicates
+    )
+    portal_synchronizer_factory = functools.partial(
+        PortalSynchronizer, engine=args.sync_engine, chunk_rows=args.chunk_rows, parse_workers=args.parse_workers,
+        duplicates=args.duplicates
+    )
 
     app = Application(
         table_creator=table_creator,
         feed_importer_factory=feed_importer_factory,
-        portal_synchronizer_factory=portal_synchronizer_factory
+        portal_synchronizer_factory=portal_synchronizer_factory,
+        applied_files=AppliedFileManifest(),
+        force=args.force
     )
 
+    if args.apply_plan:
+        if app.apply_plan(args.apply_plan) is None:
+            sys.exit(1)
+        return
+
+    if args.dry_run:
+        app.plan_portal(args.portal, args.client, args.plan_out)
+        return
+
+    if args.manifest:
+        results = app.run_batch(
+            read_manifest(args.manifest),
+            max_workers=args.parallel,
+            use_processes=args.executor == "process"
+        )
+        if not all(result.ok for result in results):
+            sys.exit(1)
+        return
+
     app.run(
         feed_file=args.feed,
         portal_file=args.portal,
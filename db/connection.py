@@ -1,14 +1,29 @@
 import os
+import threading
 import psycopg2
 from dotenv import load_dotenv
 import logging
 
+from db.pool import ConnectionPool
+from services.metrics import stage_timer
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+_pools = {}
+_pools_lock = threading.Lock()
+
+
 class DatabaseConnection:
     """
     Responsible for providing a database connection.
+
+    Connections come from a process-wide pool shared by every
+    DatabaseConnection with the same settings. The pool is sized with
+    DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT bounds how long a
+    checkout may wait, DB_POOL_HEALTH_CHECK_INTERVAL controls how long a
+    connection may sit idle before it is pinged on checkout, and
+    DB_POOL_MAX_IDLE closes surplus connections that stay unused.
     """
 
     def __init__(self):
@@ -17,10 +32,30 @@ class DatabaseConnection:
         self.db_password = os.getenv("DB_PASSWORD")
         self.db_host = os.getenv("DB_HOST")
         self.db_port = os.getenv("DB_PORT")
+        self.pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+        self.pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+        self.pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self.pool_health_check_interval = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+        self.pool_max_idle = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
 
     def get_connection(self):
         """
-        Returns a new psycopg2 connection.
+        Checks out a pooled connection.
+        Calling close() on it, or leaving its `with` block, returns it to the pool.
+        The wait is recorded as the connection_acquire stage.
+        """
+        with stage_timer("connection_acquire"):
+            return self._get_pool().acquire()
+
+    def pool_stats(self) -> dict:
+        """
+        Returns live usage statistics of this process' pool.
+        """
+        return self._get_pool().stats()
+
+    def connect(self):
+        """
+        Returns a new, unpooled psycopg2 connection.
         """
         try:
             logger.info("Attempting to establish database connection...")
@@ -36,3 +71,31 @@ class DatabaseConnection:
         except Exception as e:
             logger.exception("Failed to establish database connection: %s", e)
             raise
+
+    @classmethod
+    def close_pools(cls):
+        """
+        Closes every pool owned by the current process.
+        """
+        with _pools_lock:
+            owned = [key for key in _pools if key[0] == os.getpid()]
+            pools = [_pools.pop(key) for key in owned]
+        for pool in pools:
+            pool.close()
+
+    def _get_pool(self) -> ConnectionPool:
+        # Keyed by pid so a forked worker never reuses its parent's sockets.
+        key = (os.getpid(), self.db_name, self.db_user, self.db_password, self.db_host, self.db_port)
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    self.connect,
+                    min_size=self.pool_min_size,
+                    max_size=self.pool_max_size,
+                    timeout=self.pool_timeout,
+                    health_check_interval=self.pool_health_check_interval,
+                    max_idle=self.pool_max_idle,
+                )
+                _pools[key] = pool
+        return pool
@@ -0,0 +1,266 @@
+import collections
+import logging
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """
+    Raised when no connection could be checked out before the acquire timeout.
+    """
+
+
+class PoolClosed(psycopg2.InterfaceError):
+    """
+    Raised when a connection is requested from a pool that has been closed.
+    """
+
+
+class PooledConnection:
+    """
+    Thin proxy around a pooled psycopg2 connection.
+
+    Everything is forwarded to the real connection except close(), which
+    returns the connection to its pool. Used as a context manager it commits
+    on success, rolls back on error and then releases the connection.
+    """
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, attr):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(conn, attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._conn, attr, value)
+
+    def close(self):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Connections are handed out LIFO so the warmest connection is reused first.
+    A connection that has been idle for longer than health_check_interval is
+    pinged with SELECT 1 on checkout and silently replaced if it is broken.
+    min_size connections are opened when the pool is built and kept open;
+    more are opened on demand, up to max_size, and closed again after
+    max_idle seconds unused.
+    """
+
+    def __init__(self, connect, min_size: int = 1, max_size: int = 10, timeout: float = 30.0,
+                 health_check_interval: float = 30.0, max_idle: float = 300.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_idle = max_idle
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = collections.deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._acquired = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        self._open_min_size()
+
+    def acquire(self, timeout: float = None) -> PooledConnection:
+        """
+        Checks out a connection, opening a new one if the pool is below
+        max_size. Blocks for up to timeout seconds when the pool is exhausted.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        conn, last_used = None, None
+        with self._available:
+            while True:
+                if self._closed:
+                    raise PoolClosed("connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Timed out after {timeout:.1f}s waiting for a database connection "
+                        f"(max_size={self.max_size})"
+                    )
+                self._waiting += 1
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._acquired += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if conn is None or not self._is_healthy(conn, last_used):
+                if conn is not None:
+                    self._close_quietly(conn)
+                    with self._lock:
+                        self._discarded += 1
+                conn = self._open()
+        except Exception:
+            with self._available:
+                self._size -= 1
+                self._in_use -= 1
+                self._available.notify()
+            raise
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """
+        Returns a connection to the pool. Open transactions are rolled back;
+        broken connections are discarded and their slot freed.
+        """
+        healthy = not conn.closed
+        if healthy and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                healthy = False
+
+        to_close = []
+        with self._available:
+            self._in_use -= 1
+            if healthy and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                to_close = self._reap_idle()
+            else:
+                self._size -= 1
+                self._discarded += 1
+                to_close = [conn]
+            self._available.notify()
+        for stale in to_close:
+            self._close_quietly(stale)
+
+    def close(self):
+        """
+        Closes every idle connection and rejects further checkouts.
+        Connections still checked out are closed when they are released.
+        """
+        with self._available:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._available.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the pool usage counters.
+        """
+        with self._lock:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "acquired": self._acquired,
+                "created": self._created,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+                "wait_time_total": round(self._wait_total, 6),
+                "wait_time_max": round(self._wait_max, 6),
+                "wait_time_avg": round(self._wait_total / self._acquired, 6) if self._acquired else 0.0,
+            }
+
+    def _open_min_size(self):
+        # If the database is unreachable the pool is not built; close what was opened.
+        try:
+            for _ in range(self.min_size):
+                self._idle.append((self._open(), time.monotonic()))
+                self._size += 1
+        except Exception:
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            raise
+
+    def _open(self):
+        conn = self._connect()
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning("Discarding broken pooled connection: %s", e)
+            return False
+
+    def _reap_idle(self) -> list:
+        # Called with the lock held; the oldest idle connections sit on the left.
+        stale = []
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._discarded += 1
+            stale.append(conn)
+        return stale
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -1,19 +1,116 @@
+import hashlib
 import logging
+import uuid
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
 logger = logging.getLogger(__name__)
 
+_CENT = Decimal("0.01")
+
+
+def product_row_hash(title: str, price_cents: int, store_id: int) -> str:
+    """
+    Python twin of the product_row_hash() SQL function behind products.row_hash.
+    """
+    digest = hashlib.md5(f"{title}|{price_cents}|{store_id}".encode("utf-8")).hexdigest()
+    return str(uuid.UUID(digest))
+
+
+def parse_price_cents(text: str) -> int:
+    """
+    Parses a decimal price such as "19.99" into whole cents (1999) without
+    going through float. Digits beyond the second decimal are rounded half
+    up. Raises ValueError for anything that is not a finite number.
+    """
+    text = text.strip()
+    whole, _, fraction = text.partition(".")
+    sign = 1
+    if whole[:1] in ("-", "+"):
+        sign = -1 if whole[0] == "-" else 1
+        whole = whole[1:]
+    # Plain "123", "123.4" and "123.45" cover nearly every feed row.
+    if whole.isdecimal() and len(fraction) <= 2 and (fraction.isdecimal() or not fraction):
+        return sign * (int(whole) * 100 + int(fraction.ljust(2, "0")))
+    try:
+        return int(Decimal(text).quantize(_CENT, rounding=ROUND_HALF_UP).scaleb(2))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"invalid price: {text!r}") from None
+
+
 class Product:
 
-    def __init__(self, client_id: int, product_id: int, title: str, price: float, store_id: int):
+    def __init__(self, client_id: int, product_id: int, title: str, price_cents: int, store_id: int):
         self.client_id = client_id
         self.product_id = product_id
         self.title = title
-        self.price = price
+        self.price_cents = price_cents
         self.store_id = store_id
 
     def __repr__(self):
         return (f"<Product(client_id={self.client_id},"
                 f"product_id={self.product_id},"
                 f"title='{self.title}',"
-                f"price={self.price},"
+                f"price_cents={self.price_cents},"
                 f"store_id={self.store_id})>")
+
+
+class FeedImportResult:
+    """
+    Counts produced by a single feed import run.
+    `duplicates` is the number of rows that repeated an earlier product_id.
+    """
+
+    def __init__(self, inserted: int = 0, updated: int = 0, unchanged: int = 0, duplicates: int = 0):
+        self.inserted = inserted
+        self.updated = updated
+        self.unchanged = unchanged
+        self.duplicates = duplicates
+
+    def to_dict(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "duplicates": self.duplicates,
+        }
+
+    def __repr__(self):
+        return (f"<FeedImportResult(inserted={self.inserted},"
+                f"updated={self.updated},"
+                f"unchanged={self.unchanged},"
+                f"duplicates={self.duplicates})>")
+
+
+class PortalSyncResult:
+    """
+    Counts produced by a single portal synchronization run.
+    `received` is the number of distinct products read from the portal CSV
+    and `duplicates` the number of rows that repeated an earlier product_id.
+    """
+
+    def __init__(self, deleted: int = 0, inserted: int = 0, updated: int = 0, unchanged: int = 0,
+                 received: int = 0, duplicates: int = 0):
+        self.deleted = deleted
+        self.inserted = inserted
+        self.updated = updated
+        self.unchanged = unchanged
+        self.received = received
+        self.duplicates = duplicates
+
+    def to_dict(self) -> dict:
+        return {
+            "deleted": self.deleted,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "received": self.received,
+            "duplicates": self.duplicates,
+        }
+
+    def __repr__(self):
+        return (f"<PortalSyncResult(deleted={self.deleted},"
+                f"inserted={self.inserted},"
+                f"updated={self.updated},"
+                f"unchanged={self.unchanged},"
+                f"received={self.received},"
+                f"duplicates={self.duplicates})>")
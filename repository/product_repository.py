@@ -1,3 +1,5 @@
+import csv
+import io
 import logging
 from db.connection import DatabaseConnection
 
@@ -10,36 +12,187 @@ class ProductRepository:
     Encapsulates all database operations for products.
     """
 
-    def get_existing_product_ids(self, client_id: int, product_ids: tuple) -> set:
+    def get_existing_product_ids(self, client_id: int, product_ids: tuple, cur=None) -> set:
+        """
+        Returns the subset of product_ids already stored for client_id.
+        Pass cur to run the lookup inside an ongoing transaction, so rows
+        written earlier in that transaction are seen as existing.
+        """
+        query = """
+            SELECT product_id
+            FROM products
+            WHERE client_id = %s AND product_id IN %s
+        """
+        if cur is not None:
+            cur.execute(query, (client_id, product_ids))
+            return {row[0] for row in cur.fetchall()}
         with db_connection.get_connection() as conn:
             with conn.cursor() as cur:
-                query = """
-                    SELECT product_id
-                    FROM products
-                    WHERE client_id = %s AND product_id IN %s
-                """
                 cur.execute(query, (client_id, product_ids))
                 existing_ids = {row[0] for row in cur.fetchall()}
         return existing_ids
 
+    def get_existing_product_hashes(self, client_id: int, product_ids: tuple, cur) -> dict:
+        """
+        Returns {product_id: row_hash} for the product_ids already stored for client_id.
+        """
+        cur.execute(
+            """
+            SELECT product_id, row_hash
+            FROM products
+            WHERE client_id = %s AND product_id IN %s
+            """,
+            (client_id, product_ids)
+        )
+        return dict(cur.fetchall())
+
+    def get_catalog_version(self, cur, client_id: int) -> tuple:
+        """
+        Returns (version, updated_at) of client_id's catalog; (0, None) if it
+        was never written.
+        """
+        cur.execute("SELECT version, updated_at FROM catalog_versions WHERE client_id = %s", (client_id,))
+        row = cur.fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def bump_catalog_version(self, cur, client_id: int):
+        """
+        Marks client_id's catalog as changed. Call it inside the writing
+        transaction so the new version becomes visible with the new rows.
+        """
+        cur.execute(
+            """
+            INSERT INTO catalog_versions (client_id, version) VALUES (%s, 1)
+            ON CONFLICT (client_id) DO UPDATE
+            SET version = catalog_versions.version + 1,
+                updated_at = NOW()
+            """,
+            (client_id,)
+        )
+
+    def list_products(self, cur, client_id: int, after: int = None, limit: int = None) -> list:
+        """
+        Returns (product_id, title, price_cents, store_id) rows ordered by product_id.
+        `after` is a keyset cursor: only products with a greater product_id
+        are returned, which the (client_id, product_id) index serves directly.
+        """
+        query = "SELECT product_id, title, price_cents, store_id FROM products WHERE client_id = %s"
+        params = [client_id]
+        if after is not None:
+            query += " AND product_id > %s"
+            params.append(after)
+        query += " ORDER BY product_id"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        cur.execute(query, params)
+        return cur.fetchall()
+
+    def iter_product_batches(self, conn, client_id: int, after: int = None, batch_size: int = 5000):
+        """
+        Yields lists of at most batch_size product rows read through a
+        server-side cursor, so the client's catalog is never held in memory.
+        """
+        query = "SELECT product_id, title, price_cents, store_id FROM products WHERE client_id = %s"
+        params = [client_id]
+        if after is not None:
+            query += " AND product_id > %s"
+            params.append(after)
+        query += " ORDER BY product_id"
+        with conn.cursor(name=f"products_stream_{client_id}") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
     def update_product(self, cur, client_id: int, record: tuple):
-        product_id, title, price, store_id = record
+        product_id, title, price_cents, store_id = record
         update_sql = """
             UPDATE products
             SET title = %s,
-                price = %s,
+                price_cents = %s,
                 store_id = %s,
                 updated_at = NOW()
             WHERE client_id = %s AND product_id = %s
         """
-        cur.execute(update_sql, (title, price, store_id, client_id, product_id))
-        logger.info("Updated product_id %s for client %s", product_id, client_id)
+        cur.execute(update_sql, (title, price_cents, store_id, client_id, product_id))
 
     def insert_product(self, cur, client_id: int, record: tuple):
-        product_id, title, price, store_id = record
+        product_id, title, price_cents, store_id = record
         insert_sql = """
-            INSERT INTO products (client_id, product_id, title, price, store_id)
+            INSERT INTO products (client_id, product_id, title, price_cents, store_id)
             VALUES (%s, %s, %s, %s, %s)
         """
-        cur.execute(insert_sql, (client_id, product_id, title, price, store_id))
-        logger.info("Inserted product_id %s for client %s", product_id, client_id)
+        cur.execute(insert_sql, (client_id, product_id, title, price_cents, store_id))
+
+    def create_staging_table(self, cur):
+        """
+        Creates the session-local staging table used by the bulk import.
+        The table is dropped automatically when the transaction ends.
+        """
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS products_staging (
+                seq BIGSERIAL,
+                product_id INT NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                price_cents BIGINT NOT NULL,
+                store_id INT NOT NULL
+            ) ON COMMIT DROP
+        """)
+
+    def copy_to_staging(self, cur, records):
+        """
+        Streams (product_id, title, price_cents, store_id) records into the
+        staging table with a single COPY FROM STDIN. csv.writer writes an
+        empty title as an unquoted empty field, which COPY would read as
+        NULL; FORCE_NOT_NULL keeps it an empty string.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(records)
+        buffer.seek(0)
+        cur.copy_expert(
+            "COPY products_staging (product_id, title, price_cents, store_id) "
+            "FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (title))",
+            buffer
+        )
+
+    def merge_staging(self, cur, client_id: int, counted_ids=()) -> tuple:
+        """
+        Upserts the staged rows into products with one set-based statement.
+        When a product_id is staged more than once the last occurrence wins,
+        like the row-by-row path which simply updates it twice. Existing rows
+        whose row_hash already matches are left untouched.
+        product_ids in counted_ids were counted by an earlier merge of the same
+        import; they are written as usual but left out of the counts.
+        Returns (inserted_count, updated_count, unchanged_count).
+        """
+        merge_sql = """
+            WITH merged AS (
+                INSERT INTO products (client_id, product_id, title, price_cents, store_id)
+                SELECT DISTINCT ON (product_id) %s, product_id, title, price_cents, store_id
+                FROM products_staging
+                ORDER BY product_id, seq DESC
+                ON CONFLICT (client_id, product_id) DO UPDATE
+                SET title = EXCLUDED.title,
+                    price_cents = EXCLUDED.price_cents,
+                    store_id = EXCLUDED.store_id,
+                    updated_at = NOW()
+                WHERE products.row_hash IS DISTINCT FROM
+                      product_row_hash(EXCLUDED.title, EXCLUDED.price_cents, EXCLUDED.store_id)
+                RETURNING product_id, (xmax = 0) AS inserted
+            )
+            SELECT COUNT(*) FILTER (WHERE inserted),
+                   COUNT(*) FILTER (WHERE NOT inserted),
+                   (SELECT COUNT(DISTINCT product_id) FROM products_staging
+                    WHERE NOT product_id = ANY(%s::int[])) - COUNT(*)
+            FROM merged
+            WHERE NOT product_id = ANY(%s::int[])
+        """
+        counted_ids = list(counted_ids)
+        cur.execute(merge_sql, (client_id, counted_ids, counted_ids))
+        inserted_count, updated_count, unchanged_count = cur.fetchone()
+        return inserted_count, updated_count, unchanged_count
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+from db.connection import DatabaseConnection
+from services.applied_files import file_digest
+
+logger = logging.getLogger(__name__)
+
+db_connection = DatabaseConnection()
+
+
+def default_chunk_rows() -> int:
+    """
+    Rows per transaction for chunked applies (APPLY_CHUNK_ROWS); 0 means
+    everything is applied in a single transaction.
+    """
+    return int(os.getenv("APPLY_CHUNK_ROWS", "0"))
+
+
+def job_key(role: str, source) -> str:
+    """
+    Identifies a chunked job by what it applies, so re-running the same
+    file (from the CLI or re-uploaded to the API) finds its checkpoint.
+    """
+    return f"{role}:{file_digest(source)}"
+
+
+class ApplyCheckpoint:
+    """
+    Progress of one chunked apply: rows_done input rows have been committed
+    and counts holds the result counts accumulated so far.
+    """
+
+    def __init__(self, client_id: int, job_key: str, rows_done: int = 0, counts: dict = None):
+        self.client_id = client_id
+        self.job_key = job_key
+        self.rows_done = rows_done
+        self.counts = dict(counts or {})
+
+    @property
+    def resumed(self) -> bool:
+        return self.rows_done > 0 or bool(self.counts)
+
+    def count(self, name: str) -> int:
+        return self.counts.get(name, 0)
+
+    def advance(self, rows: int, **counts):
+        """
+        Moves the checkpoint past another rows input rows; counts replace
+        the accumulated totals.
+        """
+        self.rows_done += rows
+        self.counts.update(counts)
+
+    def __repr__(self):
+        return (f"<ApplyCheckpoint(client_id={self.client_id},"
+                f"job_key='{self.job_key}',"
+                f"rows_done={self.rows_done})>")
+
+
+class ApplyCheckpoints:
+    """
+    Persists ApplyCheckpoints in the apply_checkpoints table.
+
+    save() is called with the cursor of the chunk being committed, so a
+    checkpoint and the rows it covers become visible together. Each
+    checkpoint also remembers the client's catalog version at that commit;
+    if anything else has changed the catalog since, resuming could skip rows
+    that no longer hold, so load() discards the checkpoint and the job
+    starts over. A client only keeps the checkpoint of its latest job.
+    """
+
+    def load(self, client_id: int, key: str) -> ApplyCheckpoint:
+        """
+        Returns the committed progress of the job, or an empty checkpoint.
+        """
+        with db_connection.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT c.rows_done, c.counts, c.catalog_version, COALESCE(v.version, 0)
+                    FROM apply_checkpoints c
+                    LEFT JOIN catalog_versions v ON v.client_id = c.client_id
+                    WHERE c.client_id = %s AND c.job_key = %s
+                    """,
+                    (client_id, key)
+                )
+                row = cur.fetchone()
+                if row is None:
+                    return ApplyCheckpoint(client_id, key)
+                rows_done, counts, saved_version, current_version = row
+                if saved_version != current_version:
+                    logger.warning(
+                        "Discarding checkpoint of %s for client %s: the catalog changed since it was saved "
+                        "(version %s, now %s). Starting over.",
+                        key, client_id, saved_version, current_version
+                    )
+                    self.clear(cur, ApplyCheckpoint(client_id, key))
+                    return ApplyCheckpoint(client_id, key)
+        logger.info("Resuming %s for client %s after %d committed row(s).", key, client_id, rows_done)
+        return ApplyCheckpoint(client_id, key, rows_done, counts)
+
+    def save(self, cur, checkpoint: ApplyCheckpoint):
+        """
+        Stores checkpoint inside the caller's transaction, after the chunk's
+        catalog version bump.
+        """
+        cur.execute(
+            "DELETE FROM apply_checkpoints WHERE client_id = %s AND job_key <> %s",
+            (checkpoint.client_id, checkpoint.job_key)
+        )
+        cur.execute(
+            """
+            INSERT INTO apply_checkpoints (client_id, job_key, rows_done, counts, catalog_version)
+            VALUES (%s, %s, %s, %s, COALESCE((SELECT version FROM catalog_versions WHERE client_id = %s), 0))
+            ON CONFLICT (client_id, job_key) DO UPDATE
+            SET rows_done = EXCLUDED.rows_done,
+                counts = EXCLUDED.counts,
+                catalog_version = EXCLUDED.catalog_version,
+                updated_at = NOW()
+            """,
+            (checkpoint.client_id, checkpoint.job_key, checkpoint.rows_done, json.dumps(checkpoint.counts),
+             checkpoint.client_id)
+        )
+
+    def clear(self, cur, checkpoint: ApplyCheckpoint):
+        """
+        Removes the checkpoint inside the caller's transaction; called with
+        the job's final commit.
+        """
+        cur.execute(
+            "DELETE FROM apply_checkpoints WHERE client_id = %s AND job_key = %s",
+            (checkpoint.client_id, checkpoint.job_key)
+        )
+
+    def finish(self, checkpoint: ApplyCheckpoint):
+        """
+        Removes the checkpoint of a job that turned out to have nothing left to apply.
+        """
+        with db_connection.get_connection() as conn:
+            with conn.cursor() as cur:
+                self.clear(cur, checkpoint)
@@ -0,0 +1,137 @@
+import csv
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ManifestEntry:
+    """
+    One client of a batch run: its feed CSV and optional portal CSV.
+    """
+
+    def __init__(self, client_id: int, feed: str, portal: str = None):
+        self.client_id = client_id
+        self.feed = feed
+        self.portal = portal
+
+    def __repr__(self):
+        return (f"<ManifestEntry(client_id={self.client_id},"
+                f"feed='{self.feed}',"
+                f"portal='{self.portal}')>")
+
+
+class ClientRunResult:
+    """
+    Outcome of one client's run within a batch.
+    """
+
+    def __init__(self, client_id: int, seconds: float, feed_result=None, sync_result=None, error: str = None):
+        self.client_id = client_id
+        self.seconds = seconds
+        self.feed_result = feed_result
+        self.sync_result = sync_result
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        return (f"<ClientRunResult(client_id={self.client_id},"
+                f"ok={self.ok},"
+                f"seconds={self.seconds:.3f})>")
+
+
+def read_manifest(manifest_path: str) -> list:
+    """
+    Reads a batch manifest CSV with the columns client_id, feed and portal
+    (portal may be left empty). Raises ValueError naming the offending line
+    for malformed rows or duplicate clients.
+    """
+    entries = []
+    seen = set()
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for line_no, row in enumerate(reader, start=2):
+            try:
+                client_id = int(row["client_id"])
+                feed = row["feed"].strip()
+                portal = (row.get("portal") or "").strip() or None
+            except (ValueError, KeyError, AttributeError) as e:
+                raise ValueError(f"Invalid manifest row at line {line_no}: {row} -- {e}")
+            if not feed:
+                raise ValueError(f"Missing feed path for client {client_id} at line {line_no}")
+            if client_id in seen:
+                raise ValueError(f"Client {client_id} listed more than once (line {line_no})")
+            seen.add(client_id)
+            entries.append(ManifestEntry(client_id, feed, portal))
+    return entries
+
+
+def _timed_run(client_runner, entry: ManifestEntry) -> ClientRunResult:
+    # Runs inside the worker, so timings exclude queueing and failures stay isolated.
+    started = time.perf_counter()
+    try:
+        feed_result, sync_result = client_runner(entry.feed, entry.portal, entry.client_id)
+    except Exception as e:
+        logger.exception("Batch run failed for client %s: %s", entry.client_id, e)
+        return ClientRunResult(entry.client_id, time.perf_counter() - started, error=f"{type(e).__name__}: {e}")
+    return ClientRunResult(entry.client_id, time.perf_counter() - started, feed_result, sync_result)
+
+
+class BatchRunner:
+    """
+    Runs client_runner(feed, portal, client_id) for many clients at once on a
+    thread or process pool capped at max_workers. Each client's work commits
+    in its own transactions, and a failing client never stops the others.
+
+    With use_processes=True client_runner must be picklable.
+    """
+
+    def __init__(self, client_runner, max_workers: int = 4, use_processes: bool = False):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be positive, got {max_workers}")
+        self.client_runner = client_runner
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+
+    def run(self, entries: list) -> list:
+        """
+        Returns one ClientRunResult per entry, in manifest order.
+        """
+        executor_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(_timed_run, self.client_runner, entry) for entry in entries]
+            return [future.result() for future in futures]
+
+
+def format_batch_report(results: list, wall_seconds: float) -> str:
+    """
+    Renders a per-client and aggregate timing report for a batch run.
+    """
+    lines = [f"{'client':>8}  {'status':<6}  {'seconds':>9}  {'feed ins/upd/same':>18}  {'sync del/ins/upd/same':>22}"]
+    for result in results:
+        feed = result.feed_result
+        sync = result.sync_result
+        feed_counts = f"{feed.inserted}/{feed.updated}/{feed.unchanged}" if feed else "-"
+        sync_counts = f"{sync.deleted}/{sync.inserted}/{sync.updated}/{sync.unchanged}" if sync else "-"
+        lines.append(
+            f"{result.client_id:>8}  {'ok' if result.ok else 'FAILED':<6}  {result.seconds:>9.3f}  "
+            f"{feed_counts:>18}  {sync_counts:>22}"
+        )
+        if not result.ok:
+            lines.append(f"{'':>8}  error: {result.error}")
+
+    failed = sum(1 for result in results if not result.ok)
+    client_seconds = sum(result.seconds for result in results)
+    slowest = max(results, key=lambda result: result.seconds, default=None)
+    lines.append(
+        f"Clients: {len(results)} ({len(results) - failed} ok, {failed} failed); "
+        f"wall time {wall_seconds:.3f}s; summed client time {client_seconds:.3f}s; "
+        f"parallel speedup {client_seconds / wall_seconds if wall_seconds else 0:.2f}x"
+    )
+    if slowest is not None:
+        lines.append(f"Slowest client: {slowest.client_id} ({slowest.seconds:.3f}s)")
+    return "\n".join(lines)
@@ -0,0 +1,146 @@
+import collections
+import logging
+import os
+import threading
+
+from services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "catalog_cache_requests_total", "Catalog cache lookups by result (hit or miss).", ("result",)
+)
+
+
+class CachedCatalog:
+    """
+    One serialized GET /products response and the catalog version it was built from.
+    """
+
+    __slots__ = ("version", "body", "next_cursor")
+
+    def __init__(self, version: int, body: bytes, next_cursor: int = None):
+        self.version = version
+        self.body = body
+        self.next_cursor = next_cursor
+
+
+class CatalogCache:
+    """
+    Bounded in-process LRU cache of serialized catalog responses.
+
+    Keys are (client_id, after, limit) and the bound is the total size of
+    the cached bodies. Every entry remembers the client's catalog version;
+    a lookup only hits when the caller passes the same version, so a write
+    made by another process (which bumps the version in the database)
+    makes older entries miss. Writers in this process also call
+    invalidate() to free the client's entries right away.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()
+        self._keys_by_client = collections.defaultdict(set)
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, version: int):
+        """
+        Returns the CachedCatalog stored under key for version, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version != version:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self._hits += 1
+        CACHE_REQUESTS.inc(result="hit" if entry is not None else "miss")
+        return entry
+
+    def put(self, key: tuple, version: int, body: bytes, next_cursor: int = None):
+        """
+        Stores body, evicting least recently used entries to stay within
+        max_bytes. Bodies larger than max_bytes are not cached.
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CachedCatalog(version, body, next_cursor)
+            self._keys_by_client[key[0]].add(key)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, client_id: int):
+        """
+        Drops every cached response of client_id.
+        """
+        with self._lock:
+            keys = list(self._keys_by_client.get(client_id, ()))
+            for key in keys:
+                self._remove(key)
+            if keys:
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_client.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+        client_keys = self._keys_by_client[key[0]]
+        client_keys.discard(key)
+        if not client_keys:
+            del self._keys_by_client[key[0]]
+
+
+_catalog_cache = None
+_catalog_cache_lock = threading.Lock()
+
+
+def get_catalog_cache() -> CatalogCache:
+    """
+    Returns the process-wide catalog cache, sized by CATALOG_CACHE_MAX_BYTES
+    (default 64 MiB; 0 disables caching).
+    """
+    global _catalog_cache
+    with _catalog_cache_lock:
+        if _catalog_cache is None:
+            _catalog_cache = CatalogCache(int(os.getenv("CATALOG_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+        return _catalog_cache
+
+
+def invalidate_client(client_id: int):
+    """
+    Called by writers after committing changes to client_id's catalog.
+    """
+    get_catalog_cache().invalidate(client_id)
+    logger.debug("Invalidated cached catalog responses for client %s.", client_id)
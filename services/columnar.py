@@ -0,0 +1,120 @@
+import itertools
+import sys
+
+import numpy as np
+
+# Products are converted to arrays this many rows at a time while reading.
+DEFAULT_BLOCK_SIZE = 50000
+
+
+class ProductColumns:
+    """
+    Column-oriented catalog snapshot: one NumPy array per field, sorted by
+    product_id and holding one entry per product. Titles are interned so a
+    title shared by many products is stored once.
+
+    Compared with a dict of per-product dicts this keeps a product in a few
+    array slots instead of three small objects plus two dict entries.
+    """
+
+    def __init__(self, product_ids: np.ndarray, titles: np.ndarray, price_cents: np.ndarray,
+                 store_ids: np.ndarray):
+        self.product_ids = product_ids
+        self.titles = titles
+        self.price_cents = price_cents
+        self.store_ids = store_ids
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    @classmethod
+    def from_records(cls, records, block_size: int = DEFAULT_BLOCK_SIZE):
+        """
+        Builds the columns from (product_id, title, price_cents, store_id) rows.
+        When a product_id repeats, the last row wins, as with a dict.
+        """
+        def iter_blocks():
+            rows = iter(records)
+            while True:
+                block = list(itertools.islice(rows, block_size))
+                if not block:
+                    break
+                product_ids, titles, price_cents, store_ids = zip(*block)
+                yield (
+                    np.array(product_ids, dtype=np.int64),
+                    np.array([sys.intern(title) for title in titles], dtype=object),
+                    np.array(price_cents, dtype=np.int64),
+                    np.array(store_ids, dtype=np.int64),
+                )
+
+        return cls.from_blocks(iter_blocks())
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """
+        Builds the columns from (product_ids, titles, price_cents, store_ids)
+        array blocks in file order. When a product_id repeats, the last row wins.
+        """
+        blocks = list(blocks)
+        if not blocks:
+            return cls.empty()
+
+        product_ids, titles, price_cents, store_ids = (np.concatenate(column) for column in zip(*blocks))
+        order = np.argsort(product_ids, kind="stable")
+        sorted_ids = product_ids[order]
+        # Stable sort keeps file order within an id, so the last of each run wins.
+        last = np.append(sorted_ids[1:] != sorted_ids[:-1], True)
+        keep = order[last]
+        return cls(product_ids[keep], titles[keep], price_cents[keep], store_ids[keep])
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64)
+        )
+
+    def record(self, position: int) -> dict:
+        """
+        Returns the product at position in the dict shape used by PortalSynchronizer.
+        """
+        return {
+            "title": self.titles[position],
+            "price_cents": int(self.price_cents[position]),
+            "store_id": int(self.store_ids[position])
+        }
+
+    def positions_of(self, product_ids: np.ndarray) -> tuple:
+        """
+        Merge-joins product_ids against this snapshot. Returns (positions,
+        found): positions[i] is where product_ids[i] sits here, valid only
+        where found[i] is True.
+        """
+        positions = np.searchsorted(self.product_ids, product_ids)
+        if not len(self):
+            return positions, np.zeros(len(product_ids), dtype=bool)
+        found = self.product_ids[np.minimum(positions, len(self) - 1)] == product_ids
+        return positions, found
+
+
+def diff_columns(db: ProductColumns, portal: ProductColumns) -> tuple:
+    """
+    Vectorized portal diff. Returns (delete_ids, insert_positions,
+    update_positions): the product_ids only present in db, and the portal
+    positions of products missing from db or differing from it in title,
+    price_cents or store_id.
+    """
+    _, in_portal = portal.positions_of(db.product_ids)
+    delete_ids = db.product_ids[~in_portal]
+
+    db_positions, in_db = db.positions_of(portal.product_ids)
+    insert_positions = np.flatnonzero(~in_db)
+
+    common = np.flatnonzero(in_db)
+    common_db = db_positions[common]
+    changed = (
+        (db.price_cents[common_db] != portal.price_cents[common])
+        | (db.store_ids[common_db] != portal.store_ids[common])
+        | (db.titles[common_db] != portal.titles[common])
+    )
+    return delete_ids, insert_positions, common[changed]
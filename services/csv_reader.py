@@ -1,33 +1,560 @@
+import codecs
+import collections
+import contextlib
 import csv
+import io
+import itertools
 import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+import numpy as np
+
+from domain.models import parse_price_cents
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Bytes of CSV parsed per task by iter_parallel_records.
+DEFAULT_RANGE_BYTES = 16 * 1024 * 1024
+
+# A row iter_parallel_records skipped, in file order among the records.
+SkippedRow = collections.namedtuple("SkippedRow", ["row", "error"])
+
+# Columns of feed and portal CSV files, in the order of a record.
+PRODUCT_COLUMNS = ("product_id", "title", "price", "store_id")
+
+# Rows converted to arrays at a time by ProductRowParser.iter_column_blocks.
+DEFAULT_COLUMN_BLOCK_SIZE = 50000
+
+# Prices up to this magnitude are exact in cents when converted through float64.
+_MAX_FLOAT_PRICE = 1e11
+
+# What to do with rows repeating a product_id seen earlier in the same file.
+DUPLICATES_FIRST = "first"
+DUPLICATES_LAST = "last"
+DUPLICATES_REJECT = "reject"
+DUPLICATE_POLICIES = (DUPLICATES_FIRST, DUPLICATES_LAST, DUPLICATES_REJECT)
+
+
+def iter_csv_lines(stream, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Reads a binary (or text) stream chunk_size bytes at a time and yields
+    its lines, newline included, so only one chunk plus one partial line
+    is ever held in memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def parse_product_row(row: dict) -> tuple:
+    """
+    Validates one row of a feed or portal CSV, given as a dict by column,
+    and returns (product_id, title, price_cents, store_id). Raises
+    ValueError or KeyError for rows the readers skip.
+    """
+    return (
+        int(row["product_id"]),
+        row["title"].strip(),
+        parse_price_cents(row["price"]),
+        int(row["store_id"])
+    )
+
+
+class ProductRowParser:
+    """
+    The parsing core of the feed and portal readers.
+
+    Column positions are resolved from the header once; rows from
+    csv.reader are then converted by position, without building a dict per
+    row. Only a skipped row is turned into a dict, in the shape
+    csv.DictReader gives, for the log. Rows that are too short are skipped
+    like any other invalid row. Blank lines are ignored.
+    """
+
+    def __init__(self, fieldnames: list):
+        self.fieldnames = fieldnames
+        positions = {name: i for i, name in enumerate(fieldnames)}
+        self.missing = [name for name in PRODUCT_COLUMNS if name not in positions]
+        self.positions = tuple(positions.get(name) for name in PRODUCT_COLUMNS)
+
+    @classmethod
+    def from_lines(cls, lines) -> tuple:
+        """
+        Returns (parser, rows) for an iterable of CSV lines whose first row
+        is the header, or (None, None) for an empty file.
+        """
+        rows = csv.reader(lines)
+        fieldnames = next(rows, None)
+        if fieldnames is None:
+            return None, None
+        return cls(fieldnames), rows
+
+    def row_dict(self, values: list) -> dict:
+        """
+        Returns values keyed by column name, as csv.DictReader would.
+        """
+        row = dict(zip(self.fieldnames, values))
+        if len(values) > len(self.fieldnames):
+            row[None] = values[len(self.fieldnames):]
+        for name in self.fieldnames[len(values):]:
+            row[name] = None
+        return row
+
+    def iter_records(self, rows, on_skip=None):
+        """
+        Yields the valid (product_id, title, price_cents, store_id) records
+        of rows in order, calling on_skip(row, error) for each invalid one.
+        """
+        if self.missing:
+            # Every row fails; parse_product_row raises the error a DictReader row would.
+            for values in rows:
+                if not values:
+                    continue
+                row = self.row_dict(values)
+                try:
+                    parse_product_row(row)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    if on_skip is not None:
+                        on_skip(row, e)
+            return
+        product_id_at, title_at, price_at, store_id_at = self.positions
+        for values in rows:
+            if not values:
+                continue
+            try:
+                record = (
+                    int(values[product_id_at]),
+                    values[title_at].strip(),
+                    parse_price_cents(values[price_at]),
+                    int(values[store_id_at])
+                )
+            except (ValueError, IndexError) as e:
+                if on_skip is not None:
+                    on_skip(self.row_dict(values), e)
+                continue
+            yield record
+
+    def iter_column_blocks(self, rows, on_skip=None, block_size: int = DEFAULT_COLUMN_BLOCK_SIZE):
+        """
+        Yields (product_ids, titles, price_cents, store_ids) NumPy arrays for
+        up to block_size rows at a time, with the records iter_records would
+        give. Each numeric column is converted in one pass into an array and
+        prices become cents with vectorized arithmetic; a block containing
+        anything that cannot be converted exactly that way is parsed row by
+        row instead.
+        """
+        rows = iter(rows)
+        while True:
+            block = [values for values in itertools.islice(rows, block_size) if values]
+            if not block:
+                break
+            columns = None if self.missing else self._convert_block(block)
+            if columns is None:
+                records = list(self.iter_records(block, on_skip))
+                if not records:
+                    continue
+                product_ids, titles, price_cents, store_ids = zip(*records)
+                columns = (
+                    np.array(product_ids, dtype=np.int64),
+                    np.array([sys.intern(title) for title in titles], dtype=object),
+                    np.array(price_cents, dtype=np.int64),
+                    np.array(store_ids, dtype=np.int64),
+                )
+            yield columns
+
+    def _convert_block(self, block: list):
+        product_id_at, title_at, price_at, store_id_at = self.positions
+        count = len(block)
+        try:
+            product_ids = np.fromiter(map(int, [values[product_id_at] for values in block]), np.int64, count)
+            store_ids = np.fromiter(map(int, [values[store_id_at] for values in block]), np.int64, count)
+            prices = np.fromiter(map(float, [values[price_at] for values in block]), np.float64, count)
+        except (ValueError, IndexError, OverflowError):
+            return None
+        scaled = prices * 100
+        price_cents = np.rint(scaled)
+        # Only prices that are whole cents (up to float noise) are safe to take from float64;
+        # anything else, including NaN and infinities, goes through parse_price_cents.
+        if not (np.all(np.abs(prices) < _MAX_FLOAT_PRICE) and np.all(np.abs(scaled - price_cents) < 1e-6)):
+            return None
+        titles = np.array([sys.intern(values[title_at].strip()) for values in block], dtype=object)
+        return product_ids, titles, price_cents.astype(np.int64), store_ids
+
+
+def iter_product_records(lines, on_skip=None):
+    """
+    Yields the valid records of a feed or portal CSV given as lines.
+    """
+    parser, rows = ProductRowParser.from_lines(lines)
+    if parser is not None:
+        yield from parser.iter_records(rows, on_skip)
+
+
+def iter_product_column_blocks(lines, on_skip=None, block_size: int = DEFAULT_COLUMN_BLOCK_SIZE):
+    """
+    Yields the valid records of a feed or portal CSV given as lines, as
+    blocks of NumPy columns (see ProductRowParser.iter_column_blocks).
+    """
+    parser, rows = ProductRowParser.from_lines(lines)
+    if parser is not None:
+        yield from parser.iter_column_blocks(rows, on_skip, block_size)
+
+
+def default_duplicate_policy() -> str:
+    """
+    Policy for product_ids repeated within one file (DUPLICATE_POLICY).
+    """
+    return os.getenv("DUPLICATE_POLICY", DUPLICATES_LAST)
+
+
+class DuplicateProductError(ValueError):
+    """
+    Raised under the "reject" policy when a file repeats a product_id.
+    """
+
+    def __init__(self, product_id: int):
+        super().__init__(f"product_id {product_id} appears more than once in the file (duplicate policy 'reject')")
+        self.product_id = product_id
+
+
+class DuplicateIndex:
+    """
+    Index over the product_ids read from one file, applying a duplicate
+    policy batch by batch while the records stream past:
+      - "first":  a row repeating an earlier product_id is dropped.
+      - "last":   every row passes; the consumers keep the last row of a
+                  product_id (a dict, DISTINCT ON, or an upsert).
+      - "reject": DuplicateProductError at the first repeated product_id.
+    duplicates counts the rows that repeated an earlier product_id.
+
+    The ids seen so far are kept in a few sorted int64 arrays, 8 bytes per
+    distinct product_id, so a multi-million row feed costs megabytes rather
+    than a Python set of int objects. Runs of similar size are merged, so
+    there are at most log2(ids) of them to search. After filter_batch(), batch_repeats holds the
+    product_ids of that batch which an earlier batch already had.
+    """
+
+    FILTER_BATCH_SIZE = 10000
+
+    def __init__(self, policy: str = None):
+        policy = default_duplicate_policy() if policy is None else policy
+        if policy not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy '{policy}', expected one of {DUPLICATE_POLICIES}")
+        self.policy = policy
+        self.duplicates = 0
+        self.batch_repeats = frozenset()
+        self._runs = []
+
+    def filter(self, records):
+        """
+        Yields the (product_id, ...) records that pass the policy.
+        """
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.FILTER_BATCH_SIZE:
+                yield from self.filter_batch(batch)
+                batch = []
+        if batch:
+            yield from self.filter_batch(batch)
+
+    def filter_batch(self, records: list) -> list:
+        """
+        Returns the records of one batch, in file order, that pass the policy.
+        """
+        product_ids = np.fromiter(map(itemgetter(0), records), np.int64, len(records))
+        earlier, repeated = self._check(product_ids)
+        self.batch_repeats = frozenset(product_ids[earlier].tolist())
+        if self.policy == DUPLICATES_FIRST and repeated.any():
+            return [record for record, repeat in zip(records, repeated.tolist()) if not repeat]
+        return records
+
+    def filter_blocks(self, blocks):
+        """
+        Like filter(), for (product_ids, titles, price_cents, store_ids) array blocks.
+        """
+        for block in blocks:
+            _, repeated = self._check(block[0].astype(np.int64, copy=False))
+            if self.policy == DUPLICATES_FIRST and repeated.any():
+                block = tuple(column[~repeated] for column in block)
+            yield block
+
+    def _check(self, product_ids: np.ndarray) -> tuple:
+        """
+        Records product_ids and returns (earlier, repeated) bool arrays:
+        the ids an earlier batch had, and those plus the later occurrences of
+        an id repeated within this batch.
+        """
+        # A stable sort keeps the first occurrence of an id in front of its repeats.
+        order = np.argsort(product_ids, kind="stable")
+        ordered = product_ids[order]
+        # Sorted lookups walk each run in order instead of jumping around it.
+        earlier_ordered = np.zeros(len(ordered), dtype=bool)
+        for run in self._runs:
+            positions = np.minimum(np.searchsorted(run, ordered), len(run) - 1)
+            earlier_ordered |= run[positions] == ordered
+        earlier = np.empty(len(ordered), dtype=bool)
+        earlier[order] = earlier_ordered
+        repeated = earlier.copy()
+        repeated[order[1:][ordered[1:] == ordered[:-1]]] = True
+        count = int(np.count_nonzero(repeated))
+        if count:
+            self.duplicates += count
+            if self.policy == DUPLICATES_REJECT:
+                raise DuplicateProductError(int(product_ids[np.argmax(repeated)]))
+        self._add_run(np.sort(product_ids[~repeated]))
+        return earlier, repeated
+
+    def _add_run(self, run: np.ndarray):
+        if not len(run):
+            return
+        self._runs.append(run)
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            newest = self._runs.pop()
+            self._runs[-1] = np.sort(np.concatenate((self._runs[-1], newest)), kind="mergesort")
+
+    def log_duplicates(self, what: str, client_id: int):
+        if self.duplicates:
+            logger.warning(
+                "%s for client %s repeated a product_id in %d row(s); kept the %s row of each.",
+                what, client_id, self.duplicates, self.policy
+            )
+
+
+def default_parse_workers() -> int:
+    """
+    Processes used to parse large CSV files on disk (CSV_PARSE_WORKERS);
+    0 or 1 parses on the calling thread.
+    """
+    return int(os.getenv("CSV_PARSE_WORKERS", "0"))
+
+
+@contextlib.contextmanager
+def open_csv_source(source, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Yields an iterable of CSV lines for source, which is either a file path
+    or an already open file object such as an uploaded file.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield f
+    else:
+        yield iter_csv_lines(source, chunk_size)
+
+
+def split_byte_ranges(path, range_bytes: int = DEFAULT_RANGE_BYTES) -> tuple:
+    """
+    Returns (header_line, ranges): the raw header record of the file and
+    [start, end) byte offsets that cover the rest of it. Every range starts
+    at the beginning of a record and ends just after one (or at EOF), so
+    the ranges parse exactly like the whole file.
+
+    A range is cut after the first newline past range_bytes. Only when the
+    range contains a quote can that newline lie inside a quoted field; then
+    csv.reader reads the range to find where the record really ends.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+        if b'"' in header_line:
+            header_line_end = _record_end(f, 0, len(header_line), header_line.count(b'\n'), size)
+            f.seek(0)
+            header_line = f.read(header_line_end)
+        ranges = []
+        start = len(header_line)
+        while start < size:
+            f.seek(min(start + range_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            f.seek(start)
+            chunk = f.read(end - start)
+            if b'"' in chunk:
+                end = _record_end(f, start, end, chunk.count(b'\n'), size)
+            ranges.append((start, end))
+            start = end
+    return header_line, ranges
+
+
+def _record_end(f, start: int, line_end: int, lines: int, size: int) -> int:
+    """
+    Given that a record of the binary file f begins at start and that its
+    lines-th line from there ends at line_end, returns the offset just
+    after the first record that ends on that line or later.
+    """
+    f.seek(start)
+    text = io.TextIOWrapper(f, encoding='utf-8', newline='\n')
+    try:
+        reader = csv.reader(text)
+        # Every record spans at least one line, so `lines` records reach line_end; consumed in C.
+        collections.deque(itertools.islice(reader, lines), maxlen=0)
+        lines_read = reader.line_num
+    except csv.Error:
+        # A line csv cannot take on its own, e.g. with a bare carriage return: keep the rest in one range.
+        return size
+    finally:
+        text.detach()
+    if lines_read < lines:
+        return size
+    f.seek(line_end)
+    for _ in range(lines_read - lines):
+        f.readline()
+    return min(f.tell(), size)
+
+
+def _parse_byte_range(path, start: int, end: int, fieldnames: list) -> list:
+    # Runs in a worker process: same parsing and validation as the serial readers.
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+    items = []
+    records = ProductRowParser(fieldnames).iter_records(
+        csv.reader(lines), on_skip=lambda row, error: items.append(SkippedRow(row, str(error)))
+    )
+    for record in records:
+        items.append(record)
+    return items
+
+
+def iter_parallel_records(path, workers: int, on_skip=None, range_bytes: int = DEFAULT_RANGE_BYTES):
+    """
+    Parses the CSV file at path on a pool of workers processes and yields
+    the valid (product_id, title, price_cents, store_id) records in file
+    order, calling on_skip(row, error) for each skipped row at its place.
+
+    The file is cut into record-aligned ranges of about range_bytes that
+    are parsed independently (see split_byte_ranges). At most two ranges per
+    worker are in flight, which bounds memory.
+    Files no larger than one range are parsed on the calling thread.
+    """
+    header_line, ranges = split_byte_ranges(path, range_bytes)
+    with io.TextIOWrapper(io.BytesIO(header_line), encoding='utf-8') as header:
+        fieldnames = next(csv.reader(header), None)
+    if fieldnames is None:
+        return
+
+    def consume(items):
+        for item in items:
+            if isinstance(item, SkippedRow):
+                if on_skip is not None:
+                    on_skip(item.row, item.error)
+            else:
+                yield item
+
+    if len(ranges) <= 1 or workers <= 1:
+        for start, end in ranges:
+            yield from consume(_parse_byte_range(path, start, end, fieldnames))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        ranges = iter(ranges)
+        for start, end in ranges:
+            pending.append(executor.submit(_parse_byte_range, path, start, end, fieldnames))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            items = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(executor.submit(_parse_byte_range, path, *next_range, fieldnames))
+            yield from consume(items)
+
+
 class FeedCsvReader:
     """
     Responsible for reading and validating feed CSV files.
     """
 
+    DEFAULT_BATCH_SIZE = 10000
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, parse_workers: int = None):
+        self.chunk_size = chunk_size
+        self.parse_workers = default_parse_workers() if parse_workers is None else parse_workers
+
     def read(self, csv_path: str) -> list:
         """
         Reads the CSV file at csv_path and returns a list of valid records.
-        Each record is a tuple: (product_id, title, price, store_id).
+        Each record is a tuple: (product_id, title, price_cents, store_id).
         Invalid rows are skipped and an error is logged.
         """
-        records = []
+        return list(self.iter_records(csv_path))
+
+    def iter_batches(self, csv_path: str, batch_size: int = DEFAULT_BATCH_SIZE, duplicates: DuplicateIndex = None):
+        """
+        Yields lists of at most batch_size valid records, so only one batch
+        is held in memory at a time regardless of the file size. With a
+        DuplicateIndex, each batch passes through it before it is yielded,
+        so its batch_repeats describe the batch just yielded.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        batch = []
+        for record in self.iter_records(csv_path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield from self._resolved_batch(batch, duplicates)
+                batch = []
+        if batch:
+            yield from self._resolved_batch(batch, duplicates)
+
+    @staticmethod
+    def _resolved_batch(batch: list, duplicates: DuplicateIndex = None):
+        if duplicates is not None:
+            batch = duplicates.filter_batch(batch)
+        if batch:
+            yield batch
+
+    def check_unique_product_ids(self, csv_path):
+        """
+        Pre-pass for the "reject" policy: parses csv_path without logging
+        skipped rows and raises DuplicateProductError at its first repeated
+        product_id. A stream is rewound to where it started, so it can be
+        imported next.
+        """
+        index = DuplicateIndex(DUPLICATES_REJECT)
+        start = None if isinstance(csv_path, (str, os.PathLike)) else csv_path.tell()
         try:
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        product_id = int(row["product_id"])
-                        title = row["title"].strip()
-                        price = float(row["price"])
-                        store_id = int(row["store_id"])
-                        records.append((product_id, title, price, store_id))
-                    except (ValueError, KeyError) as e:
-                        logger.error("Skipping row due to error: %s -- %s", row, e)
+            with open_csv_source(csv_path, self.chunk_size) as f:
+                for _ in index.filter_blocks(iter_product_column_blocks(f)):
+                    pass
+        finally:
+            if start is not None:
+                csv_path.seek(start)
+
+    def iter_records(self, csv_path):
+        """
+        Yields valid records one at a time while the file is being read.
+        csv_path may also be an open binary file object, which is consumed
+        chunk_size bytes at a time. Files on disk are parsed on a process
+        pool when parse_workers > 1.
+        """
+        try:
+            if self.parse_workers > 1 and isinstance(csv_path, (str, os.PathLike)):
+                yield from iter_parallel_records(csv_path, self.parse_workers, on_skip=self._log_skipped_row)
+                return
+            with open_csv_source(csv_path, self.chunk_size) as f:
+                yield from iter_product_records(f, on_skip=self._log_skipped_row)
         except Exception as e:
             logger.exception("Error reading CSV file '%s': %s", csv_path, e)
             raise
-        return records
+
+    @staticmethod
+    def _log_skipped_row(row: dict, error):
+        logger.error("Skipping row due to error: %s -- %s", row, error)
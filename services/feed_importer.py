@@ -1,7 +1,16 @@
+import itertools
 import logging
 from db.connection import DatabaseConnection
+from domain.models import FeedImportResult, product_row_hash
 from repository.product_repository import ProductRepository
-from services.csv_reader import FeedCsvReader
+from services.applied_files import ROLE_FEED
+from services.apply_checkpoints import ApplyCheckpoints, default_chunk_rows, job_key
+from services.catalog_cache import invalidate_client
+from services.csv_reader import (
+    DUPLICATE_POLICIES, DUPLICATES_REJECT, DuplicateIndex, FeedCsvReader, default_duplicate_policy
+)
+from services.logging_support import RowActivityLog
+from services.metrics import pipeline_scope, stage_timer, timed_batches
 
 logger = logging.getLogger(__name__)
 
@@ -11,46 +20,253 @@ class FeedImporter:
     """
     Orchestrates the feed import process by reading the CSV and
     upserting records into the database using the repository.
+
+    Two import modes are supported:
+      - "row":  one UPDATE or INSERT per record (the original behaviour).
+      - "bulk": COPY the records into a staging table and merge them into
+                products with a single INSERT ... ON CONFLICT statement.
+
+    With chunk_rows > 0 (APPLY_CHUNK_ROWS) either mode commits every
+    chunk_rows records together with a checkpoint, instead of holding one
+    transaction for the whole file. A failed or interrupted import of the
+    same file resumes after the last committed chunk.
+
+    A product_id repeated within the file is resolved while parsing, by the
+    duplicates policy ("first", "last" or "reject", see DuplicateIndex), and
+    the repeated rows are reported in the result's duplicates count. Under
+    "reject" the whole file is checked before anything is written.
     """
 
-    def __init__(self, repository: ProductRepository, csv_reader: FeedCsvReader):
+    MODE_ROW = "row"
+    MODE_BULK = "bulk"
+    MODES = (MODE_ROW, MODE_BULK)
+
+    def __init__(self, repository: ProductRepository, csv_reader: FeedCsvReader, mode: str = MODE_ROW,
+                 batch_size: int = FeedCsvReader.DEFAULT_BATCH_SIZE, chunk_rows: int = None,
+                 checkpoints: ApplyCheckpoints = None, duplicates: str = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown import mode '{mode}', expected one of {self.MODES}")
+        duplicates = default_duplicate_policy() if duplicates is None else duplicates
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy '{duplicates}', expected one of {DUPLICATE_POLICIES}")
+        self.duplicates = duplicates
         self.repository = repository
         self.csv_reader = csv_reader
+        self.mode = mode
+        self.batch_size = batch_size
+        self.chunk_rows = default_chunk_rows() if chunk_rows is None else chunk_rows
+        self.checkpoints = checkpoints or ApplyCheckpoints()
 
-    def import_feed(self, csv_path: str, client_id: int):
-        logger.info("Starting import_feed with file: '%s' for client: %s", csv_path, client_id)
-        records = self.csv_reader.read(csv_path)
-        if not records:
-            logger.info("No valid records found in feed CSV.")
-            return
-        logger.info("Parsed %d valid record(s) from CSV.", len(records))
-        self._upsert_feed_records(records, client_id)
-
-    def _upsert_feed_records(self, records: list, client_id: int):
-        product_ids = tuple(record[0] for record in records)
-        existing_ids = self.repository.get_existing_product_ids(client_id, product_ids)
+    def import_feed(self, csv_path: str, client_id: int, progress=None) -> FeedImportResult:
+        """
+        Streams the feed in batches of batch_size records, so peak memory
+        depends on the batch size rather than on the size of the file.
+        All batches are written in a single transaction unless chunk_rows is set.
+        If given, progress(records_processed) is called after every batch.
+        """
+        logger.info("Starting import_feed (%s mode) with file: '%s' for client: %s", self.mode, csv_path, client_id)
+        with pipeline_scope("feed", client_id):
+            if self.duplicates == DUPLICATES_REJECT:
+                # A rejected file must fail before any row is written or any chunk committed.
+                with stage_timer("csv_parse"):
+                    self.csv_reader.check_unique_product_ids(csv_path)
+            checkpoint = None
+            if self.chunk_rows:
+                checkpoint = self.checkpoints.load(client_id, job_key(ROLE_FEED, csv_path))
+            index = DuplicateIndex(self.duplicates)
+            batches = timed_batches("csv_parse", self.csv_reader.iter_batches(csv_path, self.batch_size, index))
+            if checkpoint is not None and checkpoint.rows_done:
+                batches = _skip_records(batches, checkpoint.rows_done)
+            first_batch = next(batches, None)
+            if first_batch is None:
+                if checkpoint is not None and checkpoint.resumed:
+                    # Everything was committed; only the final commit was lost.
+                    self.checkpoints.finish(checkpoint)
+                    return FeedImportResult(**checkpoint.counts, duplicates=index.duplicates)
+                logger.info("No valid records found in feed CSV.")
+                return FeedImportResult()
+            batches = itertools.chain([first_batch], batches)
+            if self.mode == self.MODE_BULK:
+                result = self._bulk_upsert_feed_records(batches, client_id, progress, checkpoint, index)
+            else:
+                result = self._upsert_feed_records(batches, client_id, progress, checkpoint, index)
+            index.log_duplicates("Feed", client_id)
+            result.duplicates = index.duplicates
+            return result
 
+    def _upsert_feed_records(self, batches, client_id: int, progress=None, checkpoint=None,
+                             duplicates: DuplicateIndex = None) -> FeedImportResult:
         conn = db_connection.get_connection()
-        updated_count = 0
-        inserted_count = 0
+        parsed_count = 0
+        pending_count = 0
+        changed = False
+        updated_count = checkpoint.count("updated") if checkpoint else 0
+        inserted_count = checkpoint.count("inserted") if checkpoint else 0
+        unchanged_count = checkpoint.count("unchanged") if checkpoint else 0
+        activity = RowActivityLog(logger, client_id)
         try:
             with conn.cursor() as cur:
-                for record in records:
-                    product_id = record[0]
-                    if product_id in existing_ids:
-                        self.repository.update_product(cur, client_id, record)
-                        updated_count += 1
-                    else:
-                        self.repository.insert_product(cur, client_id, record)
-            conn.commit()
+                for records in batches:
+                    parsed_count += len(records)
+                    pending_count += len(records)
+                    # Under the "last" policy a batch may repeat a product_id; one statement per product.
+                    records = list({record[0]: record for record in records}.values())
+                    # Products an earlier batch already counted are written again but not counted again.
+                    repeats = duplicates.batch_repeats if duplicates is not None else ()
+                    product_ids = tuple(record[0] for record in records)
+                    with stage_timer("db_fetch", len(records)):
+                        existing_hashes = self.repository.get_existing_product_hashes(client_id, product_ids, cur)
+
+                    to_insert = []
+                    to_update = []
+                    with stage_timer("diff", len(records)):
+                        for record in records:
+                            product_id, title, price_cents, store_id = record
+                            if product_id not in existing_hashes:
+                                to_insert.append(record)
+                            elif existing_hashes[product_id] == product_row_hash(title, price_cents, store_id):
+                                if product_id not in repeats:
+                                    unchanged_count += 1
+                            else:
+                                to_update.append(record)
+
+                    with stage_timer("apply", len(to_insert) + len(to_update)):
+                        for record in to_insert:
+                            self.repository.insert_product(cur, client_id, record)
+                        for record in to_update:
+                            self.repository.update_product(cur, client_id, record)
+                    inserted_count += len(to_insert)
+                    updated_count += sum(1 for record in to_update if record[0] not in repeats)
+                    changed = changed or bool(to_insert or to_update)
+                    activity.rows("inserted", [record[0] for record in to_insert])
+                    activity.rows("updated", [record[0] for record in to_update])
+                    if checkpoint is not None and pending_count >= self.chunk_rows:
+                        checkpoint.advance(
+                            pending_count, inserted=inserted_count, updated=updated_count, unchanged=unchanged_count
+                        )
+                        self._commit(conn, cur, client_id, changed, checkpoint)
+                        pending_count, changed = 0, False
+                    if progress:
+                        progress(parsed_count)
+                self._commit(conn, cur, client_id, changed, checkpoint, final=True)
+            logger.info("Parsed %d valid record(s) from CSV.", parsed_count)
             logger.info(
-                "Synchronization summary for client %s: Updated %d record(s), Inserted %d new record(s).",
-                client_id, updated_count, inserted_count
+                "Synchronization summary for client %s: Updated %d record(s), Inserted %d new record(s), "
+                "Skipped %d unchanged record(s).",
+                client_id, updated_count, inserted_count, unchanged_count
             )
         except Exception as e:
             logger.exception("Database error during feed import: %s", e)
             conn.rollback()
+            self._log_resume_point(checkpoint, client_id)
             raise
         finally:
             conn.close()
             logger.info("Database connection closed after feed import.")
+        return FeedImportResult(inserted=inserted_count, updated=updated_count, unchanged=unchanged_count)
+
+    def _bulk_upsert_feed_records(self, batches, client_id: int, progress=None, checkpoint=None,
+                                  duplicates: DuplicateIndex = None) -> FeedImportResult:
+        conn = db_connection.get_connection()
+        parsed_count = 0
+        pending_count = 0
+        updated_count = checkpoint.count("updated") if checkpoint else 0
+        inserted_count = checkpoint.count("inserted") if checkpoint else 0
+        unchanged_count = checkpoint.count("unchanged") if checkpoint else 0
+        # A merge only sees its own chunk: ids an earlier chunk already counted are
+        # passed to it so they are not counted twice, as in row mode.
+        chunk_repeats = set()
+        chunk_first_ids = set()
+
+        def merge(cur):
+            nonlocal inserted_count, updated_count, unchanged_count
+            counted_ids = chunk_repeats - chunk_first_ids
+            with stage_timer("apply", pending_count):
+                inserted, updated, unchanged = self.repository.merge_staging(cur, client_id, counted_ids)
+            inserted_count += inserted
+            updated_count += updated
+            unchanged_count += unchanged
+            chunk_repeats.clear()
+            chunk_first_ids.clear()
+            # An uncounted id may still have been rewritten by this merge.
+            return bool(inserted or updated or counted_ids)
+
+        try:
+            with conn.cursor() as cur:
+                self.repository.create_staging_table(cur)
+                for records in batches:
+                    parsed_count += len(records)
+                    pending_count += len(records)
+                    if checkpoint is not None and duplicates is not None:
+                        repeats = duplicates.batch_repeats
+                        chunk_repeats.update(repeats)
+                        chunk_first_ids.update(record[0] for record in records if record[0] not in repeats)
+                    with stage_timer("copy", len(records)):
+                        self.repository.copy_to_staging(cur, records)
+                    if checkpoint is not None and pending_count >= self.chunk_rows:
+                        changed = merge(cur)
+                        checkpoint.advance(
+                            pending_count, inserted=inserted_count, updated=updated_count, unchanged=unchanged_count
+                        )
+                        # The staging table is dropped with the commit.
+                        self._commit(conn, cur, client_id, changed, checkpoint)
+                        self.repository.create_staging_table(cur)
+                        pending_count = 0
+                    if progress:
+                        progress(parsed_count)
+                changed = merge(cur) if pending_count else False
+                self._commit(conn, cur, client_id, changed, checkpoint, final=True)
+            logger.info("Parsed %d valid record(s) from CSV.", parsed_count)
+            logger.info(
+                "Bulk import summary for client %s: Updated %d record(s), Inserted %d new record(s), "
+                "Skipped %d unchanged record(s).",
+                client_id, updated_count, inserted_count, unchanged_count
+            )
+        except Exception as e:
+            logger.exception("Database error during bulk feed import: %s", e)
+            conn.rollback()
+            self._log_resume_point(checkpoint, client_id)
+            raise
+        finally:
+            conn.close()
+            logger.info("Database connection closed after bulk feed import.")
+        return FeedImportResult(inserted=inserted_count, updated=updated_count, unchanged=unchanged_count)
+
+    def _commit(self, conn, cur, client_id: int, changed: bool, checkpoint=None, final: bool = False):
+        """
+        Commits the open transaction: bumps the catalog version if rows
+        changed and, in chunked mode, saves the checkpoint (or clears it
+        with the final commit) in the same transaction.
+        """
+        if changed:
+            self.repository.bump_catalog_version(cur, client_id)
+        if checkpoint is not None:
+            if final:
+                self.checkpoints.clear(cur, checkpoint)
+            else:
+                self.checkpoints.save(cur, checkpoint)
+        with stage_timer("commit"):
+            conn.commit()
+        if changed:
+            invalidate_client(client_id)
+
+    @staticmethod
+    def _log_resume_point(checkpoint, client_id: int):
+        if checkpoint is not None and checkpoint.rows_done:
+            logger.error(
+                "Feed import for client %s stopped after %d committed record(s); "
+                "importing the same file again resumes from there.",
+                client_id, checkpoint.rows_done
+            )
+
+
+def _skip_records(batches, count: int):
+    """
+    Drops the first count records across batches.
+    """
+    for records in batches:
+        if count >= len(records):
+            count -= len(records)
+            continue
+        yield records[count:]
+        count = 0
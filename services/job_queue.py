@@ -0,0 +1,144 @@
+import collections
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    A unit of background work plus its observable state.
+    """
+
+    STATE_QUEUED = "queued"
+    STATE_RUNNING = "running"
+    STATE_SUCCEEDED = "succeeded"
+    STATE_FAILED = "failed"
+
+    def __init__(self, kind: str, client_id: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.client_id = client_id
+        self.state = self.STATE_QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update_progress(self, **counts):
+        """
+        Merges counts into the job's progress; safe to call from the worker thread.
+        """
+        with self._lock:
+            self.progress.update(counts)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "client_id": self.client_id,
+                "state": self.state,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "queued_seconds": round((self.started_at or end) - self.created_at, 3),
+                "run_seconds": round(end - self.started_at, 3) if self.started_at else None,
+            }
+
+    def _set_state(self, state: str, **fields):
+        with self._lock:
+            self.state = state
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def __repr__(self):
+        return f"<Job(id={self.id},kind={self.kind},client_id={self.client_id},state={self.state})>"
+
+
+class JobQueue:
+    """
+    In-process queue that runs jobs on a fixed-size worker pool.
+
+    Finished jobs are kept for status queries; once more than max_finished
+    have accumulated the oldest ones are forgotten.
+    """
+
+    def __init__(self, max_workers: int = 2, max_finished: int = 1000):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="catalog-job")
+        self._jobs = {}
+        self._finished = collections.deque()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, client_id: int, func) -> Job:
+        """
+        Queues func(job) for execution and returns the job immediately.
+        Whatever func returns becomes the job's result.
+        """
+        job = Job(kind, client_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func)
+        logger.info("Queued %s job %s for client %s.", kind, job.id, client_id)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: Job, func):
+        job._set_state(Job.STATE_RUNNING, started_at=time.time())
+        logger.info("Started %s job %s for client %s.", job.kind, job.id, job.client_id)
+        try:
+            result = func(job)
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job.id, e)
+            job._set_state(Job.STATE_FAILED, error=str(e), finished_at=time.time())
+        else:
+            job._set_state(Job.STATE_SUCCEEDED, result=result, finished_at=time.time())
+            logger.info("Finished %s job %s for client %s.", job.kind, job.id, job.client_id)
+        self._remember_finished(job)
+
+    def _remember_finished(self, job: Job):
+        with self._lock:
+            self._finished.append(job.id)
+            while len(self._finished) > self.max_finished:
+                self._jobs.pop(self._finished.popleft(), None)
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Returns the process-wide job queue, sized by JOB_WORKERS.
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(max_workers=int(os.getenv("JOB_WORKERS", "2")))
+        return _job_queue
+
+
+def shutdown_job_queue():
+    global _job_queue
+    with _job_queue_lock:
+        queue, _job_queue = _job_queue, None
+    if queue is not None:
+        queue.shutdown()
@@ -0,0 +1,116 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+LOG_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def configure_logging(level: int = logging.INFO):
+    """
+    Routes the root logger through a QueueHandler. Records are put on an
+    unbounded queue and written by a background listener thread, so the
+    threads doing imports and syncs never block on log I/O.
+    Calling it again is a no-op.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.SimpleQueue()
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+
+        root = logging.getLogger()
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(level)
+    atexit.register(stop_logging)
+    # A forked worker inherits the queue but not the listener thread.
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+def _restart_listener_in_child():
+    global _listener
+    if _listener is not None:
+        _listener = logging.handlers.QueueListener(
+            _listener.queue, *_listener.handlers, respect_handler_level=True
+        )
+        _listener.start()
+
+
+def stop_logging():
+    """
+    Flushes queued records and stops the listener thread.
+    """
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+class RowActivityLog:
+    """
+    Replaces one log line per written row with periodic summaries.
+
+    Row events are only counted; every `every` rows (LOG_PROGRESS_EVERY,
+    default 100000) an INFO summary of the counts so far is logged. The
+    final counts are logged by the caller with its result; summary() only
+    formats the counts. With a sample rate (LOG_ROW_SAMPLE_RATE, e.g.
+    0.001) and the logger at DEBUG, every 1/rate-th row is also logged
+    individually.
+    """
+
+    def __init__(self, logger: logging.Logger, client_id: int, every: int = None, sample_rate: float = None):
+        self.logger = logger
+        self.client_id = client_id
+        self.every = every or int(os.getenv("LOG_PROGRESS_EVERY", "100000"))
+        if sample_rate is None:
+            sample_rate = float(os.getenv("LOG_ROW_SAMPLE_RATE", "0"))
+        self.sample_every = round(1 / sample_rate) if sample_rate > 0 and logger.isEnabledFor(logging.DEBUG) else 0
+        self.counts = {}
+        self.total = 0
+        self._next_summary = self.every
+
+    def row(self, action: str, product_id: int):
+        """
+        Counts one row event, e.g. row("inserted", 42).
+        """
+        self.counts[action] = self.counts.get(action, 0) + 1
+        self.total += 1
+        if self.sample_every and self.total % self.sample_every == 0:
+            self.logger.debug("Sampled row: %s product_id %s for client %s", action, product_id, self.client_id)
+        if self.total >= self._next_summary:
+            self._log_progress()
+
+    def rows(self, action: str, product_ids: list):
+        """
+        Counts a batch of row events at once.
+        """
+        if not product_ids:
+            return
+        if self.sample_every:
+            first = (-self.total - 1) % self.sample_every
+            for product_id in product_ids[first::self.sample_every]:
+                self.logger.debug("Sampled row: %s product_id %s for client %s", action, product_id, self.client_id)
+        self.counts[action] = self.counts.get(action, 0) + len(product_ids)
+        self.total += len(product_ids)
+        if self.total >= self._next_summary:
+            self._log_progress()
+
+    def summary(self) -> str:
+        """
+        Returns the counts so far as text, e.g. "inserted 3, updated 1".
+        """
+        return ", ".join(f"{action} {count}" for action, count in self.counts.items()) or "no rows"
+
+    def _log_progress(self):
+        self.logger.info("Progress for client %s: %d row(s) written (%s).", self.client_id, self.total, self.summary())
+        self._next_summary = (self.total // self.every + 1) * self.every
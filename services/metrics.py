@@ -0,0 +1,221 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# (pipeline, client_id) of the import or sync running in the current context.
+_current_pipeline = contextvars.ContextVar("current_pipeline", default=("", ""))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple, values: tuple, le: str = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic counter with labels, rendered in the Prometheus text format.
+    """
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> dict:
+        """
+        Returns {label values: value}.
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in sorted(self.samples().items())
+        ]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with labels, rendered in the Prometheus text format.
+    """
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket..., observations, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def samples(self) -> dict:
+        """
+        Returns {label values: (observations, sum)}.
+        """
+        with self._lock:
+            return {key: (state[-2], state[-1]) for key, state in self._values.items()}
+
+    def render(self) -> list:
+        with self._lock:
+            snapshot = {key: list(state) for key, state in self._values.items()}
+        lines = []
+        for key, state in sorted(snapshot.items()):
+            for bound, count in zip(self.buckets, state):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, bound)} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, '+Inf')} {state[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-2]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the process' metrics and renders them for a Prometheus scrape.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "catalog_stage_seconds", "Time spent in each stage of a feed import or portal sync.",
+    ("pipeline", "stage", "client_id")
+)
+STAGE_RECORDS = REGISTRY.counter(
+    "catalog_stage_records_total", "Records handled by each stage of a feed import or portal sync.",
+    ("pipeline", "stage", "client_id")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "catalog_request_seconds", "Time spent serving API requests.",
+    ("method", "endpoint", "status", "client_id")
+)
+
+
+@contextlib.contextmanager
+def pipeline_scope(pipeline: str, client_id):
+    """
+    Labels every stage timed inside the block with pipeline and client_id.
+    """
+    token = _current_pipeline.set((pipeline, str(client_id)))
+    try:
+        yield
+    finally:
+        _current_pipeline.reset(token)
+
+
+def record_stage(stage: str, seconds: float, records: int = None):
+    pipeline, client_id = _current_pipeline.get()
+    STAGE_SECONDS.observe(seconds, pipeline=pipeline, stage=stage, client_id=client_id)
+    if records:
+        STAGE_RECORDS.inc(records, pipeline=pipeline, stage=stage, client_id=client_id)
+
+
+class StageTiming:
+    """
+    Yielded by stage_timer; set records inside the block when the count is
+    only known once the stage has run.
+    """
+
+    def __init__(self, records: int = None):
+        self.records = records
+
+
+@contextlib.contextmanager
+def stage_timer(stage: str, records: int = None):
+    """
+    Times the block as one observation of stage in the current pipeline scope.
+    """
+    timing = StageTiming(records)
+    started = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        record_stage(stage, time.perf_counter() - started, timing.records)
+
+
+def timed_batches(stage: str, batches):
+    """
+    Re-yields batches, timing how long each one took to produce, so the
+    parse cost of a lazily read file is separated from what consumes it.
+    """
+    batches = iter(batches)
+    while True:
+        started = time.perf_counter()
+        batch = next(batches, None)
+        if batch is None:
+            return
+        record_stage(stage, time.perf_counter() - started, len(batch))
+        yield batch
+
+
+def format_stage_report(seconds_histogram: Histogram = STAGE_SECONDS,
+                        records_counter: Counter = STAGE_RECORDS) -> str:
+    """
+    Renders the stage timings recorded so far, summed over clients.
+    """
+    totals = {}
+    for (pipeline, stage, _), (observations, seconds) in seconds_histogram.samples().items():
+        entry = totals.setdefault((pipeline or "-", stage), [0, 0.0, 0])
+        entry[0] += observations
+        entry[1] += seconds
+    for (pipeline, stage, _), records in records_counter.samples().items():
+        totals.setdefault((pipeline or "-", stage), [0, 0.0, 0])[2] += records
+
+    lines = [f"{'pipeline':<12}  {'stage':<20}  {'calls':>7}  {'seconds':>10}  {'records':>10}"]
+    for (pipeline, stage), (observations, seconds, records) in sorted(totals.items()):
+        lines.append(f"{pipeline:<12}  {stage:<20}  {observations:>7}  {seconds:>10.3f}  {records:>10}")
+    return "\n".join(lines)
@@ -1,6 +1,22 @@
 import csv
+import io
 import logging
+import os
+import numpy as np
 from db.connection import DatabaseConnection
+from domain.models import PortalSyncResult, product_row_hash
+from repository.product_repository import ProductRepository
+from services.applied_files import ROLE_PORTAL, file_digest
+from services.apply_checkpoints import ApplyCheckpoints, default_chunk_rows, job_key
+from services.catalog_cache import invalidate_client
+from services.columnar import ProductColumns, diff_columns
+from services.csv_reader import (
+    DEFAULT_CHUNK_SIZE, DUPLICATE_POLICIES, DUPLICATES_LAST, DuplicateIndex, default_duplicate_policy,
+    default_parse_workers, iter_parallel_records, iter_product_column_blocks, iter_product_records, open_csv_source
+)
+from services.logging_support import RowActivityLog
+from services.metrics import pipeline_scope, stage_timer
+from services.sync_plan import PlanDriftError, SyncPlan
 
 logger = logging.getLogger(__name__)
 
@@ -9,30 +25,152 @@ db_connection = DatabaseConnection()
 class PortalSynchronizer:
     """
     Handles reading the portal CSV and synchronizing it with the DB state.
+
+    Three sync engines are supported:
+      - "python":   fetch the client's catalog, diff it in Python and apply
+                    one statement per changed product (the original behaviour).
+      - "columnar": like "python", but both sides are held as sorted NumPy
+                    columns and diffed with vectorized merge operations.
+      - "sql":      COPY the portal CSV into a temporary table and let Postgres
+                    compute and apply deletes, updates and inserts with one
+                    set-based statement each, so no catalog data is fetched.
+
+    With chunk_rows > 0 (APPLY_CHUNK_ROWS) the python and columnar engines
+    commit every chunk_rows actions together with a checkpoint. A rerun of
+    the same portal file diffs against what was already committed, so only
+    the remaining actions are applied, and the checkpoint's counts are added
+    to the result. The sql engine always applies in one transaction.
+
+    A product_id repeated within the portal file is resolved by the
+    duplicates policy ("first", "last" or "reject", see DuplicateIndex); the
+    repeated rows are reported in the result's duplicates count.
+
+    plan() is a dry run that returns the actions as a SyncPlan instead of
+    applying them; apply_plan() applies such a plan later, provided the
+    client's catalog has not changed in the meantime.
     """
 
-    def read_portal_csv(self, csv_path: str) -> dict:
-        records = {}
+    ENGINE_PYTHON = "python"
+    ENGINE_COLUMNAR = "columnar"
+    ENGINE_SQL = "sql"
+    ENGINES = (ENGINE_PYTHON, ENGINE_COLUMNAR, ENGINE_SQL)
+
+    FETCH_BATCH_SIZE = 50000
+
+    COPY_BATCH_SIZE = 10000
+
+    def __init__(self, engine: str = ENGINE_PYTHON, chunk_size: int = DEFAULT_CHUNK_SIZE, chunk_rows: int = None,
+                 checkpoints: ApplyCheckpoints = None, parse_workers: int = None, duplicates: str = None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown sync engine '{engine}', expected one of {self.ENGINES}")
+        duplicates = default_duplicate_policy() if duplicates is None else duplicates
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicate policy '{duplicates}', expected one of {DUPLICATE_POLICIES}")
+        self.duplicates = duplicates
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.chunk_rows = default_chunk_rows() if chunk_rows is None else chunk_rows
+        self.checkpoints = checkpoints or ApplyCheckpoints()
+        self.parse_workers = default_parse_workers() if parse_workers is None else parse_workers
+
+    def synchronize(self, csv_path, client_id: int) -> PortalSyncResult:
+        """
+        Runs a complete portal sync for client_id with the configured engine.
+        csv_path may be a path or an open binary file object.
+        Nothing is changed when the CSV contains no valid rows.
+        Each stage is timed under the "portal_sync" pipeline.
+        """
+        with pipeline_scope("portal_sync", client_id):
+            if self.engine == self.ENGINE_SQL:
+                return self.sync_in_database(csv_path, client_id)
+            checkpoint = None
+            if self.chunk_rows:
+                checkpoint = self.checkpoints.load(client_id, job_key(ROLE_PORTAL, csv_path))
+            if self.engine == self.ENGINE_COLUMNAR:
+                return self.sync_columnar(csv_path, client_id, checkpoint)
+            return self._sync_in_python(csv_path, client_id, checkpoint)
+
+    def _sync_in_python(self, csv_path, client_id: int, checkpoint=None) -> PortalSyncResult:
+        index = DuplicateIndex(self.duplicates)
+        with stage_timer("csv_parse") as timing:
+            portal_records = self.read_portal_csv(csv_path, index)
+            timing.records = len(portal_records)
+        index.log_duplicates("Portal file", client_id)
+        if not portal_records:
+            logger.info("No valid portal records found in CSV.")
+            return PortalSyncResult()
+        with stage_timer("db_fetch") as timing:
+            db_products = self.fetch_db_products(client_id)
+            timing.records = len(db_products)
+        with stage_timer("diff", len(portal_records)):
+            to_delete, to_insert, to_update = self.compute_sync_actions(db_products, portal_records)
+        # apply_sync_actions() advances the checkpoint; the result adds only what earlier runs committed.
+        resumed_counts = dict(checkpoint.counts) if checkpoint else {}
+        self.apply_sync_actions(client_id, to_delete, to_insert, to_update, checkpoint)
+        return self._sync_result(len(portal_records), to_delete, to_insert, to_update, resumed_counts, index)
+
+    def read_portal_csv(self, csv_path, duplicates: DuplicateIndex = None) -> dict:
+        """
+        Returns {product_id: record} for the valid portal rows. Without a
+        DuplicateIndex, or under its "last" policy, a repeated product_id
+        keeps its last row.
+        """
+        records = self.iter_portal_records(csv_path)
+        if duplicates is not None:
+            records = duplicates.filter(records)
+        portal_records = {}
+        for product_id, title, price_cents, store_id in records:
+            portal_records[product_id] = {
+                "title": title,
+                "price_cents": price_cents,
+                "store_id": store_id
+            }
+        return portal_records
+
+    def iter_portal_records(self, csv_path):
+        """
+        Yields valid (product_id, title, price_cents, store_id) portal rows in
+        file order. Files on disk are parsed on a process pool when
+        parse_workers > 1.
+        """
         try:
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        product_id = int(row["product_id"])
-                        title = row["title"].strip()
-                        price = float(row["price"])
-                        store_id = int(row["store_id"])
-                        records[product_id] = {
-                            "title": title,
-                            "price": price,
-                            "store_id": store_id
-                        }
-                    except (ValueError, KeyError) as e:
-                        logger.error("Skipping portal row due to error: %s -- %s", row, e)
+            if self._parses_in_parallel(csv_path):
+                yield from iter_parallel_records(csv_path, self.parse_workers, on_skip=self._log_skipped_row)
+                return
+            with open_csv_source(csv_path, self.chunk_size) as f:
+                yield from iter_product_records(f, on_skip=self._log_skipped_row)
+        except Exception as e:
+            logger.exception("Error reading portal CSV file '%s': %s", csv_path, e)
+            raise e
+
+    def read_portal_columns(self, csv_path, duplicates: DuplicateIndex = None) -> ProductColumns:
+        """
+        Reads the valid portal rows straight into a ProductColumns, which
+        keeps the last row of a repeated product_id that gets through
+        duplicates. Serial parsing converts the numbers of each block of
+        rows with NumPy.
+        """
+        if self._parses_in_parallel(csv_path):
+            records = self.iter_portal_records(csv_path)
+            if duplicates is not None:
+                records = duplicates.filter(records)
+            return ProductColumns.from_records(records)
+        try:
+            with open_csv_source(csv_path, self.chunk_size) as f:
+                blocks = iter_product_column_blocks(f, on_skip=self._log_skipped_row)
+                if duplicates is not None:
+                    blocks = duplicates.filter_blocks(blocks)
+                return ProductColumns.from_blocks(blocks)
         except Exception as e:
             logger.exception("Error reading portal CSV file '%s': %s", csv_path, e)
             raise e
-        return records
+
+    def _parses_in_parallel(self, csv_path) -> bool:
+        return self.parse_workers > 1 and isinstance(csv_path, (str, os.PathLike))
+
+    @staticmethod
+    def _log_skipped_row(row: dict, error):
+        logger.error("Skipping portal row due to error: %s -- %s", row, error)
 
     def fetch_db_products(self, client_id: int) -> dict:
         db_products = {}
@@ -40,15 +178,16 @@ class PortalSynchronizer:
             with db_connection.get_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute(
-                        "SELECT product_id, title, price, store_id FROM products WHERE client_id = %s",
+                        "SELECT product_id, title, price_cents, store_id, row_hash FROM products WHERE client_id = %s",
                         (client_id,)
                     )
                     for row in cur.fetchall():
-                        product_id, title, price, store_id = row
+                        product_id, title, price_cents, store_id, row_hash = row
                         db_products[product_id] = {
                             "title": title,
-                            "price": float(price),
-                            "store_id": store_id
+                            "price_cents": price_cents,
+                            "store_id": store_id,
+                            "row_hash": row_hash
                         }
         except Exception as e:
             logger.exception("Error fetching DB products for client %s: %s", client_id, e)
@@ -56,6 +195,11 @@ class PortalSynchronizer:
         return db_products
 
     def compute_sync_actions(self, db_products: dict, portal_records: dict) -> tuple:
+        """
+        Returns (to_delete, to_insert, to_update). A product present on both
+        sides is only updated when its content differs: DB records that carry
+        a row_hash are compared by fingerprint, others field by field.
+        """
         db_ids = set(db_products.keys())
         portal_ids = set(portal_records.keys())
 
@@ -66,52 +210,164 @@ class PortalSynchronizer:
         for pid in db_ids & portal_ids:
             db_rec = db_products[pid]
             portal_rec = portal_records[pid]
-            if (db_rec["title"] != portal_rec["title"] or
-                db_rec["price"] != portal_rec["price"] or
-                db_rec["store_id"] != portal_rec["store_id"]):
+            if self._has_changed(db_rec, portal_rec):
                 to_update[pid] = portal_rec
 
         return to_delete, to_insert, to_update
 
-    def apply_sync_actions(self, client_id: int, to_delete: set, to_insert: dict, to_update: dict):
-        conn = db_connection.get_connection()
+    @staticmethod
+    def _has_changed(db_rec: dict, portal_rec: dict) -> bool:
+        row_hash = db_rec.get("row_hash")
+        if row_hash is not None:
+            return row_hash != product_row_hash(portal_rec["title"], portal_rec["price_cents"], portal_rec["store_id"])
+        return (db_rec["title"] != portal_rec["title"] or
+                db_rec["price_cents"] != portal_rec["price_cents"] or
+                db_rec["store_id"] != portal_rec["store_id"])
+
+    def sync_columnar(self, csv_path, client_id: int, checkpoint=None) -> PortalSyncResult:
+        """
+        Columnar variant of the python engine: same actions, same statements,
+        but the diff runs over NumPy arrays instead of per-product dicts.
+        """
+        index = DuplicateIndex(self.duplicates)
+        with stage_timer("csv_parse") as timing:
+            portal = self.read_portal_columns(csv_path, index)
+            timing.records = len(portal)
+        index.log_duplicates("Portal file", client_id)
+        if not len(portal):
+            logger.info("No valid portal records found in CSV.")
+            return PortalSyncResult()
+        with stage_timer("db_fetch") as timing:
+            db_columns = self.fetch_db_columns(client_id)
+            timing.records = len(db_columns)
+        with stage_timer("diff", len(portal)):
+            to_delete, to_insert, to_update = self.compute_columnar_sync_actions(db_columns, portal)
+        resumed_counts = dict(checkpoint.counts) if checkpoint else {}
+        self.apply_sync_actions(client_id, to_delete, to_insert, to_update, checkpoint)
+        return self._sync_result(len(portal), to_delete, to_insert, to_update, resumed_counts, index)
+
+    @staticmethod
+    def _sync_result(received: int, to_delete, to_insert, to_update, resumed_counts: dict = None,
+                     duplicates: DuplicateIndex = None) -> PortalSyncResult:
+        # A resumed run only diffed what was left; resumed_counts holds what earlier runs committed.
+        resumed_counts = resumed_counts or {}
+        deleted = len(to_delete) + resumed_counts.get("deleted", 0)
+        inserted = len(to_insert) + resumed_counts.get("inserted", 0)
+        updated = len(to_update) + resumed_counts.get("updated", 0)
+        return PortalSyncResult(
+            deleted=deleted,
+            inserted=inserted,
+            updated=updated,
+            unchanged=max(received - inserted - updated, 0),
+            received=received,
+            duplicates=duplicates.duplicates if duplicates else 0
+        )
+
+    def fetch_db_columns(self, client_id: int) -> ProductColumns:
+        """
+        Reads the client's catalog through a server-side cursor straight into
+        a ProductColumns, FETCH_BATCH_SIZE rows at a time.
+        """
+        def iter_rows(cur):
+            while True:
+                rows = cur.fetchmany(self.FETCH_BATCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+
         try:
-            with conn.cursor() as cur:
-                # Deletions
-                for pid in to_delete:
+            with db_connection.get_connection() as conn:
+                with conn.cursor(name=f"portal_sync_{client_id}") as cur:
+                    cur.itersize = self.FETCH_BATCH_SIZE
                     cur.execute(
-                        "DELETE FROM products WHERE client_id = %s AND product_id = %s",
-                        (client_id, pid)
+                        "SELECT product_id, title, price_cents, store_id FROM products WHERE client_id = %s ORDER BY product_id",
+                        (client_id,)
                     )
-                    logger.info("Deleted product_id %s for client %s", pid, client_id)
+                    return ProductColumns.from_records(iter_rows(cur), block_size=self.FETCH_BATCH_SIZE)
+        except Exception as e:
+            logger.exception("Error fetching DB products for client %s: %s", client_id, e)
+            raise e
 
-                # Insertions
-                for pid, record in to_insert.items():
-                    cur.execute(
-                        """
-                        INSERT INTO products (client_id, product_id, title, price, store_id)
-                        VALUES (%s, %s, %s, %s, %s)
-                        """,
-                        (client_id, pid, record["title"], record["price"], record["store_id"])
-                    )
-                    logger.info("Inserted product_id %s for client %s", pid, client_id)
+    @staticmethod
+    def compute_columnar_sync_actions(db_columns: ProductColumns, portal: ProductColumns) -> tuple:
+        """
+        Returns (to_delete, to_insert, to_update) in the shapes produced by
+        compute_sync_actions, for the products whose row_hash would differ.
+        """
+        delete_ids, insert_positions, update_positions = diff_columns(db_columns, portal)
+        to_delete = set(delete_ids.tolist())
+        to_insert = {int(portal.product_ids[i]): portal.record(i) for i in insert_positions}
+        to_update = {int(portal.product_ids[i]): portal.record(i) for i in update_positions}
+        return to_delete, to_insert, to_update
 
-                # Updates
-                for pid, record in to_update.items():
-                    cur.execute(
-                        """
-                        UPDATE products
-                        SET title = %s,
-                            price = %s,
-                            store_id = %s,
-                            updated_at = NOW()
-                        WHERE client_id = %s AND product_id = %s
-                        """,
-                        (record["title"], record["price"], record["store_id"], client_id, pid)
-                    )
-                    logger.info("Updated product_id %s for client %s", pid, client_id)
+    def apply_sync_actions(self, client_id: int, to_delete: set, to_insert: dict, to_update: dict,
+                           checkpoint=None, precheck=None):
+        """
+        Applies the actions in one transaction or, with a checkpoint, in
+        transactions of chunk_rows actions each; the checkpoint is saved
+        with every chunk and cleared with the last one. precheck, if given,
+        is called with the cursor before the first action and may raise to
+        abort without changing anything.
+        """
+        conn = db_connection.get_connection()
+        activity = RowActivityLog(logger, client_id)
+        # Actions applied since the last commit.
+        chunk_counts = {"deleted": 0, "inserted": 0, "updated": 0}
+        pending = 0
+        try:
+            with conn.cursor() as cur:
+                def applied(action, pid):
+                    nonlocal pending
+                    activity.row(action, pid)
+                    chunk_counts[action] += 1
+                    pending += 1
+                    if checkpoint is not None and pending >= self.chunk_rows:
+                        checkpoint.advance(pending, **{
+                            name: checkpoint.count(name) + count for name, count in chunk_counts.items()
+                        })
+                        chunk_counts.update(deleted=0, inserted=0, updated=0)
+                        self._commit_actions(conn, cur, client_id, checkpoint)
+                        pending = 0
 
-            conn.commit()
+                if precheck is not None:
+                    precheck(cur)
+
+                with stage_timer("apply", len(to_delete) + len(to_insert) + len(to_update)):
+                    # Deletions
+                    for pid in to_delete:
+                        cur.execute(
+                            "DELETE FROM products WHERE client_id = %s AND product_id = %s",
+                            (client_id, pid)
+                        )
+                        applied("deleted", pid)
+
+                    # Insertions
+                    for pid, record in to_insert.items():
+                        cur.execute(
+                            """
+                            INSERT INTO products (client_id, product_id, title, price_cents, store_id)
+                            VALUES (%s, %s, %s, %s, %s)
+                            """,
+                            (client_id, pid, record["title"], record["price_cents"], record["store_id"])
+                        )
+                        applied("inserted", pid)
+
+                    # Updates
+                    for pid, record in to_update.items():
+                        cur.execute(
+                            """
+                            UPDATE products
+                            SET title = %s,
+                                price_cents = %s,
+                                store_id = %s,
+                                updated_at = NOW()
+                            WHERE client_id = %s AND product_id = %s
+                            """,
+                            (record["title"], record["price_cents"], record["store_id"], client_id, pid)
+                        )
+                        applied("updated", pid)
+
+                self._commit_actions(conn, cur, client_id, checkpoint, changed=bool(pending), final=True)
             logger.info(
                 "Synchronization actions applied for client %s: deleted %d, inserted %d, updated %d.",
                 client_id, len(to_delete), len(to_insert), len(to_update)
@@ -119,7 +375,298 @@ class PortalSynchronizer:
         except Exception as e:
             logger.exception("Error applying sync actions for client %s: %s", client_id, e)
             conn.rollback()
+            if checkpoint is not None and checkpoint.rows_done:
+                logger.error(
+                    "Portal sync for client %s stopped after %d committed action(s); "
+                    "syncing the same file again resumes from there.",
+                    client_id, checkpoint.rows_done
+                )
             raise e
         finally:
             conn.close()
             logger.info("Database connection closed after applying sync actions.")
+
+    def _commit_actions(self, conn, cur, client_id: int, checkpoint=None, changed: bool = True, final: bool = False):
+        if changed:
+            ProductRepository().bump_catalog_version(cur, client_id)
+        if checkpoint is not None:
+            if final:
+                self.checkpoints.clear(cur, checkpoint)
+            else:
+                self.checkpoints.save(cur, checkpoint)
+        with stage_timer("commit"):
+            conn.commit()
+        if changed:
+            invalidate_client(client_id)
+
+    def plan(self, csv_path, client_id: int) -> SyncPlan:
+        """
+        Dry run: computes the actions a sync of csv_path would apply for
+        client_id, without changing anything. The sql engine diffs inside
+        its write transaction, so with it the plan is computed by the
+        python engine. Each stage is timed under the "portal_plan" pipeline.
+        """
+        with pipeline_scope("portal_plan", client_id):
+            source_digest = file_digest(csv_path)
+            # Read before the catalog, so a write in between makes the plan stale instead of wrong.
+            catalog_version = self.fetch_catalog_version(client_id)
+            index = DuplicateIndex(self.duplicates)
+            if self.engine == self.ENGINE_COLUMNAR:
+                received, to_delete, to_insert, to_update, db_rows = self._plan_columnar(csv_path, client_id, index)
+            else:
+                received, to_delete, to_insert, to_update, db_rows = self._plan_in_python(csv_path, client_id, index)
+        plan = SyncPlan(
+            client_id, catalog_version, received,
+            to_delete={pid: self._db_row_hash(db_rows[pid]) for pid in to_delete},
+            to_insert=to_insert,
+            to_update={pid: {**record, "row_hash": self._db_row_hash(db_rows[pid])} for pid, record in to_update.items()},
+            source_digest=source_digest,
+            duplicates=index.duplicates
+        )
+        logger.info("Planned portal sync for client %s at catalog version %s: %s.", client_id, catalog_version, plan.counts)
+        return plan
+
+    def _plan_in_python(self, csv_path, client_id: int, index: DuplicateIndex) -> tuple:
+        with stage_timer("csv_parse") as timing:
+            portal_records = self.read_portal_csv(csv_path, index)
+            timing.records = len(portal_records)
+        index.log_duplicates("Portal file", client_id)
+        if not portal_records:
+            logger.info("No valid portal records found in CSV.")
+            return 0, set(), {}, {}, {}
+        with stage_timer("db_fetch") as timing:
+            db_products = self.fetch_db_products(client_id)
+            timing.records = len(db_products)
+        with stage_timer("diff", len(portal_records)):
+            to_delete, to_insert, to_update = self.compute_sync_actions(db_products, portal_records)
+        return len(portal_records), to_delete, to_insert, to_update, db_products
+
+    def _plan_columnar(self, csv_path, client_id: int, index: DuplicateIndex) -> tuple:
+        with stage_timer("csv_parse") as timing:
+            portal = self.read_portal_columns(csv_path, index)
+            timing.records = len(portal)
+        index.log_duplicates("Portal file", client_id)
+        if not len(portal):
+            logger.info("No valid portal records found in CSV.")
+            return 0, set(), {}, {}, {}
+        with stage_timer("db_fetch") as timing:
+            db_columns = self.fetch_db_columns(client_id)
+            timing.records = len(db_columns)
+        with stage_timer("diff", len(portal)):
+            to_delete, to_insert, to_update = self.compute_columnar_sync_actions(db_columns, portal)
+        # Only the rows the plan touches; their old content gives the hashes apply_plan() expects.
+        touched = np.fromiter(list(to_delete) + list(to_update), dtype=np.int64)
+        positions, _ = db_columns.positions_of(touched)
+        db_rows = {int(pid): db_columns.record(pos) for pid, pos in zip(touched, positions)}
+        return len(portal), to_delete, to_insert, to_update, db_rows
+
+    @staticmethod
+    def _db_row_hash(db_rec: dict) -> str:
+        row_hash = db_rec.get("row_hash")
+        if row_hash is not None:
+            return str(row_hash)
+        return product_row_hash(db_rec["title"], db_rec["price_cents"], db_rec["store_id"])
+
+    def fetch_catalog_version(self, client_id: int) -> int:
+        with db_connection.get_connection() as conn:
+            with conn.cursor() as cur:
+                return ProductRepository().get_catalog_version(cur, client_id)[0]
+
+    def apply_plan(self, plan: SyncPlan) -> PortalSyncResult:
+        """
+        Applies a plan made by plan(), in one transaction. Before the first
+        action, and while holding a lock on the client's catalog version,
+        the catalog is checked against the plan: the version must be the
+        one the plan was made at, every product it deletes or updates must
+        still have the row_hash it was planned from and every product it
+        inserts must still be absent. Otherwise PlanDriftError is raised and
+        nothing is changed; compute a new plan.
+        """
+        with pipeline_scope("portal_plan_apply", plan.client_id):
+            self.apply_sync_actions(
+                plan.client_id, plan.to_delete, plan.to_insert, plan.to_update,
+                precheck=lambda cur: self._check_plan_drift(cur, plan)
+            )
+        return plan.to_result()
+
+    @staticmethod
+    def _check_plan_drift(cur, plan: SyncPlan):
+        # FOR UPDATE makes concurrent writers wait at their version bump until the plan is applied.
+        # A client without a version row gets one first, so there is always a row to lock.
+        cur.execute(
+            "INSERT INTO catalog_versions (client_id, version) VALUES (%s, 0) ON CONFLICT (client_id) DO NOTHING",
+            (plan.client_id,)
+        )
+        cur.execute("SELECT version FROM catalog_versions WHERE client_id = %s FOR UPDATE", (plan.client_id,))
+        row = cur.fetchone()
+        version = row[0] if row else 0
+        if version != plan.catalog_version:
+            raise PlanDriftError(
+                f"catalog of client {plan.client_id} is at version {version}, "
+                f"the plan was made at version {plan.catalog_version}"
+            )
+
+        # Catches rows changed without a version bump, e.g. by hand.
+        expected = plan.expected_hashes()
+        if not expected:
+            return
+        cur.execute(
+            "SELECT product_id, row_hash FROM products WHERE client_id = %s AND product_id = ANY(%s)",
+            (plan.client_id, list(expected))
+        )
+        current = {product_id: str(row_hash) for product_id, row_hash in cur.fetchall()}
+        drifted = [pid for pid, row_hash in expected.items() if current.get(pid) != row_hash]
+        if drifted:
+            raise PlanDriftError(
+                f"{len(drifted)} product(s) of client {plan.client_id} changed since the plan was made "
+                f"(e.g. product_id {drifted[0]})"
+            )
+
+    def sync_in_database(self, csv_path, client_id: int) -> PortalSyncResult:
+        """
+        Set-based sync: the portal rows are streamed into a temporary table and
+        the three action classes are applied with one statement each, inside
+        a single transaction. The duplicates policy is applied while the rows
+        are copied; under "last" the staged duplicates are resolved by
+        DISTINCT ON, keeping the last row as read_portal_csv does.
+        """
+        index = DuplicateIndex(self.duplicates)
+        conn = db_connection.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TEMP TABLE portal_staging (
+                        seq BIGSERIAL,
+                        product_id INT NOT NULL,
+                        title VARCHAR(255) NOT NULL,
+                        price_cents BIGINT NOT NULL,
+                        store_id INT NOT NULL
+                    ) ON COMMIT DROP
+                """)
+                with stage_timer("csv_load") as timing:
+                    received = self._copy_portal_records(cur, csv_path, index)
+                    timing.records = received
+                index.log_duplicates("Portal file", client_id)
+                if self.duplicates == DUPLICATES_LAST:
+                    # The repeated rows were staged too; DISTINCT ON resolves them.
+                    received -= index.duplicates
+                if not received:
+                    logger.info("No valid portal records found in CSV.")
+                    conn.rollback()
+                    return PortalSyncResult()
+
+                with stage_timer("apply", received):
+                    deleted, updated, inserted, unchanged = self._apply_portal_items(cur, client_id)
+                if deleted or updated or inserted:
+                    ProductRepository().bump_catalog_version(cur, client_id)
+
+            with stage_timer("commit"):
+                conn.commit()
+            if deleted or updated or inserted:
+                invalidate_client(client_id)
+            logger.info(
+                "Set-based synchronization applied for client %s: deleted %d, inserted %d, updated %d, unchanged %d.",
+                client_id, deleted, inserted, updated, unchanged
+            )
+        except Exception as e:
+            logger.exception("Error during set-based sync for client %s: %s", client_id, e)
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+            logger.info("Database connection closed after set-based sync.")
+        return PortalSyncResult(
+            deleted=deleted,
+            inserted=inserted,
+            updated=updated,
+            unchanged=unchanged,
+            received=received,
+            duplicates=index.duplicates
+        )
+
+    @staticmethod
+    def _apply_portal_items(cur, client_id: int) -> tuple:
+        """
+        Applies the staged portal rows with one statement per action class.
+        Returns (deleted, updated, inserted, unchanged).
+        """
+        cur.execute("""
+            CREATE TEMP TABLE portal_items ON COMMIT DROP AS
+            SELECT DISTINCT ON (product_id) product_id, title, price_cents, store_id
+            FROM portal_staging
+            ORDER BY product_id, seq DESC
+        """)
+        cur.execute("ALTER TABLE portal_items ADD PRIMARY KEY (product_id)")
+        cur.execute("ANALYZE portal_items")
+
+        cur.execute(
+            """
+            DELETE FROM products p
+            WHERE p.client_id = %s
+              AND NOT EXISTS (SELECT 1 FROM portal_items s WHERE s.product_id = p.product_id)
+            """,
+            (client_id,)
+        )
+        deleted = cur.rowcount
+
+        cur.execute(
+            """
+            UPDATE products p
+            SET title = s.title,
+                price_cents = s.price_cents,
+                store_id = s.store_id,
+                updated_at = NOW()
+            FROM portal_items s
+            WHERE p.client_id = %s
+              AND p.product_id = s.product_id
+              AND p.row_hash IS DISTINCT FROM product_row_hash(s.title, s.price_cents, s.store_id)
+            """,
+            (client_id,)
+        )
+        updated = cur.rowcount
+
+        cur.execute(
+            """
+            INSERT INTO products (client_id, product_id, title, price_cents, store_id)
+            SELECT %s, s.product_id, s.title, s.price_cents, s.store_id
+            FROM portal_items s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM products p
+                WHERE p.client_id = %s AND p.product_id = s.product_id
+            )
+            """,
+            (client_id, client_id)
+        )
+        inserted = cur.rowcount
+
+        cur.execute("SELECT COUNT(*) FROM portal_items")
+        unchanged = cur.fetchone()[0] - inserted - updated
+        return deleted, updated, inserted, unchanged
+
+    def _copy_portal_records(self, cur, csv_path, duplicates: DuplicateIndex = None) -> int:
+        received = 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        records = self.iter_portal_records(csv_path)
+        if duplicates is not None:
+            records = duplicates.filter(records)
+        for record in records:
+            writer.writerow(record)
+            received += 1
+            if received % self.COPY_BATCH_SIZE == 0:
+                self._flush_copy_buffer(cur, buffer)
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+        if buffer.tell():
+            self._flush_copy_buffer(cur, buffer)
+        return received
+
+    @staticmethod
+    def _flush_copy_buffer(cur, buffer):
+        buffer.seek(0)
+        # FORCE_NOT_NULL: an empty title is written unquoted and would otherwise be read as NULL.
+        cur.copy_expert(
+            "COPY portal_staging (product_id, title, price_cents, store_id) "
+            "FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (title))",
+            buffer
+        )
@@ -0,0 +1,178 @@
+import gzip
+import io
+import json
+import logging
+import os
+import time
+import uuid
+
+from domain.models import PortalSyncResult
+
+logger = logging.getLogger(__name__)
+
+PLAN_FORMAT = "catalog-sync-plan"
+PLAN_FORMAT_VERSION = 1
+
+ACTION_DELETE = "D"
+ACTION_INSERT = "I"
+ACTION_UPDATE = "U"
+
+
+class PlanDriftError(Exception):
+    """
+    Raised when a SyncPlan no longer matches the database it is applied to.
+    """
+
+
+class SyncPlan:
+    """
+    The actions of one portal sync, computed without changing anything.
+
+    Besides the actions it records what the plan assumed about the
+    database: the client's catalog version and, for every product it
+    deletes or updates, the row_hash that product had. apply_plan() checks
+    both before writing, so a plan made earlier (for example off-peak on
+    another machine) is only applied to the catalog it was computed from.
+
+    Serialized as gzip-compressed JSON lines: a header with the metadata
+    and counts, then one compact line per action.
+    """
+
+    def __init__(self, client_id: int, catalog_version: int, received: int, to_delete: dict, to_insert: dict,
+                 to_update: dict, source_digest: str = None, created_at: str = None, duplicates: int = 0):
+        self.client_id = client_id
+        self.catalog_version = catalog_version
+        self.received = received
+        self.duplicates = duplicates
+        # product_id -> row_hash the product had when the plan was made.
+        self.to_delete = to_delete
+        # product_id -> {"title", "price_cents", "store_id", "row_hash"}; row_hash is the old one.
+        self.to_update = to_update
+        # product_id -> {"title", "price_cents", "store_id"}.
+        self.to_insert = to_insert
+        self.source_digest = source_digest
+        self.created_at = created_at or time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    @property
+    def counts(self) -> dict:
+        return self.to_result().to_dict()
+
+    def to_result(self) -> PortalSyncResult:
+        return PortalSyncResult(
+            deleted=len(self.to_delete),
+            inserted=len(self.to_insert),
+            updated=len(self.to_update),
+            unchanged=self.received - len(self.to_insert) - len(self.to_update),
+            received=self.received,
+            duplicates=self.duplicates
+        )
+
+    def expected_hashes(self) -> dict:
+        """
+        product_id -> the row_hash the database must still hold, or None
+        for products the plan inserts and which must still be absent.
+        """
+        expected = dict.fromkeys(self.to_insert)
+        expected.update(self.to_delete)
+        expected.update((pid, record["row_hash"]) for pid, record in self.to_update.items())
+        return expected
+
+    def header(self) -> dict:
+        return {
+            "format": PLAN_FORMAT,
+            "format_version": PLAN_FORMAT_VERSION,
+            "client_id": self.client_id,
+            "catalog_version": self.catalog_version,
+            "source_digest": self.source_digest,
+            "created_at": self.created_at,
+            "counts": self.counts,
+        }
+
+    def write(self, target):
+        """
+        Writes the plan to a path or a binary stream.
+        """
+        with _open_text(target, "w") as f:
+            f.write(json.dumps(self.header()) + "\n")
+            for pid, row_hash in self.to_delete.items():
+                f.write(json.dumps([ACTION_DELETE, pid, _compact_hash(row_hash)]) + "\n")
+            for pid, record in self.to_insert.items():
+                f.write(json.dumps(
+                    [ACTION_INSERT, pid, record["title"], record["price_cents"], record["store_id"]]
+                ) + "\n")
+            for pid, record in self.to_update.items():
+                f.write(json.dumps([
+                    ACTION_UPDATE, pid, record["title"], record["price_cents"], record["store_id"],
+                    _compact_hash(record["row_hash"])
+                ]) + "\n")
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+    @classmethod
+    def read(cls, source) -> "SyncPlan":
+        """
+        Reads a plan written by write() from a path or a binary stream.
+        Raises ValueError if it is not a plan of a supported format.
+        """
+        try:
+            with _open_text(source, "r") as f:
+                header = json.loads(f.readline() or "null")
+                if not isinstance(header, dict) or header.get("format") != PLAN_FORMAT:
+                    raise ValueError("not a sync plan file")
+                if header.get("format_version") != PLAN_FORMAT_VERSION:
+                    raise ValueError(f"unsupported sync plan format version {header.get('format_version')}")
+                to_delete, to_insert, to_update = {}, {}, {}
+                for line in f:
+                    action, pid, *fields = json.loads(line)
+                    if action == ACTION_DELETE:
+                        to_delete[pid] = _full_hash(fields[0])
+                    elif action == ACTION_INSERT:
+                        to_insert[pid] = _plan_record(*fields)
+                    elif action == ACTION_UPDATE:
+                        to_update[pid] = {**_plan_record(*fields[:3]), "row_hash": _full_hash(fields[3])}
+                    else:
+                        raise ValueError(f"unknown sync plan action {action!r}")
+                plan = cls(
+                    header["client_id"], header["catalog_version"], header["counts"]["received"],
+                    to_delete, to_insert, to_update,
+                    source_digest=header.get("source_digest"), created_at=header.get("created_at"),
+                    duplicates=header["counts"].get("duplicates", 0)
+                )
+                counts_match = plan.counts == header["counts"]
+        except KeyError as e:
+            raise ValueError(f"sync plan header is missing {e}") from e
+        except (OSError, EOFError, json.JSONDecodeError, TypeError, AttributeError) as e:
+            raise ValueError(f"unreadable sync plan: {e}") from e
+
+        if not counts_match:
+            raise ValueError("sync plan is truncated: its actions do not match the counts in its header")
+        return plan
+
+    def __repr__(self):
+        return (f"<SyncPlan(client_id={self.client_id},"
+                f"catalog_version={self.catalog_version},"
+                f"deleted={len(self.to_delete)},"
+                f"inserted={len(self.to_insert)},"
+                f"updated={len(self.to_update)})>")
+
+
+def _plan_record(title: str, price_cents: int, store_id: int) -> dict:
+    return {"title": title, "price_cents": price_cents, "store_id": store_id}
+
+
+def _compact_hash(row_hash) -> str:
+    return uuid.UUID(str(row_hash)).hex
+
+
+def _full_hash(compact: str) -> str:
+    # Same text form as products.row_hash and product_row_hash().
+    return str(uuid.UUID(compact))
+
+
+def _open_text(target, mode: str):
+    if isinstance(target, (str, os.PathLike)):
+        return gzip.open(target, mode + "t", encoding="utf-8")
+    return io.TextIOWrapper(gzip.GzipFile(fileobj=target, mode=mode + "b"), encoding="utf-8")
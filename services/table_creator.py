@@ -1,43 +1,311 @@
 import logging
+import os
+import threading
 from db.connection import DatabaseConnection
 
 logger = logging.getLogger(__name__)
 
 db_connection = DatabaseConnection()
 
+_tables_ready = False
+_tables_lock = threading.Lock()
+
+PRODUCTS_COLUMNS_SQL = """
+            id SERIAL,
+            client_id INT NOT NULL,
+            product_id INT NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            price_cents BIGINT NOT NULL,
+            store_id INT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            row_hash UUID GENERATED ALWAYS AS (product_row_hash(title, price_cents, store_id)) STORED"""
+
+# Kept after a migration so it can be rolled back by renaming; drop it by hand.
+LEGACY_PRODUCTS_TABLE = "products_legacy"
+
+
 class TableCreator:
     """
     Responsible for creating needed database tables if they don't already exist.
+
+    The products table is a single heap by default. With partitions > 0
+    (PRODUCTS_PARTITIONS) it is created hash-partitioned by client_id into
+    that many partitions, so each client's scans, syncs and vacuums touch a
+    smaller relation. fillfactor (PRODUCTS_FILLFACTOR, e.g. 90) leaves free
+    space in every page so updates can stay HOT; it is applied to new tables
+    and, for pages written from then on, to existing ones.
     """
 
-    def create_tables(self):
+    def __init__(self, partitions: int = None, fillfactor: int = None):
+        if partitions is None:
+            partitions = int(os.getenv("PRODUCTS_PARTITIONS", "0"))
+        if fillfactor is None and os.getenv("PRODUCTS_FILLFACTOR"):
+            fillfactor = int(os.getenv("PRODUCTS_FILLFACTOR"))
+        if partitions < 0:
+            raise ValueError(f"partitions must not be negative, got {partitions}")
+        if fillfactor is not None and not 10 <= fillfactor <= 100:
+            raise ValueError(f"fillfactor must be between 10 and 100, got {fillfactor}")
+        self.partitions = partitions
+        self.fillfactor = fillfactor
+
+    def ensure_tables(self) -> bool:
         """
-        Creates the products table if it doesn't exist.
+        Runs create_tables() once per process: after it succeeded, later
+        calls return True without touching the database. Concurrent callers
+        wait for the first check instead of repeating it.
+        """
+        global _tables_ready
+        with _tables_lock:
+            if not _tables_ready:
+                _tables_ready = self.create_tables()
+            return _tables_ready
+
+    def create_tables(self) -> bool:
+        """
+        Creates the products, applied_files, catalog_versions and apply_checkpoints
+        tables if they don't exist.
+        Returns False, after logging the error, if the DDL failed.
+
+        Prices are stored as integer cents in products.price_cents. A table
+        from before that, with price NUMERIC(10,2), is converted in place
+        (the values are exact cents already, so nothing is rounded).
+
+        products.row_hash is a stored fingerprint of (title, price_cents,
+        store_id), computed by the product_row_hash() SQL function. Import
+        and sync compare against it to skip rows whose content has not
+        changed. Tables created before the column existed get it added here.
         """
         logger.info("Creating tables if they do not exist...")
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS products (
-            id SERIAL PRIMARY KEY,
+        create_hash_function_sql = """
+        CREATE OR REPLACE FUNCTION product_row_hash(title TEXT, price_cents BIGINT, store_id INT)
+        RETURNS UUID
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT md5(title || '|' || price_cents::text || '|' || store_id::text)::uuid $$;
+        """
+        create_applied_files_sql = """
+        CREATE TABLE IF NOT EXISTS applied_files (
             client_id INT NOT NULL,
-            product_id INT NOT NULL,
-            title VARCHAR(255) NOT NULL,
-            price NUMERIC(10,2) NOT NULL,
-            store_id INT NOT NULL,
+            file_role VARCHAR(32) NOT NULL,
+            digest CHAR(64) NOT NULL,
+            result JSONB NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (client_id, file_role)
+        );
+        """
+        create_catalog_versions_sql = """
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            client_id INT PRIMARY KEY,
+            version BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        """
+        create_apply_checkpoints_sql = """
+        CREATE TABLE IF NOT EXISTS apply_checkpoints (
+            client_id INT NOT NULL,
+            job_key VARCHAR(128) NOT NULL,
+            rows_done BIGINT NOT NULL,
+            counts JSONB NOT NULL,
+            catalog_version BIGINT NOT NULL,
             updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
-            UNIQUE (client_id, product_id)
+            PRIMARY KEY (client_id, job_key)
         );
         """
+        # row_hash is rebuilt by add_hash_column_sql right after.
+        migrate_price_to_cents_sql = """
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                  AND table_name = 'products' AND column_name = 'price'
+            ) THEN
+                ALTER TABLE products DROP COLUMN IF EXISTS row_hash;
+                ALTER TABLE products ALTER COLUMN price TYPE BIGINT USING round(price * 100)::BIGINT;
+                ALTER TABLE products RENAME COLUMN price TO price_cents;
+                DROP FUNCTION IF EXISTS product_row_hash(TEXT, NUMERIC, INT);
+                RAISE NOTICE 'Converted products.price to integer cents.';
+            END IF;
+        END $$;
+        """
+        # Checked first so a routine startup does not take an exclusive lock.
+        add_hash_column_sql = """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                  AND table_name = 'products' AND column_name = 'row_hash'
+            ) THEN
+                ALTER TABLE products
+                ADD COLUMN row_hash UUID
+                GENERATED ALWAYS AS (product_row_hash(title, price_cents, store_id)) STORED;
+            END IF;
+        END $$;
+        """
 
         conn = db_connection.get_connection()
         try:
             with conn.cursor() as cur:
-                cur.execute(create_table_sql)
+                cur.execute(create_hash_function_sql)
+                for statement in self._products_startup_sql(cur):
+                    cur.execute(statement)
+                cur.execute(migrate_price_to_cents_sql)
+                cur.execute(add_hash_column_sql)
+                self._apply_storage_parameters(cur)
+                cur.execute(create_applied_files_sql)
+                cur.execute(create_catalog_versions_sql)
+                cur.execute(create_apply_checkpoints_sql)
                 logger.info("Executed table creation SQL.")
             conn.commit()
             logger.info("Tables created or already exist.")
+            return True
         except Exception as e:
             logger.exception("Error creating tables: %s", e)
             conn.rollback()
+            return False
         finally:
             conn.close()
             logger.info("Database connection closed after table creation.")
+
+    def products_table_sql(self, table: str) -> list:
+        """
+        Returns the statements creating an empty products table named table
+        in the configured layout; tables that already exist are left alone.
+        """
+        storage = f" WITH (fillfactor = {self.fillfactor})" if self.fillfactor else ""
+        if not self.partitions:
+            return [f"""
+        CREATE TABLE IF NOT EXISTS {table} ({PRODUCTS_COLUMNS_SQL},
+            PRIMARY KEY (id),
+            UNIQUE (client_id, product_id)
+        ){storage};
+        """]
+
+        # Unique constraints on a partitioned table must contain the partition key.
+        statements = [f"""
+        CREATE TABLE IF NOT EXISTS {table} ({PRODUCTS_COLUMNS_SQL},
+            PRIMARY KEY (client_id, id),
+            UNIQUE (client_id, product_id)
+        ) PARTITION BY HASH (client_id);
+        """]
+        for remainder in range(self.partitions):
+            statements.append(
+                f"CREATE TABLE IF NOT EXISTS products_p{remainder} PARTITION OF {table} "
+                f"FOR VALUES WITH (MODULUS {self.partitions}, REMAINDER {remainder}){storage};"
+            )
+        return statements
+
+    def migrate_to_partitioned(self) -> int:
+        """
+        Rebuilds an existing single-table products in the partitioned layout
+        inside one transaction and returns the number of rows copied.
+
+        Writers are blocked while the rows are copied (readers are not). The
+        old table is kept as products_legacy so the switch can be undone by
+        renaming it back. The table must already have the current columns,
+        which create_tables() takes care of.
+        """
+        if not self.partitions:
+            raise ValueError("migrate_to_partitioned needs partitions > 0")
+        conn = db_connection.get_connection()
+        try:
+            with conn.cursor() as cur:
+                layout = self._products_layout(cur)
+                if layout == "p":
+                    logger.info("products is already partitioned; nothing to migrate.")
+                    conn.rollback()
+                    return 0
+                if layout is None:
+                    raise RuntimeError("products does not exist; run create_tables() instead")
+
+                cur.execute("LOCK TABLE products IN EXCLUSIVE MODE")
+                for statement in self.products_table_sql("products_partitioned"):
+                    cur.execute(statement)
+                cur.execute("""
+                    INSERT INTO products_partitioned (id, client_id, product_id, title, price_cents, store_id, updated_at)
+                    SELECT id, client_id, product_id, title, price_cents, store_id, updated_at FROM products
+                """)
+                copied = cur.rowcount
+                # New rows must keep drawing ids after the copied ones.
+                cur.execute("""
+                    SELECT setval(pg_get_serial_sequence('products_partitioned', 'id'),
+                                  COALESCE((SELECT MAX(id) FROM products_partitioned), 0) + 1, false)
+                """)
+                cur.execute(f"ALTER TABLE products RENAME TO {LEGACY_PRODUCTS_TABLE}")
+                cur.execute("ALTER TABLE products_partitioned RENAME TO products")
+            conn.commit()
+            logger.info(
+                "Migrated %d product row(s) into %d hash partitions; the old table is kept as %s.",
+                copied, self.partitions, LEGACY_PRODUCTS_TABLE
+            )
+            return copied
+        except Exception as e:
+            logger.exception("Error migrating products to the partitioned layout: %s", e)
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _products_startup_sql(self, cur) -> list:
+        """
+        Returns the products statements for create_tables(). An existing
+        table keeps its layout: a single table is only converted by
+        migrate_to_partitioned(), and no partitions are added to a table
+        partitioned with another count, since they would overlap its own.
+        """
+        if not self.partitions:
+            return self.products_table_sql("products")
+        layout = self._products_layout(cur)
+        if layout == "r":
+            logger.warning(
+                "products is a single table although %d partitions are configured; "
+                "run `python cli.py --migrate-partitions %d` to convert it.",
+                self.partitions, self.partitions
+            )
+            return []
+        if layout == "p":
+            moduli = self._partition_moduli(cur)
+            if moduli and moduli != {self.partitions}:
+                logger.warning(
+                    "products is partitioned with modulus %s although %d partitions are configured; "
+                    "leaving its partitions as they are.",
+                    ", ".join(str(m) for m in sorted(moduli)), self.partitions
+                )
+                return []
+        return self.products_table_sql("products")
+
+    @staticmethod
+    def _partition_moduli(cur) -> set:
+        """
+        Returns the hash moduli of the existing products partitions.
+        """
+        cur.execute("""
+            SELECT DISTINCT (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'modulus (\\d+)'))[1]::int
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass('products')
+        """)
+        return {row[0] for row in cur.fetchall() if row[0] is not None}
+
+    @staticmethod
+    def _products_layout(cur):
+        """
+        Returns 'r' for a plain products table, 'p' for a partitioned one,
+        or None if it does not exist yet.
+        """
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('products')")
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def _apply_storage_parameters(self, cur):
+        if not self.fillfactor:
+            return
+        if self._products_layout(cur) == "p":
+            cur.execute("""
+                SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass('products')
+            """)
+            tables = [row[0] for row in cur.fetchall()]
+        else:
+            tables = ["products"]
+        for table in tables:
+            cur.execute(f"ALTER TABLE {table} SET (fillfactor = {self.fillfactor})")
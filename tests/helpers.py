@@ -10,5 +10,8 @@ def fake_connection_factory():
 
     fake_conn.cursor.return_value.__enter__.return_value = fake_cursor
     fake_conn.cursor.return_value.__exit__.return_value = False
+    # Mirror psycopg2: closed == 0 for an open connection, idle transaction status.
+    fake_conn.closed = 0
+    fake_conn.get_transaction_status.return_value = 0
 
     return fake_conn
@@ -23,7 +23,7 @@ class TestImporterIntegration(BaseIntegrationTest):
         db_conn = DatabaseConnection()
         conn = db_conn.get_connection()
         with conn.cursor() as cur:
-            cur.execute("SELECT product_id, title, price, store_id FROM products WHERE client_id = %s", (1,))
+            cur.execute("SELECT product_id, title, price_cents, store_id FROM products WHERE client_id = %s", (1,))
             row = cur.fetchone()
             self.assertIsNotNone(row)
             self.assertEqual(row[0], 1)
@@ -12,8 +12,8 @@ class TestSynchronizerIntegration(BaseIntegrationTest):
         conn = DatabaseConnection().get_connection()
         with conn.cursor() as cur:
             cur.execute(
-                "INSERT INTO products (client_id, product_id, title, price, store_id) VALUES (%s, %s, %s, %s, %s)",
-                (1, 1, "Old Title", 10.00, 101)
+                "INSERT INTO products (client_id, product_id, title, price_cents, store_id) VALUES (%s, %s, %s, %s, %s)",
+                (1, 1, "Old Title", 1000, 101)
             )
         conn.commit()
 
@@ -34,16 +34,54 @@ class TestSynchronizerIntegration(BaseIntegrationTest):
         # Verify changes in the database.
         conn = DatabaseConnection().get_connection()
         with conn.cursor() as cur:
-            cur.execute("SELECT product_id, title, price FROM products WHERE client_id = %s ORDER BY product_id", (1,))
+            cur.execute("SELECT product_id, title, price_cents FROM products WHERE client_id = %s ORDER BY product_id", (1,))
             rows = cur.fetchall()
             self.assertEqual(len(rows), 2)
             self.assertEqual(rows[0][0], 1)
             self.assertEqual(rows[0][1], "New Title")
-            self.assertAlmostEqual(float(rows[0][2]), 11.00, places=2)
+            self.assertEqual(rows[0][2], 1100)
             self.assertEqual(rows[1][0], 2)
             self.assertEqual(rows[1][1], "New Product")
-            self.assertAlmostEqual(float(rows[1][2]), 20.00, places=2)
+            self.assertEqual(rows[1][2], 2000)
         os.unlink(temp_csv.name)
 
+    def _seed_and_sync(self, engine, portal_path):
+        conn = DatabaseConnection().get_connection()
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE TABLE products RESTART IDENTITY CASCADE")
+            cur.executemany(
+                "INSERT INTO products (client_id, product_id, title, price_cents, store_id) VALUES (%s, %s, %s, %s, %s)",
+                [(1, 1, "Same", 1000, 101), (1, 2, "Old Title", 2000, 102), (1, 3, "Gone", 3000, 103)]
+            )
+        conn.commit()
+
+        result = PortalSynchronizer(engine=engine).synchronize(portal_path, 1)
+
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT product_id, title, price_cents, store_id FROM products WHERE client_id = %s ORDER BY product_id",
+                (1,)
+            )
+            return result, cur.fetchall()
+
+    def test_sql_engine_matches_python_engine_counts(self):
+        temp_csv = tempfile.NamedTemporaryFile(mode='w', delete=False, newline='', encoding='utf-8')
+        writer = csv.writer(temp_csv)
+        writer.writerow(["product_id", "title", "price", "store_id"])
+        writer.writerow(["1", "Same", "10.00", "101"])
+        writer.writerow(["2", "New Title", "20.00", "102"])
+        writer.writerow(["4", "Added", "40.00", "104"])
+        writer.writerow(["5", "  ", "50.00", "105"])
+        temp_csv.close()
+
+        python_result, python_rows = self._seed_and_sync(PortalSynchronizer.ENGINE_PYTHON, temp_csv.name)
+        sql_result, sql_rows = self._seed_and_sync(PortalSynchronizer.ENGINE_SQL, temp_csv.name)
+        os.unlink(temp_csv.name)
+
+        self.assertEqual(sql_result.to_dict(), python_result.to_dict())
+        self.assertEqual((sql_result.deleted, sql_result.inserted, sql_result.updated), (1, 2, 1))
+        self.assertEqual(sql_rows, python_rows)
+        self.assertEqual([row[:2] for row in sql_rows], [(1, "Same"), (2, "New Title"), (4, "Added"), (5, "")])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,21 @@
+import asyncio
+import gzip
+import time
+from datetime import datetime, timezone
 import unittest
 from unittest.mock import patch, MagicMock
+import httpx
 from fastapi.testclient import TestClient
 import tempfile
+import json
 import os
 
-from app.main import app
+import threading
+from app.main import app, create_app, STARTUP_MODE_FAST
+from domain.models import FeedImportResult
+from services.catalog_cache import get_catalog_cache
+from services.sync_plan import PlanDriftError, SyncPlan
+from app.api.endpoints.products import _ConnectionStreamingResponse, _stream_products_ndjson
 
 client = TestClient(app)
 
@@ -15,16 +26,24 @@ class TestAPI(unittest.TestCase):
         # Ensure the /tmp directory exists (especially on Windows)
         os.makedirs('/tmp', exist_ok=True)
 
+    def setUp(self):
+        # Upload endpoints consult the applied-files table before importing.
+        patcher = patch("services.applied_files.db_connection.get_connection")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_catalog_cache().clear()
+
     @patch("db.connection.DatabaseConnection.get_connection")
     def test_list_products(self, mock_db_conn):
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_db_conn.return_value = mock_conn
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
 
         # Mock rows
         mock_cursor.fetchall.return_value = [
-            (1, "Test Product", 12.34, 101)
+            (1, "Test Product", 1234, 101)
         ]
 
         response = client.get("/products?client_id=1")
@@ -34,6 +53,127 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(data[0]["product_id"], 1)
         self.assertEqual(data[0]["title"], "Test Product")
 
+    @patch("db.connection.DatabaseConnection.get_connection")
+    def test_list_products_keyset_page(self, mock_db_conn):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_db_conn.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
+
+        # limit=2 fetches one extra row to learn whether another page exists.
+        mock_cursor.fetchall.return_value = [
+            (11, "A", 100, 101), (12, "B", 2.00, 102), (13, "C", 3.00, 103)
+        ]
+
+        response = client.get("/products?client_id=1&limit=2&after=10")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["product_id"] for p in response.json()], [11, 12])
+        self.assertEqual(response.headers["X-Next-After"], "12")
+        sql, params = mock_cursor.execute.call_args[0]
+        self.assertIn("product_id > %s", sql)
+        self.assertIn("ORDER BY product_id", sql)
+        self.assertEqual(params, [1, 10, 3])
+
+    @patch("db.connection.DatabaseConnection.get_connection")
+    def test_list_products_last_page_has_no_cursor(self, mock_db_conn):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_db_conn.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
+        mock_cursor.fetchall.return_value = [(11, "A", 100, 101)]
+
+        response = client.get("/products?client_id=1&limit=2&after=10")
+        self.assertEqual(len(response.json()), 1)
+        self.assertNotIn("X-Next-After", response.headers)
+
+    @patch("db.connection.DatabaseConnection.get_connection")
+    def test_list_products_served_from_cache_until_version_changes(self, mock_db_conn):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_db_conn.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = (3, datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+        mock_cursor.fetchall.return_value = [(1, "Cached", 150, 101)]
+
+        first = client.get("/products?client_id=5")
+        mock_cursor.fetchall.return_value = [(1, "Changed", 150, 101)]
+        second = client.get("/products?client_id=5")
+
+        self.assertEqual(first.headers["X-Catalog-Cache"], "miss")
+        self.assertEqual(second.headers["X-Catalog-Cache"], "hit")
+        self.assertEqual(second.json(), first.json())
+
+        # Another replica wrote to the catalog: the version moved on.
+        mock_cursor.fetchone.return_value = (4, datetime(2026, 1, 2, 4, 0, 0, tzinfo=timezone.utc))
+        third = client.get("/products?client_id=5")
+        self.assertEqual(third.headers["X-Catalog-Cache"], "miss")
+        self.assertEqual(third.json()[0]["title"], "Changed")
+
+    @patch("db.connection.DatabaseConnection.get_connection")
+    def test_list_products_conditional_get(self, mock_db_conn):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_db_conn.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = (7, datetime(2026, 3, 1, 12, 0, 0, tzinfo=timezone.utc))
+        mock_cursor.fetchall.return_value = [(1, "A", 100, 101)]
+
+        first = client.get("/products?client_id=9")
+        self.assertEqual(first.headers["ETag"], '"c9-v7"')
+        self.assertEqual(first.headers["Last-Modified"], "Sun, 01 Mar 2026 12:00:00 GMT")
+
+        mock_cursor.fetchall.reset_mock()
+        by_etag = client.get("/products?client_id=9", headers={"If-None-Match": '"c9-v7"'})
+        by_date = client.get("/products?client_id=9", headers={"If-Modified-Since": "Sun, 01 Mar 2026 12:00:00 GMT"})
+        stale = client.get("/products?client_id=9&limit=5", headers={"If-None-Match": '"c9-v6"'})
+
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertEqual(by_etag.content, b"")
+        self.assertEqual(by_date.status_code, 304)
+        self.assertEqual(stale.status_code, 200)
+        mock_cursor.fetchall.assert_called_once()
+
+    @patch("db.connection.DatabaseConnection.get_connection")
+    def test_list_products_stream_ndjson(self, mock_db_conn):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_db_conn.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = None
+        mock_cursor.fetchmany.side_effect = [
+            [(1, "A", 150, 101), (2, "B", 200, 102)],
+            [(3, "C", 300, 103)],
+            [],
+        ]
+
+        response = client.get("/products?client_id=1&stream=true")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([p["product_id"] for p in lines], [1, 2, 3])
+        self.assertEqual((lines[0]["price"], lines[0]["price_cents"]), (1.5, 150))
+        self.assertIn("name", mock_conn.cursor.call_args.kwargs)
+        mock_conn.close.assert_called_once()
+
+    def test_stream_releases_connection_when_never_read(self):
+        mock_conn = MagicMock()
+        products = _stream_products_ndjson(mock_conn, 1, None)
+        response = _ConnectionStreamingResponse(products, mock_conn)
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise OSError("client went away")
+
+        with self.assertRaises(Exception):
+            asyncio.run(response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send))
+
+        mock_conn.close.assert_called_once()
+        mock_conn.cursor.assert_not_called()
+
     @patch("db.connection.DatabaseConnection.get_connection")
     def test_import_feed(self, mock_db_conn):
         mock_conn = MagicMock()
@@ -59,5 +199,232 @@ class TestAPI(unittest.TestCase):
         finally:
             os.remove(temp_name)
 
+    @patch("db.connection.DatabaseConnection.get_connection")
+    def test_import_feed_bulk_mode(self, mock_db_conn):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_db_conn.return_value = mock_conn
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+
+        mock_cursor.fetchone.return_value = (1, 0, 0)
+
+        files = {"file": ("test_feed.csv", b"product_id,title,price,store_id\n1,Test,99.99,101\n", "text/csv")}
+        response = client.post("/products/feed?client_id=1&mode=bulk", files=files)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["inserted"], 1)
+        self.assertEqual(response.json()["updated"], 0)
+        mock_cursor.copy_expert.assert_called_once()
+
+    @patch("services.feed_importer.FeedImporter.import_feed", return_value=FeedImportResult(inserted=1))
+    def test_import_feed_streams_upload_without_temp_file(self, mock_import):
+        files = {"file": ("same_name.csv", b"product_id,title,price,store_id\n1,Test,99.99,101\n", "text/csv")}
+        with patch("builtins.open", side_effect=AssertionError("upload must not be copied to disk")):
+            response = client.post("/products/feed?client_id=1", files=files)
+
+        self.assertEqual(response.status_code, 200)
+        source = mock_import.call_args[0][0]
+        self.assertFalse(isinstance(source, str), "importer should read the upload stream, not a path")
+
+    @patch("services.applied_files.AppliedFileManifest.lookup",
+           return_value={"inserted": 3, "updated": 1, "unchanged": 0})
+    @patch("services.feed_importer.FeedImporter.import_feed")
+    def test_import_feed_skips_already_applied_file(self, mock_import, mock_lookup):
+        files = {"file": ("test_feed.csv", b"product_id,title,price,store_id\n1,Test,99.99,101\n", "text/csv")}
+        response = client.post("/products/feed?client_id=1", files=files)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["skipped"])
+        self.assertEqual(response.json()["inserted"], 3)
+        mock_import.assert_not_called()
+
+    @patch("services.applied_files.AppliedFileManifest.lookup")
+    @patch("services.feed_importer.FeedImporter.import_feed", return_value=FeedImportResult(inserted=1))
+    def test_import_feed_force_reapplies(self, mock_import, mock_lookup):
+        files = {"file": ("test_feed.csv", b"product_id,title,price,store_id\n1,Test,99.99,101\n", "text/csv")}
+        response = client.post("/products/feed?client_id=1&force=true", files=files)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["skipped"])
+        mock_lookup.assert_not_called()
+        mock_import.assert_called_once()
+
+    def test_apply_stale_sync_plan_is_409(self):
+        plan = SyncPlan(1, 3, 1, to_delete={}, to_insert={5: {"title": "T", "price_cents": 100, "store_id": 1}},
+                        to_update={}, source_digest="ab" * 32)
+        files = {"file": ("plan.jsonl.gz", plan.to_bytes(), "application/gzip")}
+
+        with patch("services.portal_synchronizer.PortalSynchronizer.apply_plan",
+                   side_effect=PlanDriftError("catalog of client 1 is at version 4")) as mock_apply:
+            response = client.post("/products/portal-sync/apply-plan?client_id=1", files=files)
+            wrong_client = client.post("/products/portal-sync/apply-plan?client_id=2", files=files)
+            malformed = client.post(
+                "/products/portal-sync/apply-plan?client_id=1",
+                files={"file": ("plan.jsonl.gz", gzip.compress(
+                    b'{"format": "catalog-sync-plan", "format_version": 1, "client_id": 1}\n'
+                ), "application/gzip")}
+            )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(mock_apply.call_args[0][0].to_insert, plan.to_insert)
+        self.assertEqual(wrong_client.status_code, 400)
+        self.assertEqual(malformed.status_code, 400)
+
+    def test_rejected_duplicate_product_is_422(self):
+        files = {"file": ("test_feed.csv", b"product_id,title,price,store_id\n1,A,1.00,1\n1,B,2.00,1\n", "text/csv")}
+        with patch("services.applied_files.AppliedFileManifest.lookup", return_value=None), \
+             patch("services.feed_importer.db_connection.get_connection") as mock_conn:
+            response = client.post("/products/feed?client_id=1&duplicates=reject", files=files)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("product_id 1", response.json()["detail"])
+        mock_conn.return_value.commit.assert_not_called()
+
+    def test_metrics_endpoint_exposes_request_timings(self):
+        client.get("/health")
+        response = client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn("# TYPE catalog_stage_seconds histogram", response.text)
+        self.assertIn('catalog_request_seconds_count{method="GET",endpoint="/health",status="200",client_id=""}',
+                      response.text)
+
+    def test_metrics_ignore_unmatched_routes_and_arbitrary_client_ids(self):
+        client.get("/no-such-route-7f3a?client_id=1")
+        client.get("/health?client_id=4242")
+        client.get("/products/?client_id=not-a-number-9c1e")
+        response = client.get("/metrics")
+
+        self.assertNotIn("no-such-route-7f3a", response.text)
+        self.assertNotIn('client_id="4242"', response.text)
+        self.assertNotIn("not-a-number-9c1e", response.text)
+        self.assertIn('endpoint="/products/",status="422",client_id=""', response.text)
+
+    def test_import_feed_unknown_mode(self):
+        files = {"file": ("test_feed.csv", b"product_id,title,price,store_id\n", "text/csv")}
+        response = client.post("/products/feed?client_id=1&mode=turbo", files=files)
+        self.assertEqual(response.status_code, 422)
+
+class TestAPIJobs(unittest.TestCase):
+
+    def setUp(self):
+        # Upload endpoints consult the applied-files table before importing.
+        patcher = patch("services.applied_files.db_connection.get_connection")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _wait_for_job(self, job_id):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            status = client.get(f"/jobs/{job_id}").json()
+            if status["state"] in ("succeeded", "failed"):
+                return status
+            time.sleep(0.02)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_background_feed_import_returns_job(self):
+        def fake_import(csv_path, client_id, progress=None):
+            with open(csv_path) as f:
+                self.assertIn("1,Test,99.99,101", f.read())
+            progress(1)
+            return FeedImportResult(inserted=1)
+
+        with patch("services.feed_importer.FeedImporter.import_feed", side_effect=fake_import):
+            files = {"file": ("test_feed.csv", b"product_id,title,price,store_id\n1,Test,99.99,101\n", "text/csv")}
+            response = client.post("/products/feed?client_id=7&background=true", files=files)
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["job_id"]
+            self.assertEqual(response.json()["status_url"], f"/jobs/{job_id}")
+            status = self._wait_for_job(job_id)
+
+        self.assertEqual(status["state"], "succeeded")
+        self.assertEqual(status["client_id"], 7)
+        self.assertEqual(status["progress"]["feed_records_processed"], 1)
+        self.assertEqual(status["result"]["inserted"], 1)
+        self.assertIsNotNone(status["run_seconds"])
+
+    def test_background_job_failure_is_reported(self):
+        with patch("services.feed_importer.FeedImporter.import_feed", side_effect=RuntimeError("db down")):
+            files = {"file": ("test_feed.csv", b"product_id,title,price,store_id\n", "text/csv")}
+            response = client.post("/products/feed?client_id=1&background=true", files=files)
+            status = self._wait_for_job(response.json()["job_id"])
+
+        self.assertEqual(status["state"], "failed")
+        self.assertEqual(status["error"], "db down")
+
+    def test_unknown_job_is_404(self):
+        self.assertEqual(client.get("/jobs/does-not-exist").status_code, 404)
+
+class TestAPIFastStart(unittest.TestCase):
+
+    def test_ready_turns_200_after_background_warm_up(self):
+        release = threading.Event()
+
+        def slow_table_check(self_):
+            release.wait(5)
+            return True
+
+        with patch("services.table_creator.TableCreator.ensure_tables", slow_table_check), \
+                patch("unittest.TestLoader.discover") as mock_discover:
+            with TestClient(create_app(startup_mode=STARTUP_MODE_FAST, seed_path="")) as fast_client:
+                self.assertEqual(fast_client.get("/health").status_code, 200)
+                not_ready = fast_client.get("/ready")
+                self.assertEqual(not_ready.status_code, 503)
+                self.assertEqual(not_ready.json()["stage"], "tables")
+
+                release.set()
+                deadline = time.monotonic() + 5
+                while fast_client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(fast_client.get("/ready").json()["status"], "ready")
+
+        mock_discover.assert_not_called()
+
+    def test_failed_warm_up_is_reported(self):
+        with patch("services.table_creator.TableCreator.ensure_tables", return_value=False):
+            with TestClient(create_app(startup_mode=STARTUP_MODE_FAST, seed_path="")) as fast_client:
+                deadline = time.monotonic() + 5
+                while fast_client.get("/ready").json()["status"] == "starting" and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                response = fast_client.get("/ready")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "failed")
+
+class TestAPIConcurrency(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        # Upload endpoints consult the applied-files table before importing.
+        patcher = patch("services.applied_files.db_connection.get_connection")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_health_responsive_during_long_import(self):
+        def slow_import(csv_path, client_id, progress=None):
+            time.sleep(1.0)
+            return FeedImportResult(inserted=1)
+
+        transport = httpx.ASGITransport(app=app)
+        with patch("services.feed_importer.FeedImporter.import_feed", side_effect=slow_import):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                files = {"file": ("slow_feed.csv", b"product_id,title,price,store_id\n1,A,1.00,1\n", "text/csv")}
+                import_task = asyncio.create_task(
+                    async_client.post("/products/feed?client_id=1", files=files)
+                )
+                await asyncio.sleep(0.2)
+
+                started = time.monotonic()
+                health = await async_client.get("/health")
+                health_latency = time.monotonic() - started
+
+                self.assertFalse(import_task.done(), "Import finished before /health was probed")
+                import_response = await import_task
+
+        self.assertEqual(health.status_code, 200)
+        self.assertLess(health_latency, 0.5)
+        self.assertEqual(import_response.status_code, 200)
+        self.assertEqual(import_response.json()["inserted"], 1)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,53 @@
+import json
+import unittest
+from unittest.mock import patch
+from tests.helpers import fake_connection_factory
+
+from services.apply_checkpoints import ApplyCheckpoint, ApplyCheckpoints
+
+
+class TestApplyCheckpointsUnit(unittest.TestCase):
+
+    def setUp(self):
+        self.fake_conn = fake_connection_factory()
+        self.fake_conn.__enter__.return_value = self.fake_conn
+        self.fake_cursor = self.fake_conn.cursor.return_value.__enter__.return_value
+        patcher = patch("services.apply_checkpoints.db_connection.get_connection", return_value=self.fake_conn)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_load_resumes_matching_checkpoint(self):
+        self.fake_cursor.fetchone.return_value = (4000, {"inserted": 4000}, 7, 7)
+
+        checkpoint = ApplyCheckpoints().load(1, "feed:abc")
+
+        self.assertEqual((checkpoint.rows_done, checkpoint.count("inserted")), (4000, 4000))
+        self.assertTrue(checkpoint.resumed)
+
+    def test_load_discards_checkpoint_when_catalog_changed(self):
+        self.fake_cursor.fetchone.return_value = (4000, {"inserted": 4000}, 7, 9)
+
+        checkpoint = ApplyCheckpoints().load(1, "feed:abc")
+
+        self.assertFalse(checkpoint.resumed)
+        statements = [c[0][0] for c in self.fake_cursor.execute.call_args_list]
+        self.assertTrue(any(sql.startswith("DELETE FROM apply_checkpoints") for sql in statements))
+
+    def test_save_replaces_other_jobs_of_the_client(self):
+        checkpoint = ApplyCheckpoint(1, "feed:abc")
+        checkpoint.advance(500, inserted=450, updated=50)
+
+        ApplyCheckpoints().save(self.fake_cursor, checkpoint)
+
+        (delete_sql, delete_params), (upsert_sql, upsert_params) = [
+            c[0] for c in self.fake_cursor.execute.call_args_list
+        ]
+        self.assertIn("job_key <> %s", delete_sql)
+        self.assertEqual(delete_params, (1, "feed:abc"))
+        self.assertIn("ON CONFLICT (client_id, job_key)", upsert_sql)
+        self.assertEqual(upsert_params[2], 500)
+        self.assertEqual(json.loads(upsert_params[3]), {"inserted": 450, "updated": 50})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import mock_open, patch
+
+from domain.models import FeedImportResult, PortalSyncResult
+from services.batch_runner import BatchRunner, ManifestEntry, format_batch_report, read_manifest
+
+
+def fake_client_run(feed, portal, client_id):
+    if feed == "broken.csv":
+        raise RuntimeError("feed exploded")
+    sync_result = PortalSyncResult(deleted=1, received=3) if portal else None
+    return FeedImportResult(inserted=client_id), sync_result
+
+
+class TestBatchRunnerUnit(unittest.TestCase):
+    def test_read_manifest(self):
+        manifest = (
+            "client_id,feed,portal\n"
+            "1,feeds/1.csv,portals/1.csv\n"
+            "2,feeds/2.csv,\n"
+        )
+        with patch("builtins.open", mock_open(read_data=manifest)):
+            entries = read_manifest("manifest.csv")
+
+        self.assertEqual([(e.client_id, e.feed, e.portal) for e in entries], [
+            (1, "feeds/1.csv", "portals/1.csv"),
+            (2, "feeds/2.csv", None),
+        ])
+
+    def test_read_manifest_rejects_duplicate_clients(self):
+        manifest = "client_id,feed,portal\n1,a.csv,\n1,b.csv,\n"
+        with patch("builtins.open", mock_open(read_data=manifest)):
+            with self.assertRaises(ValueError):
+                read_manifest("manifest.csv")
+
+    def test_failures_are_isolated(self):
+        entries = [
+            ManifestEntry(1, "ok.csv", "portal.csv"),
+            ManifestEntry(2, "broken.csv"),
+            ManifestEntry(3, "ok.csv"),
+        ]
+
+        results = BatchRunner(fake_client_run, max_workers=2).run(entries)
+
+        self.assertEqual([r.client_id for r in results], [1, 2, 3])
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertIn("feed exploded", results[1].error)
+        self.assertEqual(results[2].feed_result.inserted, 3)
+
+        report = format_batch_report(results, wall_seconds=1.0)
+        self.assertIn("3 (2 ok, 1 failed)", report)
+        self.assertIn("FAILED", report)
+
+    def test_process_pool(self):
+        entries = [ManifestEntry(client_id, "ok.csv") for client_id in (4, 5)]
+
+        results = BatchRunner(fake_client_run, max_workers=2, use_processes=True).run(entries)
+
+        self.assertEqual([r.feed_result.inserted for r in results], [4, 5])
+
+if __name__ == '__main__':
+    unittest.main()
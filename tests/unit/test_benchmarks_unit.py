@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.generator import CatalogSpec, generate_catalog
+from benchmarks.layout import format_layout_report
+from benchmarks.parsing import format_parse_report
+from benchmarks.suite import compare_reports
+from services.csv_reader import FeedCsvReader
+from services.portal_synchronizer import PortalSynchronizer
+
+
+class TestBenchmarksUnit(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def _generate(self, name, spec):
+        return generate_catalog(
+            spec,
+            os.path.join(self.workdir.name, f"{name}_feed.csv"),
+            os.path.join(self.workdir.name, f"{name}_portal.csv")
+        )
+
+    def test_generator_is_deterministic(self):
+        spec = CatalogSpec(rows=500, seed=7)
+        first = self._generate("a", spec)
+        second = self._generate("b", spec)
+
+        for path_a, path_b in ((first.feed_path, second.feed_path), (first.portal_path, second.portal_path)):
+            with open(path_a, 'rb') as a, open(path_b, 'rb') as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_generated_portal_matches_reported_counts(self):
+        catalog = self._generate("c", CatalogSpec(rows=2000, change_ratio=0.2, insert_ratio=0.1, delete_ratio=0.05))
+        sync = PortalSynchronizer()
+        db_products = {
+            pid: {"title": title, "price_cents": price_cents, "store_id": store_id}
+            for pid, title, price_cents, store_id in FeedCsvReader().iter_records(catalog.feed_path)
+        }
+        to_delete, to_insert, to_update = sync.compute_sync_actions(
+            db_products, sync.read_portal_csv(catalog.portal_path)
+        )
+
+        self.assertEqual(len(db_products), 2000)
+        self.assertEqual(len(to_delete), catalog.deleted)
+        self.assertEqual(len(to_insert), catalog.inserted)
+        self.assertEqual(len(to_update), catalog.changed)
+        self.assertEqual(catalog.inserted, 200)
+
+    def test_compare_flags_throughput_regressions(self):
+        baseline = {"results": {
+            "csv_read": {"rows_per_second": 1000.0},
+            "compute_sync_actions": {"rows_per_second": 1000.0},
+        }}
+        current = {"results": {
+            "csv_read": {"rows_per_second": 950.0},
+            "compute_sync_actions": {"rows_per_second": 700.0},
+            "apply_sync_actions": {"rows_per_second": 10.0},
+        }}
+
+        rows = {name: regressed for name, *_, regressed in compare_reports(current, baseline, tolerance=0.1)}
+
+        self.assertEqual(rows, {"csv_read": False, "compute_sync_actions": True})
+
+    def test_layout_report_shows_speedup_against_first_layout(self):
+        report = {"results": {
+            "plain": {"layout": {"partitions": 0, "fillfactor": None}, "best_seconds": 2.0},
+            "hash": {"layout": {"partitions": 8, "fillfactor": 90}, "best_seconds": 0.5},
+        }}
+
+        lines = format_layout_report(report).splitlines()
+
+        self.assertTrue(lines[1].endswith("1.00x"))
+        self.assertIn(" 8 ", lines[2])
+        self.assertTrue(lines[2].endswith("4.00x"))
+
+    def test_parse_report_shows_gain_over_dictreader(self):
+        report = {"results": {
+            "dictreader": {"rows": 1000, "best_seconds": 1.0, "rows_per_second": 1000.0},
+            "positional": {"rows": 1000, "best_seconds": 0.4, "rows_per_second": 2500.0},
+        }}
+
+        lines = format_parse_report(report).splitlines()
+
+        self.assertTrue(lines[1].endswith("1.00x"))
+        self.assertTrue(lines[2].endswith("2.50x"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import patch, mock_open
+from tests.base_mock_db import BaseMockDBTest
+
+from domain.models import product_row_hash
+from repository.product_repository import ProductRepository
+from services.catalog_cache import CatalogCache
+from services.csv_reader import FeedCsvReader
+from services.feed_importer import FeedImporter
+
+
+class TestCatalogCache(unittest.TestCase):
+
+    def test_lru_eviction_by_bytes(self):
+        cache = CatalogCache(max_bytes=10)
+        cache.put((1, None, None), 1, b"aaaa")
+        cache.put((2, None, None), 1, b"bbbb")
+        cache.get((1, None, None), 1)
+        cache.put((3, None, None), 1, b"cccc")
+
+        self.assertIsNone(cache.get((2, None, None), 1))
+        self.assertEqual(cache.get((1, None, None), 1).body, b"aaaa")
+        self.assertEqual(cache.stats()["bytes"], 8)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_oversized_body_is_not_cached(self):
+        cache = CatalogCache(max_bytes=3)
+        cache.put((1, None, None), 1, b"abcd")
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_version_mismatch_misses(self):
+        cache = CatalogCache(max_bytes=100)
+        cache.put((1, None, None), 1, b"old")
+        self.assertIsNone(cache.get((1, None, None), 2))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_invalidate_only_touches_one_client(self):
+        cache = CatalogCache(max_bytes=100)
+        cache.put((1, None, None), 1, b"a")
+        cache.put((1, 10, 5), 1, b"b")
+        cache.put((2, None, None), 1, b"c")
+
+        cache.invalidate(1)
+
+        self.assertIsNone(cache.get((1, 10, 5), 1))
+        self.assertIsNotNone(cache.get((2, None, None), 1))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["invalidations"]), (1, 1, 1))
+
+
+class TestCatalogCacheInvalidation(BaseMockDBTest):
+
+    def test_feed_import_bumps_version_and_invalidates_client(self):
+        csv_data = "product_id,title,price,store_id\n1,New,9.99,101\n"
+        self.fake_cursor.fetchall.return_value = []
+        with patch("builtins.open", mock_open(read_data=csv_data)), \
+                patch("services.feed_importer.invalidate_client") as mock_invalidate:
+            FeedImporter(ProductRepository(), FeedCsvReader()).import_feed("dummy.csv", 8)
+
+        statements = [c[0][0] for c in self.fake_cursor.execute.call_args_list]
+        self.assertTrue(any("INSERT INTO catalog_versions" in sql for sql in statements))
+        mock_invalidate.assert_called_once_with(8)
+
+    def test_unchanged_feed_keeps_cache(self):
+        csv_data = "product_id,title,price,store_id\n1,Same,9.99,101\n"
+        self.fake_cursor.fetchall.return_value = [(1, product_row_hash("Same", 999, 101))]
+        with patch("builtins.open", mock_open(read_data=csv_data)), \
+                patch("services.feed_importer.invalidate_client") as mock_invalidate:
+            FeedImporter(ProductRepository(), FeedCsvReader()).import_feed("dummy.csv", 8)
+
+        mock_invalidate.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
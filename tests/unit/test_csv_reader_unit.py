@@ -0,0 +1,188 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import mock_open, patch
+
+from services.csv_reader import (
+    DuplicateIndex, DuplicateProductError, FeedCsvReader, ProductRowParser, iter_parallel_records,
+    iter_product_column_blocks, iter_product_records, split_byte_ranges
+)
+
+
+class TestCsvReaderUnit(unittest.TestCase):
+
+    def test_iter_records_converts_rows_and_skips_invalid_ones(self):
+        parser = ProductRowParser(["store_id", "price", "title", "product_id"])
+        rows = csv.reader([
+            "7,19.99, Widget ,1\n",
+            "\n",
+            "7,abc,Broken,2\n",
+            "7,5\n",
+            "8,0.5,Gadget,3\n",
+        ])
+        skipped = []
+
+        records = list(parser.iter_records(rows, lambda row, error: skipped.append((row, type(error)))))
+
+        self.assertEqual(records, [(1, "Widget", 1999, 7), (3, "Gadget", 50, 8)])
+        self.assertEqual(skipped, [
+            ({"store_id": "7", "price": "abc", "title": "Broken", "product_id": "2"}, ValueError),
+            ({"store_id": "7", "price": "5", "title": None, "product_id": None}, IndexError),
+        ])
+
+    def test_iter_records_skips_every_row_when_a_column_is_missing(self):
+        parser = ProductRowParser(["product_id", "title", "price"])
+        skipped = []
+
+        records = list(parser.iter_records(csv.reader(["1,Widget,19.99\n"]), lambda row, error: skipped.append(row)))
+
+        self.assertEqual(parser.missing, ["store_id"])
+        self.assertEqual(records, [])
+        self.assertEqual(skipped, [{"product_id": "1", "title": "Widget", "price": "19.99"}])
+
+    def test_iter_batches_yields_bounded_batches(self):
+        csv_data = "product_id,title,price,store_id\n" + "".join(
+            f"{i},Product {i},{i}.99,10{i}\n" for i in range(1, 6)
+        ) + "bad,row,x,y\n"
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            batches = list(FeedCsvReader().iter_batches("dummy.csv", 2))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[2][0], (5, "Product 5", 599, 105))
+
+    def test_reads_binary_stream_in_small_chunks(self):
+        csv_bytes = (
+            "product_id,title,price,store_id\r\n"
+            "1,Café crème,9.99,101\r\n"
+            "2,\"Two\nlines\",19.99,102\r\n"
+            "3,No trailing newline,29.99,103"
+        ).encode("utf-8")
+
+        records = FeedCsvReader(chunk_size=3).read(io.BytesIO(csv_bytes))
+
+        self.assertEqual(records, [
+            (1, "Café crème", 999, 101),
+            (2, "Two\nlines", 1999, 102),
+            (3, "No trailing newline", 2999, 103),
+        ])
+
+    def test_parallel_parse_matches_serial_reader(self):
+        lines = ["product_id,title,price,store_id\r\n"]
+        for i in range(1, 301):
+            lines.append(f"bad{i},Broken,1.00,1\r\n" if i % 37 == 0 else f"{i},Café {i},{i}.5,{i % 7}\r\n")
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write("".join(lines))
+        self.addCleanup(os.remove, path)
+
+        header, ranges = split_byte_ranges(path, range_bytes=500)
+        with self.assertLogs("services.csv_reader", level="ERROR") as serial_logs:
+            serial = FeedCsvReader(parse_workers=1).read(path)
+        skipped = []
+        parallel = list(iter_parallel_records(
+            path, 2, on_skip=lambda row, error: skipped.append(f"Skipping row due to error: {row} -- {error}"),
+            range_bytes=500
+        ))
+
+        self.assertGreater(len(ranges), 2)
+        self.assertEqual(ranges[0][0], len(header))
+        self.assertEqual(ranges[-1][1], os.path.getsize(path))
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(serial), 292)
+        self.assertEqual(skipped, [record.getMessage() for record in serial_logs.records])
+
+    def test_parallel_parse_keeps_quoted_newlines_like_serial(self):
+        data = (
+            'product_id,"title",price,store_id\n'
+            '1,"Two\nlines, quoted",1.00,1\n'
+            '2,"Quote "" and\n\nblank line",2.00,2\n'
+            '3,12" pizza,3.00,3\n'
+            'x,"Broken\nrow",4.00,4\n'
+            '5,Last,5.00,5\n'
+        )
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(data)
+        self.addCleanup(os.remove, path)
+
+        with self.assertLogs("services.csv_reader", level="ERROR") as serial_logs:
+            serial = FeedCsvReader(parse_workers=1).read(path)
+        for range_bytes in (1, 7, 40):
+            with self.subTest(range_bytes=range_bytes):
+                skipped = []
+                parallel = list(iter_parallel_records(
+                    path, 2, on_skip=lambda row, error: skipped.append(f"Skipping row due to error: {row} -- {error}"),
+                    range_bytes=range_bytes
+                ))
+                self.assertEqual(parallel, serial)
+                self.assertEqual(skipped, [record.getMessage() for record in serial_logs.records])
+        self.assertEqual([record[0] for record in serial], [1, 2, 3, 5])
+        self.assertEqual(serial[0][1], "Two\nlines, quoted")
+
+    def test_parser_resolves_columns_by_header(self):
+        lines = [
+            "store_id,price,extra,title,product_id\n",
+            "101,9.99,x, Reordered ,1\n",
+            "\n",
+            "102,1.00\n",
+            "103,2.50,y,Extra field,3,surplus\n",
+        ]
+        skipped = []
+
+        records = list(iter_product_records(lines, on_skip=lambda row, error: skipped.append(row)))
+
+        self.assertEqual(records, [(1, "Reordered", 999, 101), (3, "Extra field", 250, 103)])
+        self.assertEqual(skipped, [
+            {"store_id": "102", "price": "1.00", "extra": None, "title": None, "product_id": None}
+        ])
+
+    def test_column_blocks_match_records(self):
+        lines = ["product_id,title,price,store_id\n"] + [f"{i},T{i},{i}.25,{i % 3}\n" for i in range(1, 8)]
+        # A price that float64 would round differently and an invalid row force the row-by-row fallback.
+        dirty = lines + ["8,Half cent,10.005,1\n", "x,Broken,1.00,1\n"]
+
+        for data in (lines, dirty):
+            expected = list(iter_product_records(data))
+            blocks = list(iter_product_column_blocks(data, block_size=4))
+            got = [
+                (int(pid), title, int(cents), int(store))
+                for block in blocks for pid, title, cents, store in zip(*block)
+            ]
+            self.assertEqual(got, expected)
+        self.assertIn((8, "Half cent", 1001, 1), got)
+
+    def test_duplicate_index_policies(self):
+        records = [(1, "A"), (2, "B"), (1, "A again"), (3, "C"), (2, "B again"), (2, "B last")]
+
+        # Repeats within one filtered batch and across batches resolve alike.
+        for batch_size in (1, 2, 10000):
+            with self.subTest(batch_size=batch_size), patch.object(DuplicateIndex, "FILTER_BATCH_SIZE", batch_size):
+                first = DuplicateIndex("first")
+                self.assertEqual(list(first.filter(records)), [(1, "A"), (2, "B"), (3, "C")])
+                last = DuplicateIndex("last")
+                self.assertEqual(list(last.filter(records)), records)
+                self.assertEqual((first.duplicates, last.duplicates), (3, 3))
+
+                reject = DuplicateIndex("reject")
+                with self.assertRaises(DuplicateProductError) as raised:
+                    list(reject.filter(records))
+                self.assertEqual(raised.exception.product_id, 1)
+
+        lines = ["product_id,title,price,store_id\n", "1,A,1.00,1\n", "2,B,2.00,1\n", "1,A again,3.00,1\n"]
+        blocks = list(DuplicateIndex("first").filter_blocks(iter_product_column_blocks(lines)))
+        self.assertEqual([int(pid) for pid in blocks[0][0]], [1, 2])
+        self.assertEqual([int(cents) for cents in blocks[0][2]], [100, 200])
+
+    def test_unique_product_id_check_rewinds_stream(self):
+        stream = io.BytesIO(b"product_id,title,price,store_id\n1,A,1.00,1\n2,B,2.00,1\n")
+
+        FeedCsvReader(chunk_size=8).check_unique_product_ids(stream)
+
+        self.assertEqual(stream.tell(), 0)
+        self.assertEqual([record[0] for record in FeedCsvReader().iter_records(stream)], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,21 @@
+import threading
 import unittest
 from unittest.mock import patch, MagicMock
 import psycopg2
 
 from db.connection import DatabaseConnection
+from db.pool import ConnectionPool, PoolTimeout
+from tests.helpers import fake_connection_factory
 
 class TestDBUnit(unittest.TestCase):
     """
     Unit-level tests for db/connection.py using mocks.
     """
 
+    def setUp(self):
+        DatabaseConnection.close_pools()
+        self.addCleanup(DatabaseConnection.close_pools)
+
     def test_get_connection_failure(self):
         """
         Force psycopg2.connect to raise OperationalError and ensure exception is re-raised.
@@ -22,8 +29,94 @@ class TestDBUnit(unittest.TestCase):
         """
         Check that we can get a connection if psycopg2.connect doesn't fail.
         """
-        with patch("psycopg2.connect", return_value=MagicMock()) as mock_connect:
+        with patch("psycopg2.connect", return_value=fake_connection_factory()) as mock_connect:
             db_conn = DatabaseConnection()
             conn = db_conn.get_connection()
             self.assertIsNotNone(conn)
             mock_connect.assert_called_once()
+
+    def test_connections_are_shared_across_instances(self):
+        with patch("psycopg2.connect", return_value=fake_connection_factory()) as mock_connect:
+            DatabaseConnection().get_connection().close()
+            with DatabaseConnection().get_connection() as conn:
+                conn.cursor()
+            DatabaseConnection().get_connection().close()
+
+            mock_connect.assert_called_once()
+            stats = DatabaseConnection().pool_stats()
+        self.assertEqual(stats["acquired"], 3)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["idle"], 1)
+
+
+class TestConnectionPoolUnit(unittest.TestCase):
+    def test_context_manager_commits_and_releases(self):
+        fake_conn = fake_connection_factory()
+        pool = ConnectionPool(lambda: fake_conn, min_size=0, max_size=1)
+
+        with pool.acquire() as conn:
+            self.assertEqual(pool.stats()["in_use"], 1)
+            conn.cursor()
+
+        fake_conn.commit.assert_called_once()
+        fake_conn.close.assert_not_called()
+        self.assertEqual(pool.stats()["in_use"], 0)
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = ConnectionPool(fake_connection_factory, min_size=0, max_size=1)
+        held = pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(timeout=0.05)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+        held.close()
+        pool.acquire(timeout=0.05).close()
+
+    def test_waiter_gets_released_connection(self):
+        pool = ConnectionPool(fake_connection_factory, min_size=0, max_size=1)
+        held = pool.acquire()
+        acquired = []
+
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+        waiter.start()
+        held.close()
+        waiter.join(5)
+
+        self.assertEqual(len(acquired), 1)
+        self.assertEqual(pool.stats()["created"], 1)
+
+    def test_min_size_connections_are_opened_up_front(self):
+        connect = MagicMock(side_effect=lambda: fake_connection_factory())
+        pool = ConnectionPool(connect, min_size=2, max_size=3)
+
+        self.assertEqual(connect.call_count, 2)
+        self.assertEqual((pool.stats()["size"], pool.stats()["idle"]), (2, 2))
+        first, second = pool.acquire(), pool.acquire()
+        self.assertEqual(connect.call_count, 2)
+        pool.acquire()
+        self.assertEqual(connect.call_count, 3)
+        first.close()
+        second.close()
+
+    def test_failed_warm_up_closes_opened_connections(self):
+        opened = fake_connection_factory()
+        connect = MagicMock(side_effect=[opened, psycopg2.OperationalError("down")])
+
+        with self.assertRaises(psycopg2.OperationalError):
+            ConnectionPool(connect, min_size=2, max_size=2)
+        opened.close.assert_called_once()
+
+    def test_broken_connection_is_replaced_on_checkout(self):
+        pool = ConnectionPool(fake_connection_factory, min_size=1, max_size=1, health_check_interval=0)
+        first = pool.acquire()
+        broken = first._conn
+        first.close()
+        broken.cursor.side_effect = psycopg2.OperationalError("server closed the connection")
+
+        conn = pool.acquire()
+
+        self.assertIsNot(conn._conn, broken)
+        stats = pool.stats()
+        self.assertEqual(stats["discarded"], 1)
+        self.assertEqual(stats["size"], 1)
@@ -1,9 +1,12 @@
 import unittest
-from unittest.mock import mock_open, patch
+from unittest.mock import MagicMock, mock_open, patch
 from tests.base_mock_db import BaseMockDBTest
 
 from services.feed_importer import FeedImporter, FeedCsvReader
 from repository.product_repository import ProductRepository
+from domain.models import product_row_hash
+from services.apply_checkpoints import ApplyCheckpoint, ApplyCheckpoints
+from services.csv_reader import DuplicateProductError
 
 class TestImporterUnit(BaseMockDBTest):
     def test_no_valid_records(self):
@@ -13,5 +16,227 @@ class TestImporterUnit(BaseMockDBTest):
             importer.import_feed("dummy.csv", 1)
         self.fake_conn.commit.assert_not_called()
 
+    def test_row_mode_counts(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,Existing,9.99,101\n"
+            "2,New,19.99,102\n"
+        )
+        with patch("builtins.open", mock_open(read_data=csv_data)), \
+             patch.object(ProductRepository, "get_existing_product_hashes",
+                          return_value={1: product_row_hash("Old title", 999, 101)}):
+            importer = FeedImporter(ProductRepository(), FeedCsvReader())
+            result = importer.import_feed("dummy.csv", 1)
+
+        self.assertEqual(result.inserted, 1)
+        self.assertEqual(result.updated, 1)
+        self.fake_conn.commit.assert_called_once()
+
+    def test_row_mode_skips_unchanged_rows(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,Same,9.99,101\n"
+            "2,Changed,19.99,102\n"
+        )
+        existing = {
+            1: product_row_hash("Same", 999, 101),
+            2: product_row_hash("Changed", 1800, 102),
+        }
+        with patch("builtins.open", mock_open(read_data=csv_data)), \
+             patch.object(ProductRepository, "get_existing_product_hashes", return_value=existing):
+            importer = FeedImporter(ProductRepository(), FeedCsvReader())
+            result = importer.import_feed("dummy.csv", 1)
+
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (0, 1, 1))
+        update_calls = [
+            c for c in self.fake_cursor.execute.call_args_list
+            if "UPDATE products" in c[0][0]
+        ]
+        self.assertEqual(len(update_calls), 1)
+        self.assertEqual(update_calls[0][0][1][-1], 2)
+
+    def test_bulk_mode_copies_and_merges(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,Existing,9.99,101\n"
+            "2,New,19.99,102\n"
+            "3,Other,29.99,103\n"
+        )
+        self.fake_cursor.fetchone.return_value = (2, 1, 0)
+
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            importer = FeedImporter(ProductRepository(), FeedCsvReader(), mode=FeedImporter.MODE_BULK)
+            result = importer.import_feed("dummy.csv", 1)
+
+        self.assertEqual(result.inserted, 2)
+        self.assertEqual(result.updated, 1)
+        copy_sql, buffer = self.fake_cursor.copy_expert.call_args[0]
+        self.assertIn("COPY products_staging", copy_sql)
+        self.assertEqual(buffer.getvalue().splitlines()[1], "2,New,1999,102")
+        merge_calls = [
+            c for c in self.fake_cursor.execute.call_args_list
+            if "ON CONFLICT (client_id, product_id) DO UPDATE" in c[0][0]
+        ]
+        self.assertEqual(len(merge_calls), 1)
+        self.fake_conn.commit.assert_called_once()
+
+    def test_bulk_mode_keeps_blank_title_not_null(self):
+        csv_data = "product_id,title,price,store_id\n1,  ,1.00,2\n"
+        self.fake_cursor.fetchone.return_value = (1, 0, 0)
+
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            importer = FeedImporter(ProductRepository(), FeedCsvReader(), mode=FeedImporter.MODE_BULK)
+            result = importer.import_feed("dummy.csv", 1)
+
+        self.assertEqual(result.inserted, 1)
+        copy_sql, buffer = self.fake_cursor.copy_expert.call_args[0]
+        self.assertEqual(buffer.getvalue().splitlines(), ["1,,100,2"])
+        self.assertIn("FORCE_NOT_NULL (title)", copy_sql)
+
+    def test_row_mode_looks_up_ids_per_batch(self):
+        csv_data = "product_id,title,price,store_id\n" + "".join(
+            f"{i},Product {i},{i}.99,10{i}\n" for i in range(1, 6)
+        )
+        with patch("builtins.open", mock_open(read_data=csv_data)), \
+             patch.object(ProductRepository, "get_existing_product_hashes", return_value={}) as lookup:
+            importer = FeedImporter(ProductRepository(), FeedCsvReader(), batch_size=2)
+            result = importer.import_feed("dummy.csv", 1)
+
+        self.assertEqual([c[0][1] for c in lookup.call_args_list], [(1, 2), (3, 4), (5,)])
+        self.assertEqual(result.inserted, 5)
+        self.fake_conn.commit.assert_called_once()
+
+    def test_row_mode_writes_repeated_product_once(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,First,9.99,101\n"
+            "1,Second,19.99,101\n"
+        )
+        with patch("builtins.open", mock_open(read_data=csv_data)), \
+             patch.object(ProductRepository, "get_existing_product_hashes", return_value={}):
+            result = FeedImporter(ProductRepository(), FeedCsvReader(), duplicates="last").import_feed("dummy.csv", 1)
+
+        inserts = [c[0][1] for c in self.fake_cursor.execute.call_args_list if "INSERT INTO products" in c[0][0]]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn("Second", inserts[0])
+        self.assertEqual((result.inserted, result.duplicates), (1, 1))
+
+    def test_row_mode_counts_product_repeated_across_batches_once(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,First,9.99,101\n"
+            "1,Second,19.99,101\n"
+        )
+        lookups = [{}, {1: product_row_hash("First", 999, 101)}]
+        with patch("builtins.open", mock_open(read_data=csv_data)), \
+             patch.object(ProductRepository, "get_existing_product_hashes", side_effect=lookups):
+            importer = FeedImporter(ProductRepository(), FeedCsvReader(), batch_size=1, duplicates="last")
+            result = importer.import_feed("dummy.csv", 1)
+
+        updates = [c[0][1] for c in self.fake_cursor.execute.call_args_list if "UPDATE products" in c[0][0]]
+        self.assertEqual(len(updates), 1)
+        self.assertIn("Second", updates[0])
+        self.assertEqual((result.inserted, result.updated, result.unchanged, result.duplicates), (1, 0, 0, 1))
+
+    def test_reject_policy_fails_before_any_chunk_is_written(self):
+        csv_data = "product_id,title,price,store_id\n" + "".join(
+            f"{i},Product {i},1.00,1\n" for i in (1, 2, 3, 4, 2)
+        )
+        store = MagicMock(spec=ApplyCheckpoints)
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            importer = FeedImporter(
+                ProductRepository(), FeedCsvReader(), batch_size=2, chunk_rows=2, checkpoints=store, duplicates="reject"
+            )
+            with self.assertRaises(DuplicateProductError):
+                importer.import_feed("dummy.csv", 1)
+
+        store.load.assert_not_called()
+        self.fake_cursor.execute.assert_not_called()
+        self.fake_conn.commit.assert_not_called()
+
+    def _chunked_import(self, checkpoint, mode=FeedImporter.MODE_ROW):
+        csv_data = "product_id,title,price,store_id\n" + "".join(
+            f"{i},Product {i},{i}.99,10{i}\n" for i in range(1, 6)
+        )
+        store = MagicMock(spec=ApplyCheckpoints)
+        store.load.return_value = checkpoint
+        with patch("builtins.open", mock_open(read_data=csv_data)), \
+             patch("services.feed_importer.job_key", return_value="feed:abc"), \
+             patch.object(ProductRepository, "get_existing_product_hashes", return_value={}) as lookup:
+            importer = FeedImporter(
+                ProductRepository(), FeedCsvReader(), mode=mode, batch_size=2, chunk_rows=2, checkpoints=store
+            )
+            result = importer.import_feed("dummy.csv", 1)
+        return result, store, lookup
+
+    def test_chunked_import_commits_each_chunk_with_checkpoint(self):
+        checkpoint = ApplyCheckpoint(1, "feed:abc")
+        result, store, _ = self._chunked_import(checkpoint)
+
+        self.assertEqual(result.inserted, 5)
+        self.assertEqual(self.fake_conn.commit.call_count, 3)
+        self.assertEqual(store.save.call_count, 2)
+        store.clear.assert_called_once()
+        self.assertEqual(checkpoint.rows_done, 4)
+
+    def test_chunked_import_resumes_after_checkpoint(self):
+        checkpoint = ApplyCheckpoint(1, "feed:abc", rows_done=3, counts={"inserted": 3})
+        result, store, lookup = self._chunked_import(checkpoint, mode=FeedImporter.MODE_ROW)
+
+        self.assertEqual([c[0][1] for c in lookup.call_args_list], [(4,), (5,)])
+        self.assertEqual(result.inserted, 5)
+        store.clear.assert_called_once()
+
+    def test_chunked_bulk_import_recreates_staging_per_chunk(self):
+        self.fake_cursor.fetchone.return_value = (2, 0, 0)
+        result, store, _ = self._chunked_import(ApplyCheckpoint(1, "feed:abc"), mode=FeedImporter.MODE_BULK)
+
+        statements = [c[0][0] for c in self.fake_cursor.execute.call_args_list]
+        self.assertEqual(sum("CREATE TEMP TABLE" in sql for sql in statements), 3)
+        self.assertEqual(sum("ON CONFLICT (client_id, product_id)" in sql for sql in statements), 3)
+        self.assertEqual(self.fake_conn.commit.call_count, 3)
+        # Every merge reports (2, 0, 0); the chunks' counts add up.
+        self.assertEqual(result.inserted, 6)
+
+    def test_chunked_bulk_import_counts_repeat_across_chunks_like_row_mode(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,First,1.00,101\n"
+            "2,Second,2.00,102\n"
+            "3,Third,3.00,103\n"
+            "1,Renamed,1.00,101\n"
+        )
+
+        def run(mode):
+            with patch("builtins.open", mock_open(read_data=csv_data)), \
+                 patch("services.feed_importer.job_key", return_value="feed:abc"), \
+                 patch.object(ProductRepository, "get_existing_product_hashes",
+                              side_effect=[{}, {1: product_row_hash("First", 100, 101)}]):
+                importer = FeedImporter(
+                    ProductRepository(), FeedCsvReader(), mode=mode, batch_size=2, chunk_rows=2,
+                    checkpoints=MagicMock(spec=ApplyCheckpoints, **{"load.return_value": ApplyCheckpoint(1, "feed:abc")}),
+                    duplicates="last"
+                )
+                return importer.import_feed("dummy.csv", 1)
+
+        row_result = run(FeedImporter.MODE_ROW)
+        # What Postgres returns once product 1, counted by the first chunk, is left out of the second.
+        self.fake_cursor.fetchone.side_effect = [(2, 0, 0), (1, 0, 0)]
+        self.fake_cursor.execute.reset_mock()
+        bulk_result = run(FeedImporter.MODE_BULK)
+
+        merge_params = [
+            c[0][1] for c in self.fake_cursor.execute.call_args_list
+            if "ON CONFLICT (client_id, product_id) DO UPDATE" in c[0][0]
+        ]
+        self.assertEqual([params[1] for params in merge_params], [[], [1]])
+        counts = lambda result: (result.inserted, result.updated, result.unchanged, result.duplicates)
+        self.assertEqual(counts(row_result), (3, 0, 0, 1))
+        self.assertEqual(counts(bulk_result), counts(row_result))
+
+    def test_unknown_mode_rejected(self):
+        with self.assertRaises(ValueError):
+            FeedImporter(ProductRepository(), FeedCsvReader(), mode="fast")
+
 if __name__ == '__main__':
     unittest.main()
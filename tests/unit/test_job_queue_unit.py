@@ -0,0 +1,40 @@
+import threading
+import unittest
+
+from services.job_queue import Job, JobQueue
+
+class TestJobQueueUnit(unittest.TestCase):
+    def setUp(self):
+        self.queue = JobQueue(max_workers=1, max_finished=2)
+        self.addCleanup(self.queue.shutdown)
+
+    def test_job_moves_through_states(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def work(job):
+            started.set()
+            job.update_progress(rows=10)
+            release.wait(5)
+            return {"inserted": 10}
+
+        job = self.queue.submit("feed", 1, work)
+        started.wait(5)
+        self.assertEqual(job.to_dict()["state"], Job.STATE_RUNNING)
+
+        release.set()
+        self.queue.shutdown()
+        status = job.to_dict()
+        self.assertEqual(status["state"], Job.STATE_SUCCEEDED)
+        self.assertEqual(status["progress"], {"rows": 10})
+        self.assertEqual(status["result"], {"inserted": 10})
+
+    def test_oldest_finished_jobs_are_forgotten(self):
+        jobs = [self.queue.submit("feed", 1, lambda job: None) for _ in range(3)]
+        self.queue.shutdown()
+
+        self.assertIsNone(self.queue.get(jobs[0].id))
+        self.assertIs(self.queue.get(jobs[2].id), jobs[2])
+
+if __name__ == '__main__':
+    unittest.main()
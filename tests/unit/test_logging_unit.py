@@ -0,0 +1,49 @@
+import logging
+import unittest
+
+from services.logging_support import RowActivityLog
+
+
+class TestRowActivityLog(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger("tests.row_activity")
+
+    def test_rows_are_summarised_periodically(self):
+        activity = RowActivityLog(self.logger, client_id=3, every=4, sample_rate=0)
+        with self.assertLogs(self.logger, level="DEBUG") as logs:
+            for product_id in range(1, 10):
+                activity.row("inserted" if product_id % 2 else "deleted", product_id)
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(
+            logs.records[-1].getMessage(),
+            "Progress for client 3: 8 row(s) written (inserted 4, deleted 4)."
+        )
+        self.assertEqual(activity.summary(), "inserted 5, deleted 4")
+
+    def test_sampled_debug_rows(self):
+        self.logger.setLevel(logging.DEBUG)
+        self.addCleanup(self.logger.setLevel, logging.NOTSET)
+        activity = RowActivityLog(self.logger, client_id=3, every=1000, sample_rate=0.25)
+
+        with self.assertLogs(self.logger, level="DEBUG") as logs:
+            activity.rows("updated", list(range(1, 7)))
+            activity.row("updated", 7)
+            activity.row("updated", 8)
+
+        sampled = [r.getMessage() for r in logs.records if r.levelno == logging.DEBUG]
+        self.assertEqual(sampled, [
+            "Sampled row: updated product_id 4 for client 3",
+            "Sampled row: updated product_id 8 for client 3",
+        ])
+
+    def test_sampling_is_off_unless_debug_is_enabled(self):
+        self.logger.setLevel(logging.INFO)
+        self.addCleanup(self.logger.setLevel, logging.NOTSET)
+        activity = RowActivityLog(self.logger, client_id=3, every=1000, sample_rate=1)
+        self.assertEqual(activity.sample_every, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
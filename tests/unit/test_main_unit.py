@@ -4,9 +4,21 @@ import runpy
 from unittest.mock import patch, mock_open
 
 from tests.helpers import fake_connection_factory
+from db.connection import DatabaseConnection
+from domain.models import FeedImportResult
 from cli import main
 
 class TestMainUnit(unittest.TestCase):
+    def setUp(self):
+        # Each test patches psycopg2.connect, so start from an empty pool.
+        DatabaseConnection.close_pools()
+        self.addCleanup(DatabaseConnection.close_pools)
+
+        # builtins.open is mocked with text CSV data; keep digesting off those mocks.
+        digest_patcher = patch("services.applied_files.file_digest", return_value="0" * 64)
+        digest_patcher.start()
+        self.addCleanup(digest_patcher.stop)
+
     def test_main_feed_only(self):
         """
         If user passes only --feed, we create tables + import feed, but do NOT do portal sync.
@@ -24,8 +36,8 @@ class TestMainUnit(unittest.TestCase):
         mock_sync_class.assert_not_called()
 
         self.assertEqual(
-            mock_connect.call_count, 3,
-            f"Expected 3 calls to psycopg2.connect, got {mock_connect.call_count}"
+            mock_connect.call_count, 1,
+            f"Expected the pool to reuse 1 connection, got {mock_connect.call_count} connects"
         )
 
     def test_main_feed_and_portal(self):
@@ -49,8 +61,8 @@ class TestMainUnit(unittest.TestCase):
             main()
 
         self.assertEqual(
-            mock_connect.call_count, 5,
-            f"Expected 5 calls to psycopg2.connect, got {mock_connect.call_count}"
+            mock_connect.call_count, 1,
+            f"Expected the pool to reuse 1 connection, got {mock_connect.call_count} connects"
         )
 
     def test_main_run_module(self):
@@ -67,8 +79,8 @@ class TestMainUnit(unittest.TestCase):
             runpy.run_module("cli", run_name="__main__")
 
         self.assertEqual(
-            mock_connect.call_count, 3,
-            f"Expected 3 calls to psycopg2.connect, got {mock_connect.call_count}"
+            mock_connect.call_count, 1,
+            f"Expected the pool to reuse 1 connection, got {mock_connect.call_count} connects"
         )
 
     def test_main_run_module_fakedb(self):
@@ -87,3 +99,53 @@ class TestMainUnit(unittest.TestCase):
             fake_conn.commit.called,
             "Expected commit() with a fake DB connection"
         )
+
+    def test_main_manifest_batch(self):
+        """
+        --manifest runs every listed client, creating tables only once,
+        and exits non-zero when one of them fails.
+        """
+        manifest_data = "client_id,feed,portal\n1,feed1.csv,\n2,feed2.csv,\n"
+        feed_data = "product_id,title,price,store_id\n1,Batch Product,9.99,100\n"
+
+        mo = mock_open()
+        mo.side_effect = [
+            mock_open(read_data=manifest_data).return_value,
+            mock_open(read_data=feed_data).return_value,
+            FileNotFoundError("feed2.csv"),
+        ]
+
+        with patch.object(sys, 'argv', ["cli.py", "--manifest", "clients.csv", "--parallel", "1"]), \
+             patch("builtins.open", mo), \
+             patch("psycopg2.connect", return_value=fake_connection_factory()), \
+             patch("services.table_creator.TableCreator.create_tables") as mock_create_tables:
+            with self.assertRaises(SystemExit) as exit_ctx:
+                main()
+
+        self.assertEqual(exit_ctx.exception.code, 1)
+        mock_create_tables.assert_called_once()
+
+    def test_main_skips_already_applied_feed(self):
+        """
+        When the manifest says this exact feed was the last one applied,
+        the import is skipped and nothing is written; --force re-applies it.
+        """
+        feed_csv_data = "product_id,title,price,store_id\n1,Test Product,9.99,100\n"
+        fake_conn = fake_connection_factory()
+        fake_cursor = fake_conn.cursor.return_value.__enter__.return_value
+        fake_cursor.fetchone.return_value = ("0" * 64, {"feed": {"inserted": 1, "updated": 0, "unchanged": 0}, "sync": None})
+
+        with patch.object(sys, 'argv', ["cli.py", "--feed", "feed.csv", "--client", "1"]), \
+             patch("builtins.open", mock_open(read_data=feed_csv_data)), \
+             patch("psycopg2.connect", return_value=fake_conn), \
+             patch("services.feed_importer.FeedImporter.import_feed") as mock_import:
+            main()
+        mock_import.assert_not_called()
+
+        with patch.object(sys, 'argv', ["cli.py", "--feed", "feed.csv", "--client", "1", "--force"]), \
+             patch("builtins.open", mock_open(read_data=feed_csv_data)), \
+             patch("psycopg2.connect", return_value=fake_conn), \
+             patch("services.feed_importer.FeedImporter.import_feed", return_value=FeedImportResult()) as mock_import:
+            main()
+        mock_import.assert_called_once()
+
@@ -0,0 +1,58 @@
+import unittest
+
+from services.metrics import (
+    Counter, Histogram, MetricsRegistry, STAGE_RECORDS, STAGE_SECONDS,
+    format_stage_report, pipeline_scope, stage_timer, timed_batches
+)
+
+
+class TestMetricsUnit(unittest.TestCase):
+
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("demo_seconds", "Demo.", ("client_id",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, client_id=1)
+        histogram.observe(0.5, client_id=1)
+        histogram.observe(5, client_id=1)
+
+        text = registry.render()
+
+        self.assertIn("# TYPE demo_seconds histogram", text)
+        self.assertIn('demo_seconds_bucket{client_id="1",le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{client_id="1",le="1.0"} 2', text)
+        self.assertIn('demo_seconds_bucket{client_id="1",le="+Inf"} 3', text)
+        self.assertIn('demo_seconds_count{client_id="1"} 3', text)
+
+    def test_counter_escapes_label_values(self):
+        counter = Counter("demo_total", "Demo.", ("name",))
+        counter.inc(2, name='say "hi"')
+        self.assertEqual(counter.render(), ['demo_total{name="say \\"hi\\""} 2'])
+
+    def test_stages_are_labelled_with_pipeline_and_client(self):
+        with pipeline_scope("feed", 4242):
+            with stage_timer("diff", 10):
+                pass
+            for _ in timed_batches("csv_parse", [[1, 2], [3]]):
+                pass
+
+        self.assertEqual(STAGE_SECONDS.samples()[("feed", "diff", "4242")][0], 1)
+        self.assertEqual(STAGE_SECONDS.samples()[("feed", "csv_parse", "4242")][0], 2)
+        self.assertEqual(STAGE_RECORDS.samples()[("feed", "csv_parse", "4242")], 3)
+        report = format_stage_report(STAGE_SECONDS, STAGE_RECORDS)
+        self.assertRegex(report, r"feed\s+csv_parse")
+
+    def test_report_sums_over_clients(self):
+        seconds = Histogram("s", "S.", ("pipeline", "stage", "client_id"))
+        records = Counter("r", "R.", ("pipeline", "stage", "client_id"))
+        seconds.observe(1.0, pipeline="portal_sync", stage="apply", client_id=1)
+        seconds.observe(2.0, pipeline="portal_sync", stage="apply", client_id=2)
+        records.inc(5, pipeline="portal_sync", stage="apply", client_id=1)
+        records.inc(7, pipeline="portal_sync", stage="apply", client_id=2)
+
+        last_line = format_stage_report(seconds, records).splitlines()[-1].split()
+
+        self.assertEqual(last_line, ["portal_sync", "apply", "2", "3.000", "12"])
+
+
+if __name__ == '__main__':
+    unittest.main()
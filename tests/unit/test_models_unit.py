@@ -1,9 +1,10 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from psycopg2 import DatabaseError
 from tests.base_mock_db import BaseMockDBTest
 
 from services.table_creator import TableCreator
+from domain.models import parse_price_cents, product_row_hash
 
 class TestModelsUnit(BaseMockDBTest):
     def test_create_tables_success(self):
@@ -21,6 +22,126 @@ class TestModelsUnit(BaseMockDBTest):
         self.fake_conn.rollback.assert_called_once()
         self.fake_conn.close.assert_called_once()
 
+    def test_ensure_tables_checks_once(self):
+        with patch("services.table_creator._tables_ready", False):
+            self.assertTrue(TableCreator().ensure_tables())
+            self.assertTrue(TableCreator().ensure_tables())
+
+        self.fake_conn.commit.assert_called_once()
+
+    def test_ensure_tables_retries_after_failure(self):
+        self.fake_cursor.execute.side_effect = DatabaseError("down")
+        with patch("services.table_creator._tables_ready", False):
+            self.assertFalse(TableCreator().ensure_tables())
+            self.fake_cursor.execute.side_effect = None
+            self.assertTrue(TableCreator().ensure_tables())
+
+    def test_create_tables_adds_row_hash(self):
+        TableCreator().create_tables()
+
+        statements = " ".join(c[0][0] for c in self.fake_cursor.execute.call_args_list)
+        self.assertIn("FUNCTION product_row_hash", statements)
+        self.assertIn("row_hash UUID GENERATED ALWAYS AS", statements)
+
+    def test_create_tables_hash_partitioned_with_fillfactor(self):
+        self.fake_cursor.fetchone.return_value = ("p",)
+        self.fake_cursor.fetchall.side_effect = [[(2,)], [("products_p0",), ("products_p1",)]]
+        TableCreator(partitions=2, fillfactor=90).create_tables()
+
+        statements = " ".join(c[0][0] for c in self.fake_cursor.execute.call_args_list)
+        self.assertIn("PARTITION BY HASH (client_id)", statements)
+        self.assertIn("PRIMARY KEY (client_id, id)", statements)
+        self.assertIn("PARTITION OF products FOR VALUES WITH (MODULUS 2, REMAINDER 1) WITH (fillfactor = 90)", statements)
+        self.assertIn("ALTER TABLE products_p1 SET (fillfactor = 90)", statements)
+
+    def test_create_tables_leaves_single_table_to_migration(self):
+        self.fake_cursor.fetchone.return_value = ("r",)
+
+        with self.assertLogs("services.table_creator", level="WARNING") as logs:
+            self.assertTrue(TableCreator(partitions=4).create_tables())
+
+        statements = " ".join(c[0][0] for c in self.fake_cursor.execute.call_args_list)
+        self.assertNotIn("PARTITION", statements)
+        self.assertIn("CREATE TABLE IF NOT EXISTS apply_checkpoints", statements)
+        self.assertIn("--migrate-partitions 4", logs.output[0])
+        self.fake_conn.commit.assert_called_once()
+
+    def test_create_tables_keeps_partitions_of_another_count(self):
+        self.fake_cursor.fetchone.return_value = ("p",)
+        self.fake_cursor.fetchall.return_value = [(4,)]
+
+        with self.assertLogs("services.table_creator", level="WARNING"):
+            self.assertTrue(TableCreator(partitions=8).create_tables())
+
+        statements = " ".join(c[0][0] for c in self.fake_cursor.execute.call_args_list)
+        self.assertNotIn("PARTITION OF products", statements)
+        self.assertIn("CREATE TABLE IF NOT EXISTS catalog_versions", statements)
+        self.fake_conn.commit.assert_called_once()
+
+    def test_plain_table_gets_fillfactor(self):
+        statements = TableCreator(partitions=0, fillfactor=80).products_table_sql("products")
+
+        self.assertEqual(len(statements), 1)
+        self.assertIn(") WITH (fillfactor = 80);", statements[0])
+        self.assertNotIn("PARTITION", statements[0])
+
+    def test_invalid_storage_settings_rejected(self):
+        with self.assertRaises(ValueError):
+            TableCreator(fillfactor=5)
+        with self.assertRaises(ValueError):
+            TableCreator(partitions=-1)
+
+    def test_migrate_to_partitioned_copies_and_swaps(self):
+        self.fake_cursor.fetchone.return_value = ("r",)
+        self.fake_cursor.rowcount = 3
+
+        copied = TableCreator(partitions=4).migrate_to_partitioned()
+
+        self.assertEqual(copied, 3)
+        statements = [c[0][0] for c in self.fake_cursor.execute.call_args_list]
+        joined = " ".join(statements)
+        self.assertIn("LOCK TABLE products IN EXCLUSIVE MODE", joined)
+        self.assertIn("INSERT INTO products_partitioned", joined)
+        self.assertIn("setval(pg_get_serial_sequence('products_partitioned', 'id')", joined)
+        self.assertEqual(statements[-2:], [
+            "ALTER TABLE products RENAME TO products_legacy",
+            "ALTER TABLE products_partitioned RENAME TO products",
+        ])
+        self.fake_conn.commit.assert_called_once()
+
+    def test_migrate_to_partitioned_skips_partitioned_table(self):
+        self.fake_cursor.fetchone.return_value = ("p",)
+
+        self.assertEqual(TableCreator(partitions=4).migrate_to_partitioned(), 0)
+        self.fake_conn.commit.assert_not_called()
+
+    def test_create_tables_migrates_numeric_price(self):
+        TableCreator().create_tables()
+
+        statements = " ".join(c[0][0] for c in self.fake_cursor.execute.call_args_list)
+        self.assertIn("price_cents BIGINT NOT NULL", statements)
+        self.assertIn("ALTER COLUMN price TYPE BIGINT USING round(price * 100)::BIGINT", statements)
+        self.assertIn("RENAME COLUMN price TO price_cents", statements)
+
+    def test_parse_price_cents_is_exact(self):
+        self.assertEqual(parse_price_cents("19.99"), 1999)
+        self.assertEqual(parse_price_cents(" 0.1 "), 10)
+        self.assertEqual(parse_price_cents("-2.05"), -205)
+        self.assertEqual(parse_price_cents("7"), 700)
+        # Beyond two decimals, half up, as NUMERIC(10,2) used to round.
+        self.assertEqual(parse_price_cents("0.125"), 13)
+        self.assertEqual(parse_price_cents("10.004"), 1000)
+        self.assertEqual(parse_price_cents("1e2"), 10000)
+
+    def test_parse_price_cents_rejects_non_numbers(self):
+        for text in ("", "abc", "1.2.3", "nan", "inf"):
+            with self.assertRaises(ValueError):
+                parse_price_cents(text)
+
+    def test_product_row_hash_uses_cents(self):
+        self.assertEqual(product_row_hash("A", 1000, 1), product_row_hash("A", parse_price_cents("10.004"), 1))
+        self.assertNotEqual(product_row_hash("A", 1000, 1), product_row_hash("A", 1000, 2))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
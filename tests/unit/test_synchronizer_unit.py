@@ -1,8 +1,17 @@
+import gzip
+import io
+import json
+import random
 import unittest
-from unittest.mock import mock_open, patch
+from unittest.mock import MagicMock, mock_open, patch, PropertyMock
 from tests.base_mock_db import BaseMockDBTest
 
 from services.portal_synchronizer import PortalSynchronizer
+from services.columnar import ProductColumns
+from services.csv_reader import DuplicateIndex
+from domain.models import parse_price_cents, product_row_hash
+from services.apply_checkpoints import ApplyCheckpoint, ApplyCheckpoints
+from services.sync_plan import PlanDriftError, SyncPlan
 
 
 class TestSynchronizerUnit(BaseMockDBTest):
@@ -41,8 +50,8 @@ class TestSynchronizerUnit(BaseMockDBTest):
             sync = PortalSynchronizer()
             portal_records = sync.read_portal_csv("dummy.csv")
 
-            db_products = {1: {'title': 'Old Product', 'price': 50.0, 'store_id': 101},
-                           2: {'title': 'To Delete', 'price': 30.0, 'store_id': 102}}
+            db_products = {1: {'title': 'Old Product', 'price_cents': 5000, 'store_id': 101},
+                           2: {'title': 'To Delete', 'price_cents': 3000, 'store_id': 102}}
 
             to_delete, to_insert, to_update = sync.compute_sync_actions(db_products, portal_records)
 
@@ -71,6 +80,248 @@ class TestSynchronizerUnit(BaseMockDBTest):
         self.assertTrue(update_calls, "Should have at least one UPDATE for product_id=1")
         self.assertTrue(self.fake_conn.commit.called)
 
+    def test_row_hash_detects_real_changes_only(self):
+        db_products = {
+            1: {"title": "Same", "price_cents": 1000, "store_id": 101, "row_hash": product_row_hash("Same", 1000, 101)},
+            2: {"title": "Old", "price_cents": 2000, "store_id": 102, "row_hash": product_row_hash("Old", 2000, 102)},
+        }
+        portal_records = {
+            # Differs only below a cent, which parsing rounds away.
+            1: {"title": "Same", "price_cents": parse_price_cents("10.001"), "store_id": 101},
+            2: {"title": "New", "price_cents": parse_price_cents("20.00"), "store_id": 102},
+        }
+
+        _, _, to_update = PortalSynchronizer().compute_sync_actions(db_products, portal_records)
+
+        self.assertEqual(set(to_update.keys()), {2})
+
+    def test_columnar_actions_match_compute_sync_actions(self):
+        rng = random.Random(12)
+        titles = ["Alpha", "Beta", "Gamma"]
+        db_rows = [
+            (pid, rng.choice(titles), rng.choice([1000, 1001, 2050]), rng.choice([101, 102]))
+            for pid in rng.sample(range(1, 400), 200)
+        ]
+        portal_rows = [
+            (pid, rng.choice(titles), rng.choice([999, 1000, 1001, 2050]), rng.choice([101, 102]))
+            for pid in rng.choices(range(1, 400), k=250)
+        ]
+        db_products = {
+            pid: {"title": title, "price_cents": price_cents, "store_id": store_id,
+                  "row_hash": product_row_hash(title, price_cents, store_id)}
+            for pid, title, price_cents, store_id in db_rows
+        }
+        portal_records = {
+            pid: {"title": title, "price_cents": price_cents, "store_id": store_id}
+            for pid, title, price_cents, store_id in portal_rows
+        }
+
+        sync = PortalSynchronizer()
+        expected = sync.compute_sync_actions(db_products, portal_records)
+        actual = sync.compute_columnar_sync_actions(
+            ProductColumns.from_records(db_rows), ProductColumns.from_records(portal_rows)
+        )
+
+        self.assertEqual(actual, expected)
+
+    def test_columnar_engine_synchronize(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,Same,10.00,101\n"
+            "3,New Portal,49.99,103\n"
+            "4,Old Price,5.00,104\n"
+            "4,New Price,6.00,104\n"
+        )
+        self.fake_conn.__enter__.return_value = self.fake_conn
+        self.fake_cursor.fetchmany.side_effect = [
+            [(1, "Same", 1000, 101), (2, "To Delete", 3000, 102), (4, "New Price", 500, 104)],
+            []
+        ]
+
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            result = PortalSynchronizer(engine=PortalSynchronizer.ENGINE_COLUMNAR).synchronize("dummy.csv", 1)
+
+        self.assertEqual(
+            (result.deleted, result.inserted, result.updated, result.unchanged, result.received),
+            (1, 1, 1, 1, 3)
+        )
+        update_calls = [
+            c[0][1] for c in self.fake_cursor.execute.call_args_list if "UPDATE products" in c[0][0]
+        ]
+        self.assertEqual(update_calls, [("New Price", 600, 104, 1, 4)])
+        self.fake_conn.commit.assert_called_once()
+
+    def test_first_policy_keeps_first_portal_row(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,First,1.00,101\n"
+            "2,Other,2.00,102\n"
+            "1,Second,3.00,101\n"
+        )
+        synchronizer = PortalSynchronizer(duplicates="first")
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            records = synchronizer.read_portal_csv("dummy.csv", DuplicateIndex("first"))
+            columns = synchronizer.read_portal_columns("dummy.csv", DuplicateIndex("first"))
+
+        self.assertEqual(records[1], {"title": "First", "price_cents": 100, "store_id": 101})
+        self.assertEqual(columns.record(0)["title"], "First")
+        self.assertEqual(len(columns), 2)
+
+    def test_sql_engine_applies_set_based_statements(self):
+        csv_data = (
+            "product_id,title,price,store_id\n"
+            "1,Portal Updated,99.99,101\n"
+            "3,New Portal,49.99,103\n"
+            "3,New Portal Again,59.99,103\n"
+        )
+        type(self.fake_cursor).rowcount = PropertyMock(side_effect=[4, 1, 1])
+        self.fake_cursor.fetchone.return_value = (2,)
+
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            result = PortalSynchronizer(engine=PortalSynchronizer.ENGINE_SQL).synchronize("dummy.csv", 1)
+
+        self.assertEqual((result.deleted, result.updated, result.inserted), (4, 1, 1))
+        self.assertEqual((result.received, result.duplicates), (2, 1))
+        self.assertEqual(result.unchanged, 0)
+        copy_sql, buffer = self.fake_cursor.copy_expert.call_args[0]
+        self.assertIn("FORCE_NOT_NULL (title)", copy_sql)
+        self.assertEqual(buffer.getvalue().splitlines()[-1], "3,New Portal Again,5999,103")
+        statements = [c[0][0] for c in self.fake_cursor.execute.call_args_list]
+        self.assertEqual(sum("DELETE FROM products" in sql for sql in statements), 1)
+        self.assertEqual(sum("UPDATE products" in sql for sql in statements), 1)
+        self.assertEqual(sum("INSERT INTO products" in sql for sql in statements), 1)
+        self.fake_cursor.fetchall.assert_not_called()
+        self.fake_conn.commit.assert_called_once()
+
+    def test_chunked_apply_commits_every_chunk(self):
+        store = MagicMock(spec=ApplyCheckpoints)
+        sync = PortalSynchronizer(chunk_rows=2, checkpoints=store)
+        checkpoint = ApplyCheckpoint(1, "portal:abc", rows_done=3, counts={"deleted": 1, "inserted": 2})
+        record = {"title": "T", "price_cents": 100, "store_id": 1}
+
+        sync.apply_sync_actions(1, {7}, {8: record, 9: record}, {10: record}, checkpoint)
+
+        self.assertEqual(self.fake_conn.commit.call_count, 3)
+        self.assertEqual(store.save.call_count, 2)
+        store.clear.assert_called_once()
+        self.assertEqual(checkpoint.rows_done, 7)
+        self.assertEqual(checkpoint.counts, {"deleted": 2, "inserted": 4, "updated": 1})
+
+    def test_chunked_synchronize_counts_each_action_once(self):
+        csv_data = "product_id,title,price,store_id\n" + "".join(
+            f"{i},Product {i},1.00,1\n" for i in range(1, 4)
+        )
+        db_products = {
+            pid: {"title": "Gone", "price_cents": 100, "store_id": 1, "row_hash": None} for pid in range(10, 15)
+        }
+        db_products[3] = {"title": "Old", "price_cents": 100, "store_id": 1, "row_hash": None}
+        store = MagicMock(spec=ApplyCheckpoints)
+
+        for resumed_counts in ({}, {"deleted": 4, "inserted": 1}):
+            store.load.return_value = ApplyCheckpoint(1, "portal:abc", rows_done=5, counts=resumed_counts)
+            with self.subTest(resumed_counts=resumed_counts), \
+                 patch("builtins.open", mock_open(read_data=csv_data)), \
+                 patch("services.portal_synchronizer.job_key", return_value="portal:abc"), \
+                 patch.object(PortalSynchronizer, "fetch_db_products", return_value=db_products):
+                result = PortalSynchronizer(chunk_rows=2, checkpoints=store).synchronize("dummy.csv", 1)
+
+            self.assertEqual(
+                (result.deleted, result.inserted, result.updated, result.unchanged, result.received),
+                (5 + resumed_counts.get("deleted", 0), 2 + resumed_counts.get("inserted", 0), 1, 0, 3)
+            )
+
+    def test_resumed_sync_result_includes_committed_chunks(self):
+        result = PortalSynchronizer._sync_result(10, {5}, {}, {6: {}}, {"deleted": 1, "inserted": 2})
+
+        self.assertEqual(
+            (result.deleted, result.inserted, result.updated, result.unchanged, result.received),
+            (2, 2, 1, 7, 10)
+        )
+
+    def test_sql_engine_without_valid_rows_changes_nothing(self):
+        csv_data = "product_id,title,price,store_id\nx,Broken,1.00,1\n"
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            result = PortalSynchronizer(engine=PortalSynchronizer.ENGINE_SQL).synchronize("dummy.csv", 1)
+
+        self.assertEqual(result.received, 0)
+        statements = [c[0][0] for c in self.fake_cursor.execute.call_args_list]
+        self.assertFalse(any("DELETE FROM products" in sql for sql in statements))
+        self.fake_conn.commit.assert_not_called()
+        self.fake_conn.rollback.assert_called_once()
+
+    def _make_plan(self):
+        # fetch_catalog_version and fetch_db_products use the connection as a context manager.
+        self.fake_conn.__enter__.return_value = self.fake_conn
+        portal = io.BytesIO(b"product_id,title,price,store_id\n1,New,2.00,1\n3,Added,1.00,1\n")
+        self.fake_cursor.fetchone.return_value = (4, None)
+        self.fake_cursor.fetchall.return_value = [
+            (1, "Old", 100, 1, product_row_hash("Old", 100, 1)),
+            (2, "Gone", 100, 1, product_row_hash("Gone", 100, 1)),
+        ]
+        return PortalSynchronizer().plan(portal, 7)
+
+    def test_plan_round_trips_without_changing_anything(self):
+        plan = self._make_plan()
+        self.fake_conn.commit.assert_not_called()
+
+        buffer = io.BytesIO(plan.to_bytes())
+        restored = SyncPlan.read(buffer)
+
+        self.assertEqual(restored.catalog_version, 4)
+        self.assertEqual(restored.counts, {
+            "deleted": 1, "inserted": 1, "updated": 1, "unchanged": 0, "received": 2, "duplicates": 0
+        })
+        self.assertEqual(restored.to_delete, {2: product_row_hash("Gone", 100, 1)})
+        self.assertEqual(restored.to_update[1], {
+            "title": "New", "price_cents": 200, "store_id": 1, "row_hash": product_row_hash("Old", 100, 1)
+        })
+        self.assertEqual(restored.source_digest, plan.source_digest)
+
+    def test_plan_with_malformed_header_is_value_error(self):
+        base = {"format": "catalog-sync-plan", "format_version": 1, "client_id": 1, "catalog_version": 2}
+        for header in (base, {**base, "counts": {}}, {**base, "counts": [0]}, {**base, "counts": {"received": "x"}}):
+            buffer = io.BytesIO()
+            with gzip.GzipFile(fileobj=buffer, mode="wb") as f:
+                f.write((json.dumps(header) + "\n").encode("utf-8"))
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                SyncPlan.read(io.BytesIO(buffer.getvalue()))
+
+    def test_apply_plan_refuses_drifted_catalog(self):
+        plan = self._make_plan()
+        sync = PortalSynchronizer()
+        unchanged_rows = [(1, product_row_hash("Old", 100, 1)), (2, product_row_hash("Gone", 100, 1))]
+
+        for version, rows in (((5,), unchanged_rows), ((4,), [(1, product_row_hash("Edited", 100, 1))])):
+            self.fake_cursor.reset_mock()
+            self.fake_cursor.fetchone.return_value = version
+            self.fake_cursor.fetchall.return_value = rows
+            with self.assertRaises(PlanDriftError):
+                sync.apply_plan(plan)
+            statements = [c[0][0] for c in self.fake_cursor.execute.call_args_list]
+            self.assertFalse(any("DELETE FROM products" in sql for sql in statements))
+        self.fake_conn.commit.assert_not_called()
+
+        self.fake_cursor.fetchone.return_value = (4,)
+        self.fake_cursor.fetchall.return_value = unchanged_rows
+        result = sync.apply_plan(plan)
+
+        self.assertEqual((result.deleted, result.inserted, result.updated), (1, 1, 1))
+        self.fake_conn.commit.assert_called_once()
+
+    def test_apply_plan_creates_version_row_before_locking_it(self):
+        plan = self._make_plan()
+        self.fake_cursor.fetchone.return_value = (4,)
+        self.fake_cursor.fetchall.return_value = [
+            (1, product_row_hash("Old", 100, 1)), (2, product_row_hash("Gone", 100, 1))
+        ]
+
+        PortalSynchronizer().apply_plan(plan)
+
+        statements = [c[0][0] for c in self.fake_cursor.execute.call_args_list]
+        lock = next(i for i, sql in enumerate(statements) if "FOR UPDATE" in sql)
+        self.assertIn("ON CONFLICT (client_id) DO NOTHING", statements[lock - 1])
+        self.assertIn("INSERT INTO catalog_versions", statements[lock - 1])
+
 
 if __name__ == '__main__':
     unittest.main()